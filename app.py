@@ -1,35 +1,22 @@
 import streamlit as st
 import pandas as pd
+import os
+import sqlite3
 import sys
 from pathlib import Path
-import io
-import base64
-import plotly.graph_objects as go
 
 # Agregar utils al path
 sys.path.append(str(Path(__file__).parent))
 
-# Importaciones corregidas - SIN crear_analisis_estacionalidad
-from utils.visualizations import (
-    crear_grafico_tendencia_ventas,
-    crear_grafico_distribucion_clientes,
-    crear_grafico_top_productos,
-    crear_heatmap_ventas_mensual,
-    crear_gauge_chart,
-    crear_mapa_correlaciones,
-    crear_waterfall_contribucion,
-    crear_sankey_segmentos,
-    crear_treemap_productos,
-    crear_grafico_pareto,
-    crear_grafico_progreso_objetivos
-)
-
-from utils.metrics import (
-    calcular_metricas_globales,
-    calcular_crecimiento,
-    identificar_productos_estrella,
-    segmentar_clientes_valor
-)
+from utils.exportacion import FORMATOS_EXPORTACION, exportar_bytes, nombre_archivo, tipo_mime
+from utils.fuente_sql import RUTA_SQL
+from utils.precalculo import plan_correlaciones, plan_vista, preparar_periodo
+from utils.paralelo import FigurasEnCurso
+from utils.refresco import Refrescador
+from utils.correlaciones import NOMBRES_LEGIBLES, OPCIONES_CORRELACION, VENTANAS_RODANTES
+from utils import instrumentacion
+from utils.figure_cache import cache_figuras
+from utils.instrumentacion import instrumentar, medir, registro
 
 # Configuración de la página
 st.set_page_config(
@@ -463,48 +450,45 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # --- CARGA DE DATOS MEJORADA ---
-@st.cache_data(ttl=3600)  # Cache por 1 hora
-def load_data():
-    """Cargar todos los datasets con validación"""
+@st.cache_resource
+def load_refrescador():
+    """Datos compartidos por todas las sesiones y recargados en segundo plano al cambiar los archivos
+
+    Reemplaza al cache con ttl: ningún run espera una recarga, se sirve la
+    versión vigente hasta que la nueva está lista (ver utils/refresco.py).
+    """
+    return Refrescador()
+
+# Cargar datos (solo la primera carga espera; las siguientes llegan armadas)
+with st.spinner('🔄 Cargando datos...'), medir('seccion.carga_datos'):
+    refrescador = load_refrescador()
     try:
-        kpis = pd.read_csv('data/kpis_diarios.csv')
-        if kpis.empty:
-            st.error("❌ El archivo kpis_diarios.csv está vacío")
-            return None, None, None
-            
-        kpis['fecha'] = pd.to_datetime(kpis['fecha'])
-        clientes = pd.read_csv('data/analisis_clientes.csv')
-        
-        # Manejar columnas de fecha si existen
-        if 'primera_compra' in clientes.columns:
-            clientes['primera_compra'] = pd.to_datetime(clientes['primera_compra'])
-        if 'ultima_compra' in clientes.columns:
-            clientes['ultima_compra'] = pd.to_datetime(clientes['ultima_compra'])
-            
-        productos = pd.read_csv('data/analisis_productos.csv')
-        
-        return kpis, clientes, productos
+        datos = refrescador.datos()
     except FileNotFoundError as e:
         st.error(f"❌ Error cargando archivos: {e}")
         st.info("📁 Asegúrate de que los archivos estén en la carpeta 'data/': kpis_diarios.csv, analisis_clientes.csv, analisis_productos.csv")
-        return None, None, None
+        st.stop()
+    except (OSError, sqlite3.Error) as e:
+        st.error(f"❌ Error abriendo la base de datos {RUTA_SQL}: {e}")
+        st.stop()
     except Exception as e:
         st.error(f"❌ Error inesperado: {e}")
-        return None, None, None
+        st.stop()
 
-# Cargar datos
-with st.spinner('🔄 Cargando datos...'):
-    kpis, clientes, productos = load_data()
+estado_kpis, base = datos['kpis'], datos['base']
+kpis, indice_kpis, cubo_kpis, correlaciones_kpis = (
+    estado_kpis['kpis'], estado_kpis['indice'], estado_kpis['cubo'], estado_kpis['correlaciones']
+)
+# Con la base SQL (SANO_FRESCO_SQL) los clientes no se cargan: sus agregados se consultan en SQL
+fuente_sql, clientes, productos = base['fuente'], base['clientes'], base['productos']
+sketches_clientes = datos['sketches']
 
-if kpis is None or clientes is None or productos is None:
-    st.error("No se pudieron cargar los datos. Verifica los archivos en la carpeta 'data/'.")
+if kpis.empty:
+    st.error("❌ El archivo kpis_diarios.csv está vacío")
     st.stop()
 
-
-
-# Calcular métricas globales
-metricas = calcular_metricas_globales(kpis)
-clientes = segmentar_clientes_valor(clientes)
+if refrescador.error is not None:
+    st.sidebar.warning(f"⚠️ No se pudieron recargar los datos; se muestra la versión anterior ({refrescador.error})")
 
 # --- SIDEBAR SIMPLIFICADA ---
 # Título usando st.markdown con CSS específico
@@ -533,24 +517,91 @@ fecha_fin = st.sidebar.date_input(
     label_visibility="collapsed"
 )
 
+if fecha_inicio > fecha_fin:
+    st.sidebar.warning("⚠️ La fecha de inicio es posterior a la fecha fin; se invirtió el rango.")
+    fecha_inicio, fecha_fin = fecha_fin, fecha_inicio
+
+# Filtrar período (búsqueda binaria sobre kpis ordenado) y recalcular métricas
+periodo = preparar_periodo(
+    kpis, indice_kpis, cubo_kpis, fecha_inicio, fecha_fin, correlaciones_kpis, sketches_clientes
+)
+kpis_filtrado = periodo['kpis']
+if kpis_filtrado.empty:
+    st.warning("No hay datos en el período seleccionado.")
+    st.stop()
+metricas_filtradas = periodo['metricas']
+
 st.sidebar.markdown("---")
 
-# Botón de exportación con formato mejorado
-csv = kpis.to_csv(index=False)
+# Exportación bajo demanda: el archivo se genera por bloques solo al hacer clic
+st.sidebar.markdown("#### 📥 Exportar Datos")
+
+datasets_exportables = {
+    "KPIs del período": ("reporte_sano_fresco", kpis_filtrado),
+    # Con la base SQL los clientes se leen solo al descargar
+    "Clientes": ("clientes_sano_fresco", fuente_sql.clientes if fuente_sql else clientes),
+    "Productos": ("productos_sano_fresco", productos)
+}
+dataset_export = st.sidebar.selectbox("Datos", list(datasets_exportables), key="dataset_export")
+formato_export = st.sidebar.selectbox("Formato", list(FORMATOS_EXPORTACION), key="formato_export")
+base_export, df_export = datasets_exportables[dataset_export]
+
 st.sidebar.download_button(
-    label="📥 Descargar Reporte\nCSV",
-    data=csv,
-    file_name="reporte_sano_fresco.csv",
-    mime="text/csv",
+    label=f"📥 Descargar Reporte\n{formato_export}",
+    data=lambda df=df_export, formato=formato_export: exportar_bytes(df() if callable(df) else df, formato),
+    file_name=nombre_archivo(base_export, formato_export),
+    mime=tipo_mime(formato_export),
     type="primary"
 )
 
 # Variables necesarias
 modo_rapido = False
 mostrar_graficos_pesados = True
-kpis_filtrado = kpis
-metricas_filtradas = metricas
 clientes_filtrados = clientes
+total_clientes = fuente_sql.contar_clientes() if fuente_sql else len(clientes_filtrados)
+
+def opciones_correlacion():
+    """Método, par y ventana elegidos en la sección de correlaciones (o los por defecto)"""
+    for clave, valor in (('correlacion_metodo', OPCIONES_CORRELACION['metodo']),
+                         ('correlacion_a', OPCIONES_CORRELACION['par'][0]),
+                         ('correlacion_b', OPCIONES_CORRELACION['par'][1]),
+                         ('correlacion_ventana', OPCIONES_CORRELACION['ventana'])):
+        st.session_state.setdefault(clave, valor)
+    return {
+        'metodo': st.session_state['correlacion_metodo'] or OPCIONES_CORRELACION['metodo'],
+        'par': (st.session_state['correlacion_a'], st.session_state['correlacion_b']),
+        'ventana': st.session_state['correlacion_ventana'] or OPCIONES_CORRELACION['ventana']
+    }
+
+# Argumentos de cada gráfico (los mismos que usa precalcular.py para la vista inicial)
+vista = plan_vista(
+    periodo, clientes_filtrados, productos,
+    ranking=base['ranking'],
+    categorias_df=datos['categorias'],
+    opciones_correlacion=opciones_correlacion(),
+    fuente=fuente_sql,
+    resumen=base['resumen']
+)
+
+# Pestañas de productos y el gráfico que muestra cada una
+FIGURA_PESTANA = {
+    "📊 Top Ventas": 'top_ventas',
+    "🔥 Más Frecuentes": 'mas_frecuentes',
+    "💎 Mayor Precio": 'mayor_precio',
+    "💰 Cascada Contribución": 'cascada',
+    "📊 Análisis Pareto": 'pareto'
+}
+
+# Los gráficos visibles en este run se encargan juntos al pool (SANO_FRESCO_FIGURAS_PARALELAS)
+# y cada sección retira el suyo en orden; en modo secuencial se construyen al pedirlos
+visibles = ['tendencia', FIGURA_PESTANA.get(st.session_state.get('pestana_productos'), 'top_ventas'), 'objetivos']
+if not modo_rapido:
+    visibles += ['distribucion_clientes', 'heatmap']
+    if mostrar_graficos_pesados and st.session_state.get('mostrar_avanzadas'):
+        visibles += ['sankey', 'treemap']
+    if mostrar_graficos_pesados and st.session_state.get('mostrar_correlaciones'):
+        visibles += ['correlaciones', 'correlacion_rodante']
+figuras = FigurasEnCurso(vista, visibles)
 
 # --- KPIS PRINCIPALES MEJORADOS ---
 st.markdown("## 📊 Métricas / KPIs")
@@ -640,7 +691,7 @@ with col4:
         </div>
     """.format(
         metricas_filtradas['clientes_unicos'],
-        len(clientes_filtrados)
+        total_clientes
     ), unsafe_allow_html=True)
 
 st.markdown("---")
@@ -648,233 +699,151 @@ st.markdown("---")
 # --- SECCIÓN: TENDENCIAS ---
 st.markdown("## 📈 Análisis de Tendencias")
 
-if not modo_rapido:
-    col1, col2 = st.columns(2)
+with medir('seccion.tendencias'):
+    if not modo_rapido:
+        col1, col2 = st.columns(2)
 
-    with col1:
-        st.plotly_chart(
-            crear_grafico_tendencia_ventas(kpis_filtrado),
-            use_container_width=True
-        )
+        with col1:
+            st.plotly_chart(
+                figuras.obtener('tendencia'),
+                use_container_width=True
+            )
 
-    with col2:
+        with col2:
+            st.plotly_chart(
+                figuras.obtener('distribucion_clientes'),
+                use_container_width=True
+            )
+    else:
+        # En modo rápido, solo mostrar el gráfico principal
         st.plotly_chart(
-            crear_grafico_distribucion_clientes(clientes_filtrados),
+            figuras.obtener('tendencia'),
             use_container_width=True
         )
-else:
-    # En modo rápido, solo mostrar el gráfico principal
-    st.plotly_chart(
-        crear_grafico_tendencia_ventas(kpis_filtrado),
-        use_container_width=True
-    )
 
 
 # --- ANÁLISIS DE PRODUCTOS MEJORADO ---
 st.markdown("## 🏆 Análisis Profundo de Productos")
 
-if not modo_rapido:
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
-        "📊 Top Ventas", 
-        "🔥 Más Frecuentes", 
-        "💎 Mayor Precio",
-        "💰 Cascada Contribución",
-        "📊 Análisis Pareto"
-    ])
-
-    with tab1:
-        # Crear gráfico directamente con ordenamiento garantizado
-        top_ventas = productos.nlargest(15, 'ventas_totales')
-        fig = go.Figure(data=[
-            go.Bar(
-                y=top_ventas['nombre_producto'],
-                x=top_ventas['ventas_totales'],
-                orientation='h',
-                text=top_ventas['ventas_totales'],
-                texttemplate='<b>$%{text:,.0f}</b>',
-                textposition='outside',
-                marker=dict(
-                    color='#0891b2',  # Color del tema
-                    line=dict(color='#047857', width=3),  # Borde grueso para efecto
-                    # Efecto Power BI con esquinas redondeadas
-                    cornerradius=8  # Esquinas redondeadas para efecto moderno
-                )
-            )
-        ])
-        fig.update_layout(
-            xaxis_title='Ventas Totales ($)',
-            yaxis_title='',
-            height=500,
-            font=dict(size=12, family='Arial, sans-serif'),
-            margin=dict(l=60, r=60, t=40, b=60),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            showlegend=False,
-            yaxis={'categoryorder':'total ascending'},
-            xaxis=dict(
-                gridcolor='rgba(0,0,0,0.1)',
-                showgrid=True
-            ),
-            # Efecto Power BI con sombra
-            barmode='group',
-            bargap=0.3
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with tab2:
-        # Crear gráfico directamente con ordenamiento garantizado
-        top_pedidos = productos.nlargest(15, 'pedidos_unicos')
-        fig = go.Figure(data=[
-            go.Bar(
-                y=top_pedidos['nombre_producto'],
-                x=top_pedidos['pedidos_unicos'],
-                orientation='h',
-                text=top_pedidos['pedidos_unicos'],
-                texttemplate='<b>%{text:,.0f}</b>',
-                textposition='outside',
-                marker=dict(
-                    color='#06D6A0',  # Verde turquesa del tema
-                    line=dict(color='#047857', width=3),  # Borde grueso para efecto
-                    # Efecto Power BI con esquinas redondeadas
-                    cornerradius=8  # Esquinas redondeadas para efecto moderno
-                )
-            )
-        ])
-        fig.update_layout(
-            xaxis_title='Pedidos Únicos',
-            yaxis_title='',
-            height=500,
-            font=dict(size=12, family='Arial, sans-serif'),
-            margin=dict(l=60, r=60, t=40, b=60),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            showlegend=False,
-            yaxis={'categoryorder':'total ascending'},
-            xaxis=dict(
-                gridcolor='rgba(0,0,0,0.1)',
-                showgrid=True
-            )
-        )
-        st.plotly_chart(fig, use_container_width=True)
-
-    with tab3:
-        # Crear gráfico directamente con ordenamiento garantizado
-        top_precio = productos.nlargest(15, 'precio_promedio')
-        fig = go.Figure(data=[
-            go.Bar(
-                y=top_precio['nombre_producto'],
-                x=top_precio['precio_promedio'],
-                orientation='h',
-                text=top_precio['precio_promedio'],
-                texttemplate='<b>$%{text:.2f}</b>',
-                textposition='outside',
-                marker=dict(
-                    color='#059669',  # Verde del tema
-                    line=dict(color='#047857', width=3),  # Borde grueso para efecto
-                    # Efecto Power BI con esquinas redondeadas
-                    cornerradius=8  # Esquinas redondeadas para efecto moderno
-                )
-            )
-        ])
-        fig.update_layout(
-            xaxis_title='Precio Promedio ($)',
-            yaxis_title='',
-            height=500,
-            font=dict(size=12, family='Arial, sans-serif'),
-            margin=dict(l=60, r=60, t=40, b=60),
-            plot_bgcolor='rgba(0,0,0,0)',
-            paper_bgcolor='rgba(0,0,0,0)',
-            showlegend=False,
-            yaxis={'categoryorder':'total ascending'},
-            xaxis=dict(
-                gridcolor='rgba(0,0,0,0.1)',
-                showgrid=True
-            )
-        )
-        st.plotly_chart(fig, use_container_width=True)
+# Render perezoso: solo se construye la figura de la pestaña visible. Cada
+# sección es un fragmento, así cambiar de pestaña no re-ejecuta todo el script.
+PESTANAS_PRODUCTOS = [
+    "📊 Top Ventas",
+    "🔥 Más Frecuentes",
+    "💎 Mayor Precio",
+    "💰 Cascada Contribución",
+    "📊 Análisis Pareto"
+]
+PESTANAS_RAPIDAS = ["📊 Top Ventas", "📊 Análisis Pareto"]
+
+@st.fragment
+@instrumentar(nombre='seccion.productos')
+def seccion_productos(figuras, pestanas):
+    """Pestañas de productos: solo la seleccionada genera su gráfico"""
+    pestana = st.segmented_control(
+        "Vista de productos",
+        pestanas,
+        default=pestanas[0],
+        key="pestana_productos",
+        label_visibility="collapsed"
+    ) or pestanas[0]
 
-    with tab4:
-        st.plotly_chart(
-            crear_waterfall_contribucion(productos, 10),
-            use_container_width=True
-        )
+    st.plotly_chart(
+        figuras.obtener(FIGURA_PESTANA[pestana]),
+        use_container_width=True
+    )
+    if pestana == "💰 Cascada Contribución":
         st.info("💡 **Insight:** Este gráfico muestra cómo cada producto contribuye al total de ventas.")
-
-    with tab5:
-        st.plotly_chart(
-            crear_grafico_pareto(productos),
-            use_container_width=True
-        )
+    elif pestana == "📊 Análisis Pareto":
         st.warning("⚠️ **Regla 80/20:** Identifica qué productos generan el 80% de tus ingresos.")
-else:
-    # En modo rápido, solo mostrar pestañas esenciales
-    tab1, tab2 = st.tabs(["📊 Top Ventas", "📈 Análisis Pareto"])
-    
-    with tab1:
-        st.plotly_chart(
-            crear_grafico_top_productos(productos, 'ventas_totales', 10),
-            use_container_width=True
-        )
-    
-    with tab2:
-        st.plotly_chart(
-            crear_grafico_pareto(productos),
-            use_container_width=True
-        )
+
+seccion_productos(figuras, PESTANAS_RAPIDAS if modo_rapido else PESTANAS_PRODUCTOS)
 
 # --- VISUALIZACIONES AVANZADAS ---
-if not modo_rapido and mostrar_graficos_pesados:
-    st.markdown("---")
-    st.markdown("## 🗺️ Visualizaciones Avanzadas")
+@st.fragment
+@instrumentar(nombre='seccion.avanzada')
+def seccion_avanzada(figuras):
+    """Sankey y treemap: se generan solo cuando el usuario abre la sección"""
+    if not st.toggle("Mostrar Sankey y mapa de productos", key="mostrar_avanzadas"):
+        st.caption("Activa la sección para generar el diagrama Sankey y el treemap.")
+        return
 
     col1, col2 = st.columns(2)
 
     with col1:
         with st.spinner('Generando diagrama Sankey...'):
             st.plotly_chart(
-                crear_sankey_segmentos(clientes_filtrados),
+                figuras.obtener('sankey'),
                 use_container_width=True
             )
 
     with col2:
         st.plotly_chart(
-            crear_treemap_productos(productos),
+            figuras.obtener('treemap'),
             use_container_width=True
         )
 
+if not modo_rapido and mostrar_graficos_pesados:
+    st.markdown("---")
+    st.markdown("## 🗺️ Visualizaciones Avanzadas")
+    seccion_avanzada(figuras)
+
 # --- HEATMAP ---
-if not modo_rapido:
-    st.markdown("## 🗓️ Patrón de Ventas Semanal")
+with medir('seccion.heatmap'):
+    if not modo_rapido:
+        st.markdown("## 🗓️ Patrón de Ventas Semanal")
+        st.plotly_chart(
+            figuras.obtener('heatmap'),
+            use_container_width=True
+        )
+
+# --- ANÁLISIS DE CORRELACIONES (AL FINAL) ---
+@st.fragment
+@instrumentar(nombre='seccion.correlaciones')
+def seccion_correlaciones(figuras, periodo):
+    """Mapa de correlaciones y correlación en el tiempo: se calculan solo al abrir la sección"""
+    if not st.toggle("Mostrar mapa de correlaciones", key="mostrar_correlaciones"):
+        st.caption("Activa la sección para calcular las correlaciones del período.")
+        return
+
+    columnas = periodo['correlaciones'].columnas
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.segmented_control("Método", ["pearson", "spearman"], key="correlacion_metodo",
+                             format_func=str.title)
+    with col2:
+        st.selectbox("Métrica A", columnas, key="correlacion_a", format_func=lambda c: NOMBRES_LEGIBLES.get(c, c))
+    with col3:
+        st.selectbox("Métrica B", columnas, key="correlacion_b", format_func=lambda c: NOMBRES_LEGIBLES.get(c, c))
+    with col4:
+        st.segmented_control("Ventana (días)", VENTANAS_RODANTES, key="correlacion_ventana")
+
+    # Al cambiar una opción solo se reejecuta este fragment: las llamadas se arman aquí
+    # y salen del índice de correlaciones ya cacheado (sin recalcular sobre los KPIs)
+    llamadas = plan_correlaciones(periodo, opciones_correlacion())
+    st.plotly_chart(
+        figuras.obtener('correlaciones', llamadas['correlaciones']),
+        use_container_width=True
+    )
     st.plotly_chart(
-        crear_heatmap_ventas_mensual(kpis_filtrado),
+        figuras.obtener('correlacion_rodante', llamadas['correlacion_rodante']),
         use_container_width=True
     )
 
-# --- ANÁLISIS DE CORRELACIONES (AL FINAL) ---
 if not modo_rapido and mostrar_graficos_pesados:
     st.markdown("---")
     st.markdown("## 🔗 Mapa de Correlaciones")
-    with st.spinner('Calculando correlaciones...'):
-        st.plotly_chart(
-            crear_mapa_correlaciones(kpis_filtrado),
-            use_container_width=True
-        )
+    seccion_correlaciones(figuras, periodo)
 
 # --- OBJETIVOS (AL FINAL) ---
 st.markdown("---")
 st.markdown("## 🎯 Progreso vs Objetivos")
 
-# Objetivos más realistas basados en tus datos
-objetivos = {
-    'ventas': 5000000,      # 5 millones
-    'pedidos': 250000,      # 250 mil pedidos (ajustado)
-    'clientes': 15000       # 15 mil clientes (ajustado)
-}
-
-st.plotly_chart(
-    crear_grafico_progreso_objetivos(metricas_filtradas, objetivos),
-    use_container_width=True
-)
+with medir('seccion.objetivos'):
+    st.plotly_chart(
+        figuras.obtener('objetivos'),
+        use_container_width=True
+    )
 
 # --- FOOTER ---
 st.markdown("---")
@@ -961,4 +930,24 @@ setTimeout(forceSidebarTitleColor, 3000);
 const observer = new MutationObserver(forceSidebarTitleColor);
 observer.observe(document.body, { childList: true, subtree: true });
 </script>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# --- PANEL DE RENDIMIENTO (opt-in con SANO_FRESCO_INSTRUMENTACION=1) ---
+if instrumentacion.HABILITADA:
+    with st.sidebar.expander("⏱️ Rendimiento", expanded=False):
+        resumen = registro.resumen()
+        if resumen:
+            columnas = ['llamadas', 'ms_p50', 'ms_p90', 'ms_p99', 'memoria_kb_p90', 'figura_bytes_p50']
+            tabla = pd.DataFrame.from_dict(resumen, orient='index').reindex(columns=columnas)
+            st.dataframe(tabla.sort_values('ms_p90', ascending=False), use_container_width=True)
+        cache = cache_figuras.estadisticas()
+        st.caption(f"Cache de figuras: {cache['figuras']} figuras, {cache['bytes'] / 1024 / 1024:.1f} MB, "
+                   f"{cache['aciertos']} aciertos / {cache['fallos']} fallos")
+        st.download_button("JSON", data=registro.a_json, file_name="rendimiento.json",
+                           mime="application/json")
+        st.download_button("Prometheus", data=registro.a_prometheus, file_name="rendimiento.prom",
+                           mime="text/plain")
+        if st.button("Reiniciar mediciones"):
+            registro.reiniciar()
+    if instrumentacion.ARCHIVO_METRICAS:
+        registro.escribir_prometheus(instrumentacion.ARCHIVO_METRICAS)
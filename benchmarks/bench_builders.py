@@ -0,0 +1,268 @@
+"""Benchmark de los constructores crear_* y de las funciones de metrics a distintas escalas
+
+Genera kpis_diarios, analisis_clientes y analisis_productos sintéticos con los
+esquemas reales y, para cada función, mide el tiempo (mínimo de varias
+corridas, sin el cache de figuras), el tamaño y el tiempo del JSON de la
+figura, y el pico de memoria con tracemalloc. Los resultados se guardan en un
+JSON para comparar entre commits.
+
+Uso:
+    python benchmarks/bench_builders.py --anios 1 5 20 --clientes 10000 1000000 \\
+        --productos 40 100000 --lineas 1000000 --salida resultados.json
+    python benchmarks/bench_builders.py --horario --comparar resultados_anteriores.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # noqa: E402
+import plotly.graph_objects as go  # noqa: E402
+
+from benchmarks.datos_sinteticos import (  # noqa: E402
+    generar_categorias, generar_clientes, generar_kpis, generar_lineas, generar_productos
+)
+from utils import visualizations as viz  # noqa: E402
+from utils.correlaciones import IndiceCorrelaciones  # noqa: E402
+from utils.cubos import CuboVentas  # noqa: E402
+from utils.data_store import aplicar_esquema  # noqa: E402
+from utils.figure_cache import cache_figuras  # noqa: E402
+from utils.fuente_sql import FuenteSQL, exportar_a_sql  # noqa: E402
+from utils.hechos import TablaHechos  # noqa: E402
+from utils.metrics import (  # noqa: E402
+    calcular_crecimiento, calcular_metricas_globales, calcular_tendencia,
+    construir_indice_acumulado, filtrar_rango_fechas, identificar_productos_estrella,
+    segmentar_clientes_valor
+)
+from utils.ranking import RankingProductos  # noqa: E402
+from utils.rfm import calcular_rfm  # noqa: E402
+
+OBJETIVOS = {'ventas': 5000000, 'pedidos': 250000, 'clientes': 15000}
+
+
+def _constructor(nombre):
+    """El crear_* sin memoización, para medir el costo real de construir la figura"""
+    funcion = getattr(viz, nombre)
+    return getattr(funcion, 'sin_cache', funcion)
+
+
+def casos_kpis(kpis):
+    indice = construir_indice_acumulado(kpis)
+    cubo = CuboVentas.desde_kpis(kpis)
+    correlaciones = IndiceCorrelaciones.desde_kpis(kpis)
+
+    def sin_lru(consulta, *args):
+        # El costo de una consulta nueva, no el de leerla del LRU del índice
+        correlaciones._resultados.clear()
+        return consulta(*args)
+
+    # Un rango que corta meses y semanas por la mitad (consulta con bordes)
+    desde = kpis['fecha'].iloc[len(kpis) // 10]
+    hasta = kpis['fecha'].iloc[len(kpis) * 9 // 10]
+    metricas = calcular_metricas_globales(kpis)
+    return {
+        'calcular_metricas_globales': lambda: calcular_metricas_globales(kpis),
+        'calcular_metricas_globales[indice]': lambda: calcular_metricas_globales(kpis, desde, hasta, indice=indice),
+        'construir_indice_acumulado': lambda: construir_indice_acumulado(kpis),
+        'filtrar_rango_fechas': lambda: filtrar_rango_fechas(kpis, desde, hasta),
+        'calcular_tendencia': lambda: calcular_tendencia(indice, desde, hasta),
+        'calcular_crecimiento': lambda: calcular_crecimiento(kpis),
+        'CuboVentas.desde_kpis': lambda: CuboVentas.desde_kpis(kpis),
+        'CuboVentas.consultar': lambda: cubo.consultar(kpis, desde, hasta),
+        'crear_grafico_tendencia_ventas': lambda: _constructor('crear_grafico_tendencia_ventas')(kpis),
+        'crear_heatmap_ventas_mensual': lambda: _constructor('crear_heatmap_ventas_mensual')(kpis),
+        'IndiceCorrelaciones.desde_kpis': lambda: IndiceCorrelaciones.desde_kpis(kpis),
+        'IndiceCorrelaciones.matriz': lambda: sin_lru(correlaciones.matriz, desde, hasta),
+        'IndiceCorrelaciones.matriz[spearman]': lambda: sin_lru(correlaciones.matriz, desde, hasta, 'spearman'),
+        'IndiceCorrelaciones.rodante': lambda: sin_lru(
+            correlaciones.rodante, 'ticket_promedio', 'pedidos_unicos', 30),
+        'crear_mapa_correlaciones': lambda: _constructor('crear_mapa_correlaciones')(kpis),
+        'crear_grafico_correlacion_rodante': lambda: _constructor('crear_grafico_correlacion_rodante')(
+            correlaciones.rodante('ticket_promedio', 'pedidos_unicos', 30), 'ticket_promedio', 'pedidos_unicos', 30),
+        'crear_analisis_estacionalidad': lambda: _constructor('crear_analisis_estacionalidad')(kpis),
+        'crear_grafico_progreso_objetivos': lambda: _constructor('crear_grafico_progreso_objetivos')(
+            metricas, OBJETIVOS),
+        'crear_gauge_chart': lambda: _constructor('crear_gauge_chart')(
+            metricas['ventas_totales'], OBJETIVOS['ventas'], 'Ventas'),
+    }
+
+
+def casos_clientes(clientes):
+    segmentados = segmentar_clientes_valor(clientes)
+    base = exportar_a_sql(Path(tempfile.mkdtemp()) / 'bench.sqlite', datasets={'analisis_clientes': clientes})
+
+    def resumen_con_rfm():
+        # Lo que hace el dashboard con los CSV: segmentar todo el frame y agrupar
+        segmentos = calcular_rfm(clientes)['segmento_rfm']
+        return clientes.groupby(segmentos, observed=True)['gasto_total'].agg(['count', 'sum'])
+
+    return {
+        'segmentar_clientes_valor': lambda: segmentar_clientes_valor(clientes),
+        'segmentar_clientes_valor[aproximado]': lambda: segmentar_clientes_valor(clientes, aproximado=True),
+        'calcular_rfm': lambda: calcular_rfm(clientes),
+        'crear_grafico_distribucion_clientes': lambda: _constructor('crear_grafico_distribucion_clientes')(
+            segmentados),
+        'crear_sankey_segmentos': lambda: _constructor('crear_sankey_segmentos')(segmentados),
+        'resumen_segmentos[pandas]': resumen_con_rfm,
+        # Fuente nueva en cada corrida: se mide la consulta, no el LRU de resultados
+        'FuenteSQL.resumen_segmentos': lambda: FuenteSQL(base).resumen_segmentos(),
+    }
+
+
+def casos_productos(productos):
+    ranking = RankingProductos(productos)
+    categorias = generar_categorias(productos)
+    return {
+        'RankingProductos': lambda: RankingProductos(productos),
+        'identificar_productos_estrella': lambda: identificar_productos_estrella(productos),
+        'identificar_productos_estrella[ranking]': lambda: identificar_productos_estrella(productos, ranking=ranking),
+        'crear_grafico_top_productos': lambda: _constructor('crear_grafico_top_productos')(productos),
+        'crear_grafico_ranking_productos': lambda: _constructor('crear_grafico_ranking_productos')(
+            productos, 'ventas_totales', 'Ventas Totales ($)', '#0891b2', '<b>$%{text:,.0f}</b>', 15),
+        'crear_waterfall_contribucion': lambda: _constructor('crear_waterfall_contribucion')(productos, 10),
+        'crear_waterfall_contribucion[ranking]': lambda: _constructor('crear_waterfall_contribucion')(
+            productos, 10, ranking=ranking),
+        'crear_treemap_productos': lambda: _constructor('crear_treemap_productos')(productos),
+        'crear_treemap_productos[categorias]': lambda: _constructor('crear_treemap_productos')(
+            productos, categorias, ranking=ranking),
+        'crear_grafico_pareto': lambda: _constructor('crear_grafico_pareto')(productos),
+    }
+
+
+def casos_lineas(lineas):
+    tabla = TablaHechos(lineas)
+    productos = list(tabla.productos[:5])
+    clientes = list(tabla.clientes[:1000])
+    por_dia = tabla.sketches_clientes('dia')
+    desde, hasta = tabla.fechas[len(tabla) // 4], tabla.fechas[-len(tabla) // 4]
+    return {
+        'TablaHechos': lambda: TablaHechos(lineas),
+        'TablaHechos.kpis': lambda: tabla.kpis(),
+        'TablaHechos.kpis[h]': lambda: tabla.kpis(frecuencia='h'),
+        'TablaHechos.kpis[productos]': lambda: tabla.kpis(productos=productos),
+        'TablaHechos.analisis_productos': lambda: tabla.analisis_productos(),
+        'TablaHechos.analisis_productos[clientes]': lambda: tabla.analisis_productos(clientes=clientes),
+        'TablaHechos.analisis_clientes': lambda: tabla.analisis_clientes(),
+        'TablaHechos.sketches_clientes[dia]': lambda: tabla.sketches_clientes('dia'),
+        'TablaHechos.sketches_clientes[producto]': lambda: tabla.sketches_clientes('producto'),
+        'SketchesClientes.contar_rango': lambda: por_dia.contar_rango(desde, hasta),
+        # Referencia exacta del mismo rango (lo que el sketch evita)
+        'TablaHechos.kpis[rango]': lambda: tabla.kpis(desde, hasta),
+    }
+
+
+def medir(funcion, repeticiones):
+    """Tiempo mínimo, pico de memoria y (si es figura) tamaño y tiempo del JSON"""
+    cache_figuras.limpiar()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    # El pico se mide aparte: tracemalloc enlentece cada asignación
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    medicion = {'ms': min(tiempos) * 1000, 'pico_mb': pico / 1024 / 1024}
+    if isinstance(resultado, go.Figure):
+        inicio = time.perf_counter()
+        texto = resultado.to_json()
+        medicion['json_ms'] = (time.perf_counter() - inicio) * 1000
+        medicion['json_bytes'] = len(texto)
+    return medicion
+
+
+def correr(dataset, tamano, datos, casos, repeticiones, solo):
+    resultados = []
+    for funcion, llamada in casos(datos).items():
+        if solo and not any(s in funcion for s in solo):
+            continue
+        fila = {'dataset': dataset, 'tamano': tamano, 'filas': len(datos), 'funcion': funcion}
+        try:
+            fila.update(medir(llamada, repeticiones))
+        except Exception as e:  # Justamente queremos ver qué se cae al crecer los datos
+            fila['error'] = f'{type(e).__name__}: {e}'
+        resultados.append(fila)
+        detalle = fila.get('error') or (
+            f"{fila['ms']:9.1f} ms  pico {fila['pico_mb']:8.1f} MB"
+            + (f"  json {fila['json_bytes'] / 1024:9.1f} KB" if 'json_bytes' in fila else '')
+        )
+        print(f"  {dataset:<10} {tamano:>10}  {funcion:<40} {detalle}", flush=True)
+    return resultados
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).resolve().parent, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar(resultados, ruta_anterior):
+    """Imprime la razón de tiempos contra una corrida anterior (>1 = más lento ahora)"""
+    anterior = json.loads(Path(ruta_anterior).read_text(encoding='utf-8'))
+    previos = {(r['dataset'], r['tamano'], r['funcion']): r for r in anterior['resultados'] if 'ms' in r}
+    print(f"\nComparación contra {anterior.get('commit') or ruta_anterior}:")
+    for r in resultados:
+        previo = previos.get((r['dataset'], r['tamano'], r['funcion']))
+        if previo is None or 'ms' not in r:
+            continue
+        razon = r['ms'] / previo['ms'] if previo['ms'] else float('inf')
+        marca = '  <-- más lento' if razon > 1.2 else ''
+        print(f"  {r['dataset']:<10} {r['tamano']:>10}  {r['funcion']:<40} x{razon:6.2f}{marca}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--anios', type=float, nargs='*', default=[1, 5, 20])
+    parser.add_argument('--horario', action='store_true', help='KPIs por hora en vez de diarios')
+    parser.add_argument('--clientes', type=int, nargs='*', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--productos', type=int, nargs='*', default=[40, 1_000, 100_000])
+    parser.add_argument('--lineas', type=int, nargs='*', default=[1_000_000, 10_000_000])
+    parser.add_argument('--repeticiones', type=int, default=3)
+    parser.add_argument('--solo', nargs='*', help='Medir solo las funciones que contengan estos textos')
+    parser.add_argument('--salida', default='bench_builders.json')
+    parser.add_argument('--comparar', help='JSON de una corrida anterior')
+    args = parser.parse_args()
+
+    frecuencia = 'h' if args.horario else 'D'
+    resultados = []
+    for anios in args.anios:
+        kpis = aplicar_esquema(generar_kpis(anios, frecuencia), 'kpis_diarios')
+        resultados += correr('kpis', f'{anios:g}a{frecuencia}', kpis, casos_kpis, args.repeticiones, args.solo)
+    for n in args.clientes:
+        clientes = aplicar_esquema(generar_clientes(n), 'analisis_clientes')
+        resultados += correr('clientes', n, clientes, casos_clientes, args.repeticiones, args.solo)
+    for n in args.productos:
+        productos = aplicar_esquema(generar_productos(n), 'analisis_productos')
+        resultados += correr('productos', n, productos, casos_productos, args.repeticiones, args.solo)
+    for n in args.lineas:
+        lineas = aplicar_esquema(generar_lineas(n), 'lineas_pedidos')
+        resultados += correr('lineas', n, lineas, casos_lineas, args.repeticiones, args.solo)
+
+    salida = {
+        'commit': _commit_actual(),
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'resultados': resultados,
+    }
+    Path(args.salida).write_text(json.dumps(salida, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"\nResultados en {args.salida}")
+    if args.comparar:
+        comparar(resultados, args.comparar)
+
+
+if __name__ == '__main__':
+    main()
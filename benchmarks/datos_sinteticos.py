@@ -0,0 +1,91 @@
+"""Generadores de datos sintéticos con los mismos esquemas que los CSV de data/"""
+import numpy as np
+import pandas as pd
+
+
+def generar_clientes(n, semilla=0):
+    """analisis_clientes sintético con n clientes"""
+    rng = np.random.default_rng(semilla)
+    primera = pd.Timestamp('2023-01-01') + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    ultima = primera + pd.to_timedelta(rng.integers(0, 365, n), unit='D')
+    return pd.DataFrame({
+        'id_cliente': np.arange(1, n + 1, dtype='int64'),
+        'gasto_total': rng.gamma(2.0, 60.0, n).round(2),
+        'num_pedidos': rng.integers(1, 40, n, dtype='int32'),
+        'primera_compra': primera,
+        'ultima_compra': ultima,
+    })
+
+
+def generar_kpis(anios=1, frecuencia='D', semilla=0):
+    """kpis_diarios sintético con 'anios' de historia (frecuencia 'D' diaria u 'h' horaria)"""
+    rng = np.random.default_rng(semilla)
+    fechas = pd.date_range('2023-01-01', periods=int(365 * anios * (24 if frecuencia == 'h' else 1)),
+                           freq=frecuencia)
+    n = len(fechas)
+    escala = 1 / 24 if frecuencia == 'h' else 1
+    # Estacionalidad semanal y anual sobre un nivel base con ruido
+    estacional = 1 + 0.15 * np.sin(2 * np.pi * fechas.dayofyear / 365) + 0.1 * (fechas.dayofweek >= 5)
+    pedidos = np.maximum(rng.normal(55_000 * escala, 6_000 * escala, n) * estacional, 1).astype('int32')
+    clientes = (pedidos * rng.uniform(0.97, 1.0, n)).astype('int32')
+    unidades = (pedidos * rng.normal(5.0, 0.05, n)).astype('int32')
+    ventas = (pedidos * rng.normal(7.9, 0.3, n)).round(2)
+    return pd.DataFrame({
+        'fecha': fechas,
+        'ventas_totales': ventas,
+        'pedidos_unicos': pedidos,
+        'clientes_unicos': clientes,
+        'unidades_vendidas': unidades,
+        'ticket_promedio': (ventas / pedidos).astype('float32'),
+        'productos_por_pedido': (unidades / pedidos).astype('float32'),
+    })
+
+
+def generar_productos(n, semilla=0):
+    """analisis_productos sintético con n SKUs (ventas con cola larga tipo Zipf)"""
+    rng = np.random.default_rng(semilla)
+    unidades = (2_000_000 / np.arange(1, n + 1) ** 0.9 * rng.uniform(0.5, 1.5, n)).astype('int32') + 1
+    precio = rng.uniform(0.5, 12.0, n).round(2).astype('float32')
+    nombres = pd.Categorical([f'Producto {i:06d}' for i in range(1, n + 1)])
+    return pd.DataFrame({
+        'nombre_producto': nombres,
+        'ventas_totales': (unidades * precio).astype('float64').round(2),
+        'unidades_vendidas': unidades,
+        'pedidos_unicos': (unidades * rng.uniform(0.15, 0.3, n)).astype('int32') + 1,
+        'precio_promedio': precio,
+        'ventas_por_unidad': precio,
+    })
+
+
+def generar_categorias(productos_df, n_categorias=12, subcategorias_por_categoria=8, semilla=0):
+    """categorias_productos sintético: cada SKU en una subcategoría al azar"""
+    rng = np.random.default_rng(semilla)
+    n = len(productos_df)
+    categoria = rng.integers(0, n_categorias, n)
+    subcategoria = rng.integers(0, subcategorias_por_categoria, n)
+    return pd.DataFrame({
+        'nombre_producto': productos_df['nombre_producto'],
+        'categoria': pd.Categorical([f'Categoría {c:02d}' for c in categoria]),
+        'subcategoria': pd.Categorical([f'Subcategoría {c:02d}.{s}' for c, s in zip(categoria, subcategoria)]),
+    })
+
+
+def generar_lineas(n, clientes=100_000, productos=1_000, dias=365, semilla=0):
+    """lineas_pedidos sintético con n líneas (unas 5 por pedido, productos con cola larga)"""
+    rng = np.random.default_rng(semilla)
+    n_pedidos = max(n // 5, 1)
+    pedido = np.sort(rng.integers(0, n_pedidos, n))
+    # Cada pedido es de un cliente y ocurre en un instante: se toman por pedido y se expanden
+    cliente_pedido = rng.integers(1, clientes + 1, n_pedidos)
+    segundos_pedido = np.sort(rng.integers(0, dias * 86_400, n_pedidos))
+    producto = np.minimum(rng.zipf(1.3, n), productos) - 1
+    precio_producto = rng.uniform(0.5, 12.0, productos).round(2)
+    return pd.DataFrame({
+        'id_pedido': pedido + 1,
+        'id_cliente': cliente_pedido[pedido],
+        'nombre_producto': pd.Categorical.from_codes(
+            producto, [f'Producto {i:06d}' for i in range(1, productos + 1)]),
+        'cantidad': rng.integers(1, 4, n, dtype='int32'),
+        'precio': precio_producto[producto],
+        'fecha': pd.Timestamp('2023-01-01') + pd.to_timedelta(segundos_pedido[pedido], unit='s'),
+    })
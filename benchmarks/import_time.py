@@ -0,0 +1,92 @@
+"""Mide el tiempo de importación de los módulos que carga el dashboard al arrancar
+
+Corre `python -X importtime` en un proceso nuevo (varias veces, se toma el
+mínimo) y falla con código 1 si el total supera el presupuesto o si al
+arrancar se cargan módulos pesados que solo deben importarse bajo demanda.
+
+Uso:
+    python benchmarks/import_time.py --presupuesto-ms 1200
+"""
+import argparse
+import ast
+import subprocess
+import sys
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+APP = RAIZ / 'app.py'
+
+# Módulos que solo se cargan cuando se construye el gráfico que los necesita
+PROHIBIDOS_AL_ARRANCAR = ['scipy', 'plotly.express', 'plotly.figure_factory']
+
+
+def modulos_arranque(app=APP):
+    """Módulos de utils que app.py importa al iniciar (sentencias import de primer nivel)"""
+    modulos = []
+    for nodo in ast.parse(app.read_text(encoding='utf-8')).body:
+        if isinstance(nodo, ast.Import):
+            nombres = [alias.name for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module == 'utils':
+            # from utils import instrumentacion
+            nombres = [f'utils.{alias.name}' for alias in nodo.names]
+        elif isinstance(nodo, ast.ImportFrom) and nodo.module:
+            nombres = [nodo.module]
+        else:
+            continue
+        modulos += [m for m in nombres if m.startswith('utils.') and m not in modulos]
+    return modulos
+
+
+def medir_importacion(modulos):
+    """(ms totales, {módulo: ms acumulados}) de importar 'modulos' en un proceso limpio"""
+    codigo = f"import sys; sys.path.insert(0, {str(RAIZ)!r}); " + '; '.join(f'import {m}' for m in modulos)
+    salida = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', codigo],
+        capture_output=True, text=True, check=True
+    ).stderr
+
+    acumulados = {}
+    total_us = 0
+    for linea in salida.splitlines():
+        if not linea.startswith('import time:') or 'cumulative' in linea:
+            continue
+        # Formato: "import time: <propio us> | <acumulado us> | <sangría><módulo>"
+        _, acumulado, nombre = linea.split('|')
+        acumulado_us = int(acumulado)
+        acumulados[nombre.strip()] = acumulado_us / 1000
+        # Las entradas sin sangría (un solo espacio) son importaciones de primer nivel
+        if not nombre.startswith('  '):
+            total_us += acumulado_us
+    return total_us / 1000, acumulados
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--presupuesto-ms', type=float, default=1200.0)
+    parser.add_argument('--repeticiones', type=int, default=3)
+    args = parser.parse_args()
+
+    modulos = modulos_arranque()
+    # La primera corrida además compila .pyc y calienta el cache de disco
+    medir_importacion(modulos)
+    corridas = [medir_importacion(modulos) for _ in range(args.repeticiones)]
+    total, acumulados = min(corridas, key=lambda c: c[0])
+
+    print(f"Importación al arrancar: {total:.0f} ms (presupuesto {args.presupuesto_ms:.0f} ms)")
+    for modulo in modulos:
+        print(f"  {modulo:<24} {acumulados.get(modulo, 0):8.1f} ms")
+
+    fallas = []
+    cargados = [p for p in PROHIBIDOS_AL_ARRANCAR if p in acumulados]
+    if cargados:
+        fallas.append(f"se importan al arrancar: {', '.join(cargados)}")
+    if total > args.presupuesto_ms:
+        fallas.append(f"{total:.0f} ms supera el presupuesto de {args.presupuesto_ms:.0f} ms")
+    for falla in fallas:
+        print(f"FALLA: {falla}")
+    return 1 if fallas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+"""Mide la memoria que agrega cada sesión al cargar analisis_clientes
+
+Compara el modo copia (lo que hace st.cache_data: pickle + copia por sesión)
+con el modo memory-map (cargar_dataset_mmap). Se reporta RSS y memoria anónima
+(heap propio del proceso; las páginas del archivo mapeado son de page cache y se
+comparten entre procesos). En modo mmap la memoria anónima por sesión debe
+quedar cerca de cero.
+
+Uso:
+    python benchmarks/rss_sesiones.py --clientes 2000000 --sesiones 8
+"""
+import argparse
+import gc
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.datos_sinteticos import generar_clientes  # noqa: E402
+from utils import data_store  # noqa: E402
+from utils.metrics import segmentar_clientes_valor  # noqa: E402
+
+
+def memoria_mb():
+    """(RSS, memoria anónima) del proceso actual en MB según /proc/self/smaps_rollup"""
+    valores = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for linea in f:
+            partes = linea.split()
+            if len(partes) >= 2 and partes[0].endswith(':'):
+                valores[partes[0][:-1]] = int(partes[1])
+    return valores.get('Rss', 0) / 1024, valores.get('Anonymous', 0) / 1024
+
+
+def abrir_sesion(modo, base):
+    """Lo que recibe una sesión nueva en cada modo, ya segmentado"""
+    if modo == 'copia':
+        df = pickle.loads(pickle.dumps(base))
+    else:
+        df = data_store.cargar_dataset_mmap('analisis_clientes')
+    df = segmentar_clientes_valor(df)
+    df['gasto_total'].sum()  # Tocar los datos como lo haría un gráfico
+    return df
+
+
+def medir(modo, sesiones):
+    base = data_store.cargar_dataset('analisis_clientes') if modo == 'copia' else None
+    # Calentamiento: imports y conversión a Arrow no cuentan como costo por sesión
+    abrir_sesion(modo, base)
+    gc.collect()
+    rss0, anon0 = memoria_mb()
+    vivas = []
+    for i in range(sesiones):
+        vivas.append(abrir_sesion(modo, base))
+        rss, anon = memoria_mb()
+        print(f'{modo:6s} sesión {i + 1:2d}: RSS +{rss - rss0:8.1f} MB | anónima +{anon - anon0:8.1f} MB')
+    rss, anon = memoria_mb()
+    print(f'{modo:6s} promedio por sesión: anónima +{(anon - anon0) / sesiones:.1f} MB\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clientes', type=int, default=1_000_000)
+    parser.add_argument('--sesiones', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_store.DATA_DIR = Path(tmp)
+        data_store.CACHE_DIR = Path(tmp) / '.cache'
+        generar_clientes(args.clientes).to_csv(data_store.ruta_csv('analisis_clientes'), index=False)
+        for modo in ('copia', 'mmap'):
+            medir(modo, args.sesiones)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""Precalcula los artefactos del dashboard fuera de Streamlit (para un job programado)
+
+Métricas globales, cortes de segmentación, RFM, Pareto, correlaciones,
+heatmap, crecimiento mensual, top de productos y el JSON de todas las figuras
+de la vista inicial quedan en data/.cache/artefactos/<versión de datos>/.
+app.py los carga al arrancar y solo recalcula lo que cambie con los filtros.
+
+Con --lineas, antes se regeneran kpis_diarios, analisis_productos y
+analisis_clientes desde las líneas de pedido de data/lineas_pedidos.csv.
+Con --sql, los CSV se copian además a una base SQLite (o DuckDB, si la ruta
+termina en .duckdb) que el dashboard usa con SANO_FRESCO_SQL=<ruta>.
+
+Uso:
+    python precalcular.py
+    python precalcular.py --sin-figuras --conservar 3
+    python precalcular.py --lineas --horario
+    python precalcular.py --sql data/sano_fresco.sqlite
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from utils.fuente_sql import exportar_a_sql  # noqa: E402
+from utils.hechos import exportar_agregados  # noqa: E402
+from utils.precalculo import VERSIONES_CONSERVADAS, precalcular  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sin-figuras', action='store_true', help='Solo datos, sin el JSON de las figuras')
+    parser.add_argument('--conservar', type=int, default=VERSIONES_CONSERVADAS,
+                        help='Versiones de artefactos que se mantienen en disco')
+    parser.add_argument('--lineas', action='store_true',
+                        help='Regenerar los tres CSV agregados desde data/lineas_pedidos.csv')
+    parser.add_argument('--horario', action='store_true', help='Con --lineas: kpis_diarios por hora')
+    parser.add_argument('--sql', metavar='RUTA', help='Copiar los CSV a una base SQLite/DuckDB en RUTA')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    try:
+        if args.lineas:
+            for ruta in exportar_agregados(frecuencia='h' if args.horario else 'D'):
+                print(f"📄 {ruta.name} regenerado desde las líneas de pedido")
+        if args.sql:
+            print(f"🗄️ Base {exportar_a_sql(args.sql)} actualizada desde los CSV")
+        version, ruta = precalcular(con_figuras=not args.sin_figuras, conservar=args.conservar)
+    except FileNotFoundError as e:
+        print(f"❌ Error cargando archivos: {e}", file=sys.stderr)
+        return 1
+    print(f"✅ Artefactos de la versión {version} en {ruta} ({time.perf_counter() - inicio:.1f} s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
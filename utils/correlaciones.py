@@ -0,0 +1,199 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import _posiciones_rango
+
+# Métricas de kpis_diarios que entran al mapa de correlaciones
+COLUMNAS_CORRELACION = [
+    'ventas_totales', 'pedidos_unicos', 'ticket_promedio',
+    'productos_por_pedido', 'clientes_unicos'
+]
+
+NOMBRES_LEGIBLES = {
+    'ventas_totales': '💰 Ventas',
+    'pedidos_unicos': '🛒 Pedidos',
+    'ticket_promedio': '🎫 Ticket Promedio',
+    'productos_por_pedido': '📦 Productos/Pedido',
+    'clientes_unicos': '👥 Clientes'
+}
+
+# Vista "correlación en el tiempo" por defecto: ticket vs. pedidos en ventanas de 30 días
+OPCIONES_CORRELACION = {
+    'metodo': 'pearson',
+    'par': ('ticket_promedio', 'pedidos_unicos'),
+    'ventana': 30
+}
+VENTANAS_RODANTES = [7, 30, 90]
+
+# Matrices, rangos de Spearman y series rodantes que se conservan por índice
+MAX_RESULTADOS = 32
+
+
+def _pearson_de_sumas(n, suma_x, suma_xx, suma_xy):
+    """r de Pearson desde n, Σx, Σx² y Σxy (escalares o arreglos alineados)"""
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cov = suma_xy - suma_x[0] * suma_x[1] / n
+        var_a = suma_xx[0] - suma_x[0] ** 2 / n
+        var_b = suma_xx[1] - suma_x[1] ** 2 / n
+        r = cov / np.sqrt(var_a * var_b)
+    return np.clip(r, -1.0, 1.0)
+
+
+def p_valores(r, n):
+    """p-valor bilateral de H0: ρ = 0 para cada r (t de Student con n - 2 grados de libertad)
+
+    Es el mismo test de scipy.stats.pearsonr, vectorizado sobre toda la matriz.
+    Para Spearman es la aproximación t que usa scipy.stats.spearmanr.
+    """
+    from scipy.special import stdtr  # scipy pesa: solo se importa al pedir p-valores
+
+    r = np.asarray(r, dtype='float64')
+    gl = np.asarray(n, dtype='float64') - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = r * np.sqrt(gl / ((1.0 - r) * (1.0 + r)))
+        p = 2 * stdtr(gl, -np.abs(t))
+    p = np.where(np.abs(r) >= 1.0, 0.0, p)
+    return np.where(gl > 0, p, np.nan)
+
+
+class IndiceCorrelaciones:
+    """Co-momentos acumulados de las métricas de kpis_diarios (Σx, Σx·y y cantidad por fila)
+
+    La matriz de Pearson de cualquier rango sale de dos lecturas por par y
+    las correlaciones rodantes de toda la serie de una sola resta vectorizada.
+    Los valores se centran en la media del primer lote: no cambia ningún r y
+    evita perder precisión al restar sumas grandes. Las filas con algún nulo
+    en las columnas no cuentan (igual que dropna() antes de corr()).
+
+    Las filas nuevas se agregan sin recalcular lo anterior (cola() da lo que
+    suman; IngestorKpis lo anexa a sus buffers). Los resultados (matrices por
+    rango y método, rangos de Spearman y series rodantes) quedan en un LRU
+    propio: un índice nuevo es una versión nueva.
+    """
+
+    def __init__(self, fechas, columnas, centro, valores, acum_n, acum_x, acum_xy):
+        self.fechas = fechas
+        self.columnas = list(columnas)
+        self.centro = centro
+        self._valores = valores      # (n, k) centrados, NaN en filas inválidas
+        self._acum_n = acum_n        # (n + 1,)
+        self._acum_x = acum_x        # (n + 1, k)
+        self._acum_xy = acum_xy      # (n + 1, k, k)
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_kpis(cls, kpis_df, columnas=COLUMNAS_CORRELACION, centro=None):
+        """Índice de kpis_df (ordenado por fecha) con las columnas presentes"""
+        columnas = [c for c in columnas if c in kpis_df.columns]
+        valores = kpis_df[columnas].to_numpy(dtype='float64', na_value=np.nan)
+        validas = ~np.isnan(valores).any(axis=1)
+        if centro is None:
+            centro = np.nanmean(valores[validas], axis=0) if validas.any() else np.zeros(len(columnas))
+        valores = np.where(validas[:, None], valores - centro, np.nan)
+        x = np.where(validas[:, None], valores, 0.0)
+        # Se antepone una fila de ceros para que suma[i:j] = acumulado[j] - acumulado[i]
+        acum_n = np.concatenate(([0], np.cumsum(validas)))
+        acum_x = np.vstack((np.zeros((1, len(columnas))), np.cumsum(x, axis=0)))
+        acum_xy = np.concatenate((np.zeros((1, len(columnas), len(columnas))),
+                                  np.cumsum(x[:, :, None] * x[:, None, :], axis=0)))
+        return cls(pd.DatetimeIndex(kpis_df['fecha']), columnas, centro, valores, acum_n, acum_x, acum_xy)
+
+    def cola(self, nuevas_filas):
+        """(valores, acum_n, acum_x, acum_xy) que agregan las filas nuevas, ya desplazados por lo acumulado"""
+        nuevo = IndiceCorrelaciones.desde_kpis(nuevas_filas, self.columnas, centro=self.centro)
+        return (nuevo._valores, self._acum_n[-1] + nuevo._acum_n[1:], self._acum_x[-1] + nuevo._acum_x[1:],
+                self._acum_xy[-1] + nuevo._acum_xy[1:])
+
+    def _cacheado(self, clave, calcular):
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+        resultado = calcular()
+        with self._lock:
+            self._resultados[clave] = resultado
+            while len(self._resultados) > MAX_RESULTADOS:
+                self._resultados.popitem(last=False)
+        return resultado
+
+    def _pearson_rango(self, inicio, fin):
+        n = self._acum_n[fin] - self._acum_n[inicio]
+        suma_x = self._acum_x[fin] - self._acum_x[inicio]
+        suma_xy = self._acum_xy[fin] - self._acum_xy[inicio]
+        diagonal = np.diagonal(suma_xy)
+        r = _pearson_de_sumas(
+            n, (suma_x[:, None], suma_x[None, :]), (diagonal[:, None], diagonal[None, :]), suma_xy
+        )
+        np.fill_diagonal(r, 1.0)
+        return r, int(n)
+
+    def _rangos(self, inicio, fin):
+        """Rangos promedio (como rank()) de las filas válidas de [inicio, fin), cacheados"""
+        def calcular():
+            bloque = self._valores[inicio:fin]
+            bloque = bloque[~np.isnan(bloque).any(axis=1)]
+            return pd.DataFrame(bloque).rank().to_numpy()
+        return self._cacheado(('rangos', inicio, fin), calcular)
+
+    def matriz(self, desde=None, hasta=None, metodo='pearson'):
+        """(DataFrame de correlaciones, filas usadas) del rango [desde, hasta]
+
+        Pearson sale de las sumas prefijas en O(k²); Spearman es Pearson sobre
+        los rangos del período, que se calculan una vez por rango.
+        """
+        inicio, fin = _posiciones_rango(self.fechas, desde, hasta)
+
+        def calcular():
+            if metodo == 'spearman':
+                rangos = self._rangos(inicio, fin)
+                r, n = pd.DataFrame(rangos, columns=self.columnas).corr().to_numpy(), len(rangos)
+            else:
+                r, n = self._pearson_rango(inicio, fin)
+            return pd.DataFrame(r, index=self.columnas, columns=self.columnas), n
+
+        return self._cacheado(('matriz', metodo, inicio, fin), calcular)
+
+    def rodante(self, col_a, col_b, ventana=30, desde=None, hasta=None, min_filas=3):
+        """Correlación de Pearson de col_a vs. col_b en ventanas de 'ventana' días, para cada fecha
+
+        Cada ventana es (fecha - ventana días, fecha]; sus co-momentos son
+        restas del acumulado, así que toda la serie sale en una pasada. Las
+        ventanas que empiezan antes del período usan los días previos (no hay
+        arranque en blanco). Al inicio de los datos, sin la ventana completa, es NaN.
+        """
+        a, b = self.columnas.index(col_a), self.columnas.index(col_b)
+
+        def calcular():
+            fechas = self.fechas.to_numpy(dtype='datetime64[ns]')
+            fin = np.arange(1, len(fechas) + 1)
+            inicio = np.searchsorted(fechas, fechas - np.timedelta64(ventana, 'D'), side='right')
+            n = self._acum_n[fin] - self._acum_n[inicio]
+            suma_a = self._acum_x[fin, a] - self._acum_x[inicio, a]
+            suma_b = self._acum_x[fin, b] - self._acum_x[inicio, b]
+            r = _pearson_de_sumas(
+                n,
+                (suma_a, suma_b),
+                (self._acum_xy[fin, a, a] - self._acum_xy[inicio, a, a],
+                 self._acum_xy[fin, b, b] - self._acum_xy[inicio, b, b]),
+                self._acum_xy[fin, a, b] - self._acum_xy[inicio, a, b]
+            )
+            completa = fechas - fechas[:1] >= np.timedelta64(ventana - 1, 'D')
+            r = np.where((n >= min_filas) & completa, r, np.nan)
+            return pd.Series(r, index=self.fechas, name=f'{col_a}~{col_b}')
+
+        serie = self._cacheado(('rodante', a, b, ventana, min_filas), calcular)
+        inicio, fin = _posiciones_rango(self.fechas, desde, hasta)
+        return serie.iloc[inicio:fin]
+
+    def huella(self):
+        """Huella del contenido (para el cache de figuras)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.columnas, len(self.fechas))).encode())
+        h.update(self.fechas.asi8.tobytes())
+        h.update(np.ascontiguousarray(self._acum_xy[-1]).tobytes())
+        return h.hexdigest()
@@ -0,0 +1,202 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from utils.metrics import filtrar_rango_fechas
+
+# Métricas que se agregan en el cubo
+METRICAS_CUBO = ['ventas_totales', 'pedidos_unicos', 'clientes_unicos', 'unidades_vendidas']
+
+# Rango de códigos que abarca cualquier período (para _recortar)
+TODO = (-2 ** 40, 2 ** 40)
+
+
+def _codigos_fecha(fechas):
+    """(mes desde 1970-01, día de la semana con lunes=0, semana con inicio en lunes)"""
+    dias = fechas.astype('datetime64[D]').astype(np.int64)
+    meses = fechas.astype('datetime64[M]').astype(np.int64)
+    # 1970-01-01 fue jueves: desplazar 3 días deja el lunes en 0
+    return meses, (dias + 3) % 7, (dias + 3) // 7
+
+
+def _inicio_mes(codigo):
+    return pd.Timestamp(np.datetime64(int(codigo), 'M'))
+
+
+def _inicio_semana(codigo):
+    return pd.Timestamp(np.datetime64(int(codigo) * 7 - 3, 'D'))
+
+
+def _sumar_alineado(inicio_a, a, inicio_b, b):
+    """Suma dos arreglos de celdas cuyo eje 0 empieza en códigos distintos"""
+    if len(a) == 0:
+        return inicio_b, b.copy()
+    if len(b) == 0:
+        return inicio_a, a.copy()
+    inicio = min(inicio_a, inicio_b)
+    fin = max(inicio_a + len(a), inicio_b + len(b))
+    total = np.zeros((fin - inicio,) + a.shape[1:], dtype=a.dtype)
+    total[inicio_a - inicio:inicio_a - inicio + len(a)] += a
+    total[inicio_b - inicio:inicio_b - inicio + len(b)] += b
+    return inicio, total
+
+
+class CuboVentas:
+    """Rollup de los KPIs diarios en celdas mes × día de la semana y por semana
+
+    Guarda suma y cantidad de días por celda con códigos enteros (sin nombres
+    de día). Los cubos se pueden combinar, así una consulta por rango suma las
+    celdas de los meses completos y solo agrega desde las filas los bordes.
+    """
+
+    def __init__(self, metricas, mes0, sumas_mes, conteos_mes, semana0, sumas_semana, conteos_semana):
+        self.metricas = list(metricas)
+        self.mes0 = mes0
+        self.sumas_mes = sumas_mes          # metrica -> (n_meses, 7)
+        self.conteos_mes = conteos_mes      # metrica -> (n_meses, 7)
+        self.semana0 = semana0
+        self.sumas_semana = sumas_semana    # metrica -> (n_semanas,)
+        self.conteos_semana = conteos_semana
+
+    @classmethod
+    def desde_kpis(cls, kpis_df, metricas=METRICAS_CUBO):
+        """Construye el cubo con una pasada de np.bincount por métrica"""
+        metricas = [m for m in metricas if m in kpis_df.columns]
+        meses, dia_semana, semanas = _codigos_fecha(kpis_df['fecha'].to_numpy(dtype='datetime64[ns]'))
+        vacio = len(meses) == 0
+        mes0 = 0 if vacio else int(meses.min())
+        semana0 = 0 if vacio else int(semanas.min())
+        n_meses = 0 if vacio else int(meses.max()) - mes0 + 1
+        n_semanas = 0 if vacio else int(semanas.max()) - semana0 + 1
+        celda = (meses - mes0) * 7 + dia_semana
+        semana = semanas - semana0
+
+        sumas_mes, conteos_mes, sumas_semana, conteos_semana = {}, {}, {}, {}
+        for m in metricas:
+            valores = kpis_df[m].to_numpy(dtype='float64')
+            validos = ~np.isnan(valores)
+            valores = np.where(validos, valores, 0.0)
+            sumas_mes[m] = np.bincount(celda, valores, minlength=n_meses * 7).reshape(n_meses, 7)
+            conteos_mes[m] = np.bincount(celda, validos, minlength=n_meses * 7).reshape(n_meses, 7)
+            sumas_semana[m] = np.bincount(semana, valores, minlength=n_semanas)
+            conteos_semana[m] = np.bincount(semana, validos, minlength=n_semanas)
+        return cls(metricas, mes0, sumas_mes, conteos_mes, semana0, sumas_semana, conteos_semana)
+
+    def combinar(self, otro):
+        """Cubo con la suma de ambos (por ejemplo, historia + filas recién ingeridas)"""
+        metricas = [m for m in self.metricas if m in otro.metricas]
+        sumas_mes, conteos_mes, sumas_semana, conteos_semana = {}, {}, {}, {}
+        mes0 = semana0 = 0
+        for m in metricas:
+            mes0, sumas_mes[m] = _sumar_alineado(self.mes0, self.sumas_mes[m], otro.mes0, otro.sumas_mes[m])
+            _, conteos_mes[m] = _sumar_alineado(self.mes0, self.conteos_mes[m], otro.mes0, otro.conteos_mes[m])
+            semana0, sumas_semana[m] = _sumar_alineado(
+                self.semana0, self.sumas_semana[m], otro.semana0, otro.sumas_semana[m])
+            _, conteos_semana[m] = _sumar_alineado(
+                self.semana0, self.conteos_semana[m], otro.semana0, otro.conteos_semana[m])
+        return CuboVentas(metricas, mes0, sumas_mes, conteos_mes, semana0, sumas_semana, conteos_semana)
+
+    def _recortar(self, meses=None, semanas=None):
+        """Cubo con solo las celdas de [meses) y [semanas) (códigos absolutos); None = vacío"""
+        def corte(inicio, arreglos, rango):
+            if rango is None:
+                return inicio, {m: a[:0] for m, a in arreglos.items()}
+            a, b = max(rango[0] - inicio, 0), max(rango[1] - inicio, 0)
+            return inicio + a, {m: x[a:b] for m, x in arreglos.items()}
+
+        mes0, sumas_mes = corte(self.mes0, self.sumas_mes, meses)
+        _, conteos_mes = corte(self.mes0, self.conteos_mes, meses)
+        semana0, sumas_semana = corte(self.semana0, self.sumas_semana, semanas)
+        _, conteos_semana = corte(self.semana0, self.conteos_semana, semanas)
+        return CuboVentas(self.metricas, mes0, sumas_mes, conteos_mes, semana0, sumas_semana, conteos_semana)
+
+    def _cubo_bordes(self, kpis_df, desde, hasta, nucleo_ini, nucleo_fin):
+        """Cubo de las filas de [desde, hasta] que quedan fuera del núcleo [nucleo_ini, nucleo_fin)"""
+        if nucleo_ini >= nucleo_fin:
+            # Sin períodos completos todo el rango sale de las filas (a lo más dos períodos)
+            filas = filtrar_rango_fechas(kpis_df, desde, hasta)
+        else:
+            filas = pd.concat([
+                filtrar_rango_fechas(kpis_df, desde, nucleo_ini - pd.Timedelta(days=1)),
+                filtrar_rango_fechas(kpis_df, nucleo_fin, hasta)
+            ])
+        return CuboVentas.desde_kpis(filas, self.metricas)
+
+    def consultar(self, kpis_df, desde, hasta):
+        """Cubo del rango [desde, hasta]: celdas precalculadas + bordes parciales desde kpis_df"""
+        desde, hasta = pd.Timestamp(desde).normalize(), pd.Timestamp(hasta).normalize()
+        manana = hasta + pd.Timedelta(days=1)
+        (m_desde, m_manana), _, (s_desde, s_manana) = _codigos_fecha(
+            np.array([desde, manana], dtype='datetime64[ns]'))
+
+        # Meses y semanas completos dentro del rango
+        m_ini = int(m_desde) + (desde != _inicio_mes(m_desde))
+        m_fin = max(int(m_manana), m_ini)
+        s_ini = int(s_desde) + (desde != _inicio_semana(s_desde))
+        s_fin = max(int(s_manana), s_ini)
+
+        meses = self._recortar(meses=(m_ini, m_fin)).combinar(
+            self._cubo_bordes(kpis_df, desde, hasta, _inicio_mes(m_ini), _inicio_mes(m_fin))
+            ._recortar(meses=TODO))
+        semanas = self._recortar(semanas=(s_ini, s_fin)).combinar(
+            self._cubo_bordes(kpis_df, desde, hasta, _inicio_semana(s_ini), _inicio_semana(s_fin))
+            ._recortar(semanas=TODO))
+        return meses.combinar(semanas)
+
+    def huella(self):
+        """Huella del contenido (para el cache de figuras)"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(repr((self.metricas, self.mes0, self.semana0)).encode())
+        for m in self.metricas:
+            for arreglo in (self.sumas_mes[m], self.conteos_mes[m], self.sumas_semana[m], self.conteos_semana[m]):
+                h.update(np.ascontiguousarray(arreglo).tobytes())
+        return h.hexdigest()
+
+    # --- Lecturas para los gráficos ---
+
+    def _por_mes_del_anio(self, metrica):
+        """(sumas, conteos) de forma (12, 7): mes del año × día de la semana"""
+        mes_del_anio = (self.mes0 + np.arange(len(self.sumas_mes[metrica]))) % 12
+        sumas, conteos = np.zeros((12, 7)), np.zeros((12, 7))
+        np.add.at(sumas, mes_del_anio, self.sumas_mes[metrica])
+        np.add.at(conteos, mes_del_anio, self.conteos_mes[metrica])
+        return sumas, conteos
+
+    def heatmap(self, metrica='ventas_totales'):
+        """Promedio por día de la semana (filas 0-6) × mes del año (columnas 1-12 con datos)"""
+        sumas, conteos = self._por_mes_del_anio(metrica)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            promedio = np.where(conteos > 0, sumas / conteos, np.nan)
+        presentes = conteos.sum(axis=1) > 0
+        return pd.DataFrame(promedio[presentes].T, index=range(7), columns=np.arange(1, 13)[presentes])
+
+    def promedio_por_mes(self, metrica='ventas_totales'):
+        """Promedio diario por mes del año (1-12)"""
+        sumas, conteos = self._por_mes_del_anio(metrica)
+        sumas, conteos = sumas.sum(axis=1), conteos.sum(axis=1)
+        presentes = conteos > 0
+        return pd.Series(sumas[presentes] / conteos[presentes], index=np.arange(1, 13)[presentes])
+
+    def promedio_por_dia_semana(self, metrica='ventas_totales'):
+        """Promedio diario por día de la semana (lunes=0)"""
+        sumas = self.sumas_mes[metrica].sum(axis=0)
+        conteos = self.conteos_mes[metrica].sum(axis=0)
+        presentes = conteos > 0
+        return pd.Series(sumas[presentes] / conteos[presentes], index=np.arange(7)[presentes])
+
+    def mensual(self, metrica='ventas_totales'):
+        """Total por mes calendario (PeriodIndex mensual, solo meses con datos)"""
+        sumas = self.sumas_mes[metrica].sum(axis=1)
+        presentes = self.conteos_mes[metrica].sum(axis=1) > 0
+        codigos = self.mes0 + np.arange(len(sumas))
+        indice = pd.PeriodIndex(codigos[presentes].astype('datetime64[M]'), freq='M', name='mes')
+        return pd.Series(sumas[presentes], index=indice, name=metrica)
+
+    def semanal(self, metrica='ventas_totales'):
+        """Total por semana (índice: lunes de inicio de cada semana con datos)"""
+        sumas = self.sumas_semana[metrica]
+        presentes = self.conteos_semana[metrica] > 0
+        codigos = self.semana0 + np.arange(len(sumas))
+        inicio = (codigos[presentes] * 7 - 3).astype('datetime64[D]')
+        return pd.Series(sumas[presentes], index=pd.DatetimeIndex(inicio, name='semana'), name=metrica)
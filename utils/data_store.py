@@ -0,0 +1,240 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se serializa entre hilos
+    fcntl = None
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_DISPONIBLE = True
+except ImportError:  # Sin pyarrow se lee el CSV tipado directamente
+    PARQUET_DISPONIBLE = False
+
+DATA_DIR = Path(__file__).resolve().parent.parent / 'data'
+CACHE_DIR = DATA_DIR / '.cache'
+MANIFEST = 'manifest.json'
+
+# Esquemas declarados por dataset. Los montos de dinero se mantienen en float64
+# (float32 pierde centavos por encima de ~100K); los conteos caben en int32.
+ESQUEMAS = {
+    'kpis_diarios': {
+        'fecha': 'datetime64[ns]',
+        'ventas_totales': 'float64',
+        'pedidos_unicos': 'int32',
+        'clientes_unicos': 'int32',
+        'unidades_vendidas': 'int32',
+        'ticket_promedio': 'float32',
+        'productos_por_pedido': 'float32',
+    },
+    'analisis_clientes': {
+        'segmento': 'category',
+        'gasto_total': 'float64',
+        'num_pedidos': 'int32',
+        'primera_compra': 'datetime64[ns]',
+        'ultima_compra': 'datetime64[ns]',
+    },
+    'analisis_productos': {
+        'nombre_producto': 'category',
+        'ventas_totales': 'float64',
+        'unidades_vendidas': 'int32',
+        'pedidos_unicos': 'int32',
+        'precio_promedio': 'float32',
+        'ventas_por_unidad': 'float32',
+    },
+    # Líneas de pedido crudas (opcional): de ellas utils/hechos.py deriva los tres anteriores
+    'lineas_pedidos': {
+        'id_pedido': 'int64',
+        'id_cliente': 'int64',
+        'nombre_producto': 'category',
+        'cantidad': 'int32',
+        'precio': 'float64',
+        'fecha': 'datetime64[ns]',
+    },
+    # Jerarquía del treemap: categoría > subcategoría > producto
+    'categorias_productos': {
+        'nombre_producto': 'category',
+        'categoria': 'category',
+        'subcategoria': 'category',
+    },
+}
+
+
+def ruta_csv(nombre):
+    """Ruta del CSV fuente de un dataset"""
+    return DATA_DIR / f'{nombre}.csv'
+
+
+def ruta_parquet(nombre):
+    """Ruta del archivo columnar generado para un dataset"""
+    return CACHE_DIR / f'{nombre}.parquet'
+
+
+def ruta_feather(nombre):
+    """Ruta del archivo Arrow IPC (sin compresión, apto para memory-map)"""
+    return CACHE_DIR / f'{nombre}.arrow'
+
+
+def _hash_archivo(ruta, bloque=1 << 20):
+    h = hashlib.sha256()
+    with open(ruta, 'rb') as f:
+        for chunk in iter(lambda: f.read(bloque), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _leer_manifest():
+    try:
+        with open(CACHE_DIR / MANIFEST, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _ruta_temporal(destino):
+    """Nombre temporal único por proceso e hilo junto a 'destino' (para un os.replace atómico)"""
+    return destino.with_name(f'.{destino.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+
+
+_manifest_lock = threading.Lock()
+
+
+@contextmanager
+def _bloqueo_manifest():
+    """Serializa las actualizaciones del manifest entre sesiones (hilos) y procesos (flock)"""
+    with _manifest_lock:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(CACHE_DIR / f'{MANIFEST}.lock', 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+
+def _actualizar_manifest(clave, registro):
+    """Reemplaza la entrada 'clave' releyendo el manifest bajo el bloqueo (no pisa otras entradas)"""
+    with _bloqueo_manifest():
+        manifest = _leer_manifest()
+        manifest[clave] = registro
+        destino = CACHE_DIR / MANIFEST
+        tmp = _ruta_temporal(destino)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, destino)
+
+
+def aplicar_esquema(df, nombre):
+    """Convierte las columnas presentes a los tipos declarados en ESQUEMAS"""
+    for col, dtype in ESQUEMAS.get(nombre, {}).items():
+        if col not in df.columns:
+            continue
+        try:
+            if dtype.startswith('datetime64'):
+                df[col] = pd.to_datetime(df[col])
+            elif dtype.startswith('int') and df[col].isna().any():
+                # Con nulos se conserva el float original
+                continue
+            else:
+                df[col] = df[col].astype(dtype)
+        except (ValueError, TypeError):
+            # Si una columna no calza con el esquema se deja con el tipo inferido
+            pass
+    return df
+
+
+def leer_csv_tipado(nombre, columnas=None):
+    """Lee el CSV fuente aplicando el esquema declarado"""
+    df = pd.read_csv(ruta_csv(nombre), usecols=columnas)
+    return aplicar_esquema(df, nombre)
+
+
+def _firma_fuente(ruta):
+    st = os.stat(ruta)
+    return {'mtime_ns': st.st_mtime_ns, 'size': st.st_size}
+
+
+def _asegurar_columnar(nombre, formato):
+    """Convierte el CSV al formato pedido solo si la fuente cambió (mtime o hash)"""
+    fuente = ruta_csv(nombre)
+    destino = ruta_parquet(nombre) if formato == 'parquet' else ruta_feather(nombre)
+    clave = f'{nombre}.{formato}'
+    manifest = _leer_manifest()
+    registro = manifest.get(clave, {})
+    firma = _firma_fuente(fuente)
+
+    if destino.exists() and registro.get('mtime_ns') == firma['mtime_ns'] and registro.get('size') == firma['size']:
+        return destino
+
+    # El mtime cambió: solo se reconvierte si el contenido realmente es distinto
+    sha = _hash_archivo(fuente)
+    if destino.exists() and registro.get('sha256') == sha:
+        _actualizar_manifest(clave, {**registro, **firma})
+        return destino
+
+    df = leer_csv_tipado(nombre)
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = _ruta_temporal(destino)
+    if formato == 'parquet':
+        df.to_parquet(tmp, index=False)
+    else:
+        # Sin compresión y en un solo record batch: así to_pandas puede apuntar
+        # directo a los buffers mapeados sin concatenar trozos
+        df.to_feather(tmp, compression='uncompressed', chunksize=max(len(df), 1))
+    os.replace(tmp, destino)
+
+    _actualizar_manifest(clave, {**firma, 'sha256': sha})
+    return destino
+
+
+def asegurar_parquet(nombre):
+    """Convierte el CSV a Parquet solo si la fuente cambió"""
+    return _asegurar_columnar(nombre, 'parquet')
+
+
+def asegurar_feather(nombre):
+    """Convierte el CSV a Arrow IPC solo si la fuente cambió"""
+    return _asegurar_columnar(nombre, 'arrow')
+
+
+def cargar_dataset(nombre, columnas=None):
+    """Carga un dataset tipado desde su formato columnar (con proyección de columnas)"""
+    if not PARQUET_DISPONIBLE:
+        return leer_csv_tipado(nombre, columnas)
+    return pd.read_parquet(asegurar_parquet(nombre), columns=columnas)
+
+
+def cargar_dataset_mmap(nombre, columnas=None):
+    """Carga un dataset como vista de solo lectura sobre un archivo Arrow mapeado en memoria
+
+    Las columnas numéricas y de fecha sin nulos no se copian: todas las sesiones
+    y procesos que abren el mismo archivo comparten las páginas del page cache.
+    """
+    if not PARQUET_DISPONIBLE:
+        return leer_csv_tipado(nombre, columnas)
+
+    import pyarrow as pa
+    import pyarrow.ipc
+
+    fuente = pa.memory_map(str(asegurar_feather(nombre)), 'r')
+    tabla = pa.ipc.open_file(fuente).read_all()
+    if columnas is not None:
+        tabla = tabla.select(columnas)
+    # split_blocks evita consolidar columnas en bloques 2D (lo que obligaría a copiar)
+    return tabla.to_pandas(split_blocks=True, self_destruct=False)
+
+
+def version_datos(nombres=tuple(ESQUEMAS)):
+    """Identificador barato de la versión de los datos (mtime y tamaño de las fuentes)"""
+    h = hashlib.sha1()
+    for nombre in nombres:
+        ruta = ruta_csv(nombre)
+        if ruta.exists():
+            firma = _firma_fuente(ruta)
+            h.update(f"{nombre}:{firma['mtime_ns']}:{firma['size']};".encode())
+    return h.hexdigest()[:16]
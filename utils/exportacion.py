@@ -0,0 +1,86 @@
+import gzip
+import tempfile
+
+# Formatos disponibles: etiqueta -> (extensión, tipo MIME)
+FORMATOS_EXPORTACION = {
+    'CSV': ('csv', 'text/csv'),
+    'CSV comprimido (gzip)': ('csv.gz', 'application/gzip'),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+FILAS_POR_BLOQUE = 100_000
+# Hasta este tamaño el archivo temporal vive en memoria; por encima se vuelca a disco
+MAX_EN_MEMORIA = 16 * 1024 * 1024
+
+
+def iterar_bloques(df, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Recorre df en slices posicionales (vistas, sin copiar la tabla)"""
+    for inicio in range(0, len(df), filas_por_bloque):
+        yield df.iloc[inicio:inicio + filas_por_bloque]
+
+
+def iterar_csv(df, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Genera el CSV de df por bloques de bytes; el encabezado va solo en el primero"""
+    if df.empty:
+        yield df.to_csv(index=False).encode('utf-8')
+        return
+    for i, bloque in enumerate(iterar_bloques(df, filas_por_bloque)):
+        yield bloque.to_csv(index=False, header=(i == 0)).encode('utf-8')
+
+
+def _escribir_parquet(df, destino, filas_por_bloque):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    escritor = None
+    try:
+        for bloque in iterar_bloques(df, filas_por_bloque):
+            tabla = pa.Table.from_pandas(bloque, preserve_index=False)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabla.schema)
+            # Cada bloque se escribe como un row group independiente
+            escritor.write_table(tabla)
+        if escritor is None:
+            escritor = pq.ParquetWriter(destino, pa.Schema.from_pandas(df, preserve_index=False))
+    finally:
+        if escritor is not None:
+            escritor.close()
+
+
+def exportar(df, formato='CSV', filas_por_bloque=FILAS_POR_BLOQUE):
+    """Escribe df en el formato pedido bloque a bloque y devuelve un archivo listo para leer
+
+    Nunca se arma el archivo completo como string: cada bloque se serializa y
+    se escribe a un temporal que pasa a disco si supera MAX_EN_MEMORIA.
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+
+    salida = tempfile.SpooledTemporaryFile(max_size=MAX_EN_MEMORIA)
+    if formato == 'Parquet':
+        _escribir_parquet(df, salida, filas_por_bloque)
+    elif formato == 'CSV comprimido (gzip)':
+        with gzip.GzipFile(fileobj=salida, mode='wb', compresslevel=6) as comprimido:
+            for bloque in iterar_csv(df, filas_por_bloque):
+                comprimido.write(bloque)
+    else:
+        for bloque in iterar_csv(df, filas_por_bloque):
+            salida.write(bloque)
+    salida.seek(0)
+    return salida
+
+
+def nombre_archivo(base, formato):
+    """Nombre de descarga con la extensión del formato"""
+    return f"{base}.{FORMATOS_EXPORTACION[formato][0]}"
+
+
+def tipo_mime(formato):
+    """Tipo MIME del formato"""
+    return FORMATOS_EXPORTACION[formato][1]
+
+
+def exportar_bytes(df, formato='CSV', filas_por_bloque=FILAS_POR_BLOQUE):
+    """Contenido final del archivo exportado (lo que recibe st.download_button)"""
+    with exportar(df, formato, filas_por_bloque) as archivo:
+        return archivo.read()
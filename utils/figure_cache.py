@@ -0,0 +1,154 @@
+import datetime
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+from utils.instrumentacion import medir
+
+# Límites por defecto del cache de figuras (compartido por todas las sesiones)
+MAX_FIGURAS = 128
+MAX_BYTES = 64 * 1024 * 1024
+
+
+def huella_df(df):
+    """Huella de un DataFrame: forma, columnas, dtypes y hash vectorizado del contenido
+
+    Se calcula siempre sobre el contenido (nunca por identidad del objeto): un
+    frame modificado en el lugar cambia de huella y la clave es la misma en
+    cualquier proceso.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((df.shape, list(df.columns), [str(t) for t in df.dtypes])).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _huella_argumento(valor):
+    """Representación de un argumento que depende solo de su contenido
+
+    Tipos sin una representación de contenido estable (la de object incluye la
+    dirección de memoria) se rechazan con TypeError.
+    """
+    if valor is None or isinstance(valor, (bool, int, float, str)):
+        return repr(valor)
+    if isinstance(valor, np.generic):
+        return repr(valor.item())
+    if isinstance(valor, (pd.Timestamp, datetime.date, datetime.datetime)):
+        return valor.isoformat()
+    if isinstance(valor, pd.Series):
+        return huella_df(valor.to_frame())
+    if isinstance(valor, pd.DataFrame):
+        return huella_df(valor)
+    if isinstance(valor, np.ndarray):
+        return hashlib.blake2b(repr((valor.shape, str(valor.dtype))).encode()
+                               + np.ascontiguousarray(valor).tobytes(), digest_size=16).hexdigest()
+    if isinstance(valor, (list, tuple)):
+        return '(' + ','.join(_huella_argumento(v) for v in valor) + ')'
+    if isinstance(valor, dict):
+        return '{' + ','.join(f'{k!r}:{_huella_argumento(v)}' for k, v in sorted(valor.items())) + '}'
+    if hasattr(valor, 'huella'):
+        # Objetos derivados (p. ej. CuboVentas) exponen su propia huella de contenido
+        return valor.huella()
+    raise TypeError(f'Argumento sin huella de contenido: {type(valor).__name__}')
+
+
+def figura_desde_json(texto):
+    """Reconstruye una figura desde su JSON sin volver a validarla (ya se validó al crearla)"""
+    datos = json.loads(texto)
+    try:
+        return go.Figure(**datos, _validate=False)
+    except TypeError:
+        return pio.from_json(texto)
+
+
+class CacheFiguras:
+    """Cache LRU de figuras serializadas, acotado por cantidad y por bytes"""
+
+    def __init__(self, max_figuras=MAX_FIGURAS, max_bytes=MAX_BYTES):
+        self.max_figuras = max_figuras
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave):
+        with self._lock:
+            texto = self._entradas.get(clave)
+            if texto is None:
+                self.fallos += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.aciertos += 1
+            return texto
+
+    def guardar(self, clave, texto):
+        tamano = len(texto)
+        if tamano > self.max_bytes:
+            return
+        with self._lock:
+            if clave in self._entradas:
+                self._bytes -= len(self._entradas.pop(clave))
+            self._entradas[clave] = texto
+            self._bytes += tamano
+            # Expulsar las menos usadas hasta respetar ambos límites
+            while len(self._entradas) > self.max_figuras or self._bytes > self.max_bytes:
+                _, expulsada = self._entradas.popitem(last=False)
+                self._bytes -= len(expulsada)
+
+    def limpiar(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            return {
+                'figuras': len(self._entradas),
+                'bytes': self._bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos
+            }
+
+
+cache_figuras = CacheFiguras()
+
+
+def clave_figura(func, args=(), kwargs=None):
+    """Clave de cache de una llamada crear_*; es estable entre procesos (sirve para precalcular)"""
+    partes = [func.__module__, func.__qualname__]
+    partes += [_huella_argumento(a) for a in args]
+    partes += [f'{k}={_huella_argumento(v)}' for k, v in sorted((kwargs or {}).items())]
+    return hashlib.blake2b('|'.join(partes).encode(), digest_size=16).hexdigest()
+
+
+def memoizar_figura(func):
+    """Memoiza un constructor crear_* por la huella de sus datos y argumentos
+
+    Cada llamada (acierto o fallo) queda medida con la sonda del mismo nombre,
+    junto con el tamaño del JSON de la figura.
+    """
+    @wraps(func)
+    def envoltura(*args, **kwargs):
+        with medir(func.__name__) as sonda:
+            clave = clave_figura(func, args, kwargs)
+            texto = cache_figuras.obtener(clave)
+            if texto is None:
+                fig = func(*args, **kwargs)
+                texto = fig.to_json()
+                cache_figuras.guardar(clave, texto)
+                sonda.anotar_figura(len(texto))
+                return fig
+            sonda.anotar_figura(len(texto))
+            return figura_desde_json(texto)
+
+    envoltura.sin_cache = func
+    return envoltura
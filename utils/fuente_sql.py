@@ -0,0 +1,397 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.data_store import ESQUEMAS, aplicar_esquema, cargar_dataset, ruta_csv
+from utils.rfm import COLUMNAS_FRECUENCIA, SEGMENTOS_RFM
+from utils.segmentacion import ETIQUETAS_VALOR
+
+# Base embebida como fuente alternativa a los CSV ('' = CSV como siempre).
+# Con extensión .duckdb se abre con DuckDB (paquete opcional); cualquier otra con sqlite3.
+RUTA_SQL = os.environ.get('SANO_FRESCO_SQL', '')
+MAX_CONEXIONES = int(os.environ.get('SANO_FRESCO_SQL_CONEXIONES', '0')) or min(8, os.cpu_count() or 1)
+
+# Tablas que se exportan a la base (mismos nombres y esquemas que los CSV)
+TABLAS_SQL = ('kpis_diarios', 'analisis_clientes', 'analisis_productos')
+
+# Columnas con índice en SQLite: rango de fechas y ORDER BY ... LIMIT de tops y cuantiles
+INDICES_SQL = {
+    'kpis_diarios': ('fecha',),
+    'analisis_clientes': ('gasto_total', 'ultima_compra', *COLUMNAS_FRECUENCIA),
+    'analisis_productos': ('ventas_totales', 'pedidos_unicos', 'precio_promedio'),
+}
+
+# Resultados (por consulta y parámetros) que se conservan por fuente
+MAX_RESULTADOS = 64
+
+# Lo único que cambia entre motores: día de la semana (lunes=0), mes y fecha en días
+# ('origen' es el valor de 'dias' en 1970-01-01)
+DIALECTOS = {
+    'sqlite': {
+        'dia_semana': "(CAST(strftime('%w', {col}) AS INTEGER) + 6) % 7",
+        'mes': "CAST(strftime('%m', {col}) AS INTEGER)",
+        'dias': "julianday({col})",
+        'origen': 2440587.5,
+    },
+    'duckdb': {
+        'dia_semana': "isodow({col}) - 1",
+        'mes': "month({col})",
+        'dias': "epoch({col}) / 86400.0",
+        'origen': 0.0,
+    },
+}
+
+
+def motor_sql(ruta):
+    """'duckdb' para archivos .duckdb/.ddb, 'sqlite' para el resto"""
+    return 'duckdb' if Path(ruta).suffix.lower() in ('.duckdb', '.ddb') else 'sqlite'
+
+
+def version_sql(ruta=RUTA_SQL):
+    """Identificador barato de la versión de la base (mtime y tamaño del archivo)"""
+    estado = os.stat(ruta)
+    return f'{estado.st_mtime_ns}-{estado.st_size}'
+
+
+def _columna(nombre, tabla):
+    """Nombre de columna validado contra el esquema (no se pueden pasar como parámetro)"""
+    if nombre not in ESQUEMAS.get(tabla, {}) and nombre not in COLUMNAS_FRECUENCIA + ('id_cliente',):
+        raise ValueError(f"Columna desconocida en {tabla}: {nombre}")
+    return nombre
+
+
+class PoolConexiones:
+    """Conexiones de solo lectura reutilizadas entre sesiones, a lo más 'maximo' en uso a la vez
+
+    Cada conexión la usa un solo hilo por vez; al devolverla queda disponible
+    (con sus sentencias preparadas) para la siguiente consulta. Cerrar el pool
+    no corta consultas en curso: cada conexión se cierra al devolverla y,
+    cuando ya no queda ninguna en uso, se llama a 'al_cerrar'.
+    """
+
+    def __init__(self, abrir, maximo=MAX_CONEXIONES, al_cerrar=None):
+        self._abrir = abrir
+        self._al_cerrar = al_cerrar
+        self._libres = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(maximo)
+        self._lock = threading.Lock()
+        self._en_uso = 0
+        self.cerrado = False
+
+    @contextmanager
+    def conexion(self):
+        with self._cupos:
+            with self._lock:
+                self._en_uso += 1
+            try:
+                try:
+                    con = self._libres.get_nowait()
+                except queue.Empty:
+                    con = self._abrir()
+                try:
+                    yield con
+                finally:
+                    with self._lock:
+                        devolver = not self.cerrado
+                    if devolver:
+                        self._libres.put(con)
+                    else:
+                        con.close()
+            finally:
+                with self._lock:
+                    self._en_uso -= 1
+                    ultima = self.cerrado and self._en_uso == 0
+                if ultima and self._al_cerrar is not None:
+                    self._al_cerrar()
+
+    def cerrar(self):
+        with self._lock:
+            self.cerrado = True
+            vacio = self._en_uso == 0
+        while True:
+            try:
+                self._libres.get_nowait().close()
+            except queue.Empty:
+                break
+        if vacio and self._al_cerrar is not None:
+            self._al_cerrar()
+
+
+class FuenteSQL:
+    """Los datasets del dashboard consultados en una base embebida (SQLite o DuckDB)
+
+    Filtros de fecha, tops de productos, agregados por segmento y el pivot del
+    heatmap se resuelven en SQL: a Python solo llegan resultados chicos. Las
+    consultas usan parámetros (sentencias preparadas, cacheadas por conexión)
+    y sus resultados se guardan por (consulta, parámetros) en un LRU propio:
+    dos sesiones con los mismos filtros comparten la respuesta. Una fuente
+    corresponde a una versión del archivo; si cambia, se abre otra.
+    """
+
+    def __init__(self, ruta, maximo_conexiones=MAX_CONEXIONES):
+        self.ruta = Path(ruta)
+        if not self.ruta.exists():
+            raise FileNotFoundError(f"No existe la base de datos {self.ruta}")
+        self.motor = motor_sql(self.ruta)
+        self.version = version_sql(self.ruta)
+        self._dialecto = DIALECTOS[self.motor]
+        self._base = None
+        self._pool = PoolConexiones(self._abrir, maximo_conexiones, al_cerrar=self._cerrar_base)
+        self._resultados = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _abrir(self):
+        if self.motor == 'duckdb':
+            import duckdb  # opcional: solo se importa con una base .duckdb
+
+            with self._lock:
+                if self._base is None:
+                    self._base = duckdb.connect(str(self.ruta), read_only=True)
+            # Cada cursor es una conexión propia sobre la misma base abierta
+            return self._base.cursor()
+        return sqlite3.connect(f'file:{self.ruta}?mode=ro', uri=True, check_same_thread=False)
+
+    def _cerrar_base(self):
+        with self._lock:
+            base, self._base = self._base, None
+        if base is not None:
+            base.close()
+
+    def cerrar(self):
+        """Libera las conexiones (las consultas en curso terminan antes; una posterior abre y cierra la suya)"""
+        self._pool.cerrar()
+
+    def _ejecutar(self, sql, parametros=()):
+        with self._pool.conexion() as con:
+            cursor = con.execute(sql, parametros)
+            if self.motor == 'duckdb':
+                return cursor.df()
+            columnas = [d[0] for d in cursor.description]
+            return pd.DataFrame.from_records(cursor.fetchall(), columns=columnas)
+
+    def consultar(self, sql, parametros=(), esquema=None):
+        """Resultado de una consulta parametrizada (cacheado por consulta y parámetros)"""
+        clave = (sql, tuple(parametros), esquema)
+        with self._lock:
+            if clave in self._resultados:
+                self._resultados.move_to_end(clave)
+                return self._resultados[clave]
+        df = self._ejecutar(sql, parametros)
+        if esquema is not None:
+            df = aplicar_esquema(df, esquema)
+        with self._lock:
+            self._resultados[clave] = df
+            while len(self._resultados) > MAX_RESULTADOS:
+                self._resultados.popitem(last=False)
+        return df
+
+    def _escalar(self, sql, parametros=()):
+        return self.consultar(sql, parametros).iat[0, 0]
+
+    def columnas(self, tabla):
+        return list(self.consultar(f'SELECT * FROM {tabla} LIMIT 0').columns)
+
+    def _fecha(self, valor):
+        # SQLite guarda las fechas como texto ISO (comparable como texto); DuckDB como TIMESTAMP
+        valor = pd.Timestamp(valor)
+        return valor.to_pydatetime() if self.motor == 'duckdb' else valor.strftime('%Y-%m-%d %H:%M:%S')
+
+    def _filtro_fechas(self, desde=None, hasta=None, columna='fecha'):
+        condiciones, parametros = [], []
+        if desde is not None:
+            condiciones.append(f'{columna} >= ?')
+            parametros.append(self._fecha(desde))
+        if hasta is not None:
+            # 'hasta' es inclusivo para todo el día, como en filtrar_rango_fechas
+            condiciones.append(f'{columna} < ?')
+            parametros.append(self._fecha(pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1)))
+        return (' WHERE ' + ' AND '.join(condiciones) if condiciones else ''), tuple(parametros)
+
+    def kpis(self, desde=None, hasta=None):
+        """kpis_diarios del rango [desde, hasta] ordenado por fecha"""
+        filtro, parametros = self._filtro_fechas(desde, hasta)
+        return self.consultar(f'SELECT * FROM kpis_diarios{filtro} ORDER BY fecha', parametros, 'kpis_diarios')
+
+    def productos(self):
+        """Catálogo completo de analisis_productos"""
+        return self.consultar('SELECT * FROM analisis_productos', esquema='analisis_productos')
+
+    def clientes(self):
+        """analisis_clientes completo, solo para exportarlo (no se cachea ni lo carga el dashboard)"""
+        return aplicar_esquema(self._ejecutar('SELECT * FROM analisis_clientes'), 'analisis_clientes')
+
+    def contar_clientes(self):
+        return int(self._escalar('SELECT COUNT(*) FROM analisis_clientes'))
+
+    def top_productos(self, metrica, n):
+        """Equivalente a productos_df.nlargest(n, metrica), resuelto con ORDER BY ... LIMIT
+
+        Los empates quedan en el orden de carga (rowid), como keep='first'.
+        """
+        metrica = _columna(metrica, 'analisis_productos')
+        return self.consultar(
+            f'SELECT * FROM analisis_productos WHERE {metrica} IS NOT NULL ORDER BY {metrica} DESC, rowid LIMIT ?',
+            (int(n),), 'analisis_productos'
+        )
+
+    def cuantiles(self, tabla, columna, qs, valor=None):
+        """Cuantiles de una columna con la interpolación lineal de np.nanquantile
+
+        Cada cuantil lee solo los dos valores vecinos de su posición
+        (ORDER BY ... LIMIT 2 OFFSET k, que en SQLite recorre el índice).
+        'valor' es una expresión monótona de la columna a interpolar en su lugar.
+        """
+        columna = _columna(columna, tabla)
+        valor = valor or columna
+        n = int(self._escalar(f'SELECT COUNT({columna}) FROM {tabla}'))
+        if n == 0:
+            return np.full(len(qs), np.nan)
+        cortes = []
+        for q in qs:
+            posicion = (n - 1) * float(q)
+            base = int(np.floor(posicion))
+            vecinos = self.consultar(
+                f'SELECT {valor} FROM {tabla} WHERE {columna} IS NOT NULL ORDER BY {columna} LIMIT 2 OFFSET ?',
+                (base,)
+            ).iloc[:, 0].to_numpy(dtype='float64')
+            cortes.append(vecinos[0] + (vecinos[-1] - vecinos[0]) * (posicion - base))
+        return np.asarray(cortes)
+
+    @staticmethod
+    def _caso_cuartil(columna, cortes, operador='<='):
+        """CASE con el puntaje 1-4 de _puntaje_cuartil (intervalos cerrados a la derecha, nulos = 4)"""
+        return (f'CASE WHEN {columna} {operador} ? THEN 1 WHEN {columna} {operador} ? THEN 2 '
+                f'WHEN {columna} {operador} ? THEN 3 ELSE 4 END'), tuple(cortes[1:-1])
+
+    def resumen_segmentos(self):
+        """Clientes y gasto por segmento (RFM si hay fecha de última compra; si no, por valor)
+
+        Es el mismo resultado que segmentar_clientes + groupby('segmento'): los
+        cortes por cuartil salen de cuantiles() y la asignación son CASE
+        dentro de un único GROUP BY. Columnas: segmento, clientes, gasto_total.
+        """
+        columnas = self.columnas('analisis_clientes')
+        qs = np.linspace(0, 1, 5)
+        caso_m, parametros_m = self._caso_cuartil(
+            'gasto_total', self.cuantiles('analisis_clientes', 'gasto_total', qs)
+        )
+        if 'ultima_compra' not in columnas:
+            segmento = f'CASE WHEN gasto_total IS NULL THEN NULL ELSE {caso_m} - 1 END'
+            return self._agregar_segmentos(
+                f'SELECT {segmento} AS segmento, gasto_total FROM analisis_clientes', parametros_m, ETIQUETAS_VALOR
+            )
+
+        # Recencia = días desde la última compra registrada: sus cuartiles son los
+        # de ultima_compra en orden inverso y "recencia <= corte" equivale a
+        # "ultima_compra >= referencia - corte". Las fechas son días completos,
+        # así que el límite se redondea hacia arriba al día y se compara la
+        # columna directamente (con su índice, sin funciones por fila).
+        dias = self._dialecto['dias'].format(col='ultima_compra')
+        limites = self.cuantiles('analisis_clientes', 'ultima_compra', qs[::-1], valor=dias)
+        limites = pd.to_datetime(np.ceil(limites - self._dialecto['origen']), unit='D')
+        caso_r, parametros_r = self._caso_cuartil('ultima_compra', [self._fecha(f) for f in limites], '>=')
+
+        frecuencia = next((c for c in COLUMNAS_FRECUENCIA if c in columnas), None)
+        if frecuencia is not None:
+            caso_f, parametros_f = self._caso_cuartil(
+                'frecuencia', self.cuantiles('analisis_clientes', frecuencia, qs)
+            )
+        else:
+            # Sin conteo de pedidos solo se distingue compra única (F=1) de recompra (F=4)
+            frecuencia = 'CASE WHEN ultima_compra > primera_compra THEN 2 ELSE 1 END'
+            caso_f, parametros_f = 'CASE WHEN frecuencia > 1 THEN 4 ELSE 1 END', ()
+
+        puntajes = (f'SELECT 5 - {caso_r} AS r, {caso_f} AS f, {caso_m} AS m, frecuencia, gasto_total, '
+                    f'ultima_compra IS NULL AS sin_fecha '
+                    f'FROM (SELECT ultima_compra, {frecuencia} AS frecuencia, gasto_total FROM analisis_clientes)')
+        # Mismo orden de prioridad que calcular_rfm (códigos según SEGMENTOS_RFM)
+        segmento = ('CASE WHEN sin_fecha THEN 5 WHEN r = 1 THEN 3 WHEN frecuencia <= 1 THEN 4 WHEN r = 2 THEN 2 '
+                    'WHEN r >= 3 AND f + m >= 7 THEN 0 ELSE 1 END')
+        return self._agregar_segmentos(
+            f'SELECT {segmento} AS segmento, gasto_total FROM ({puntajes})',
+            parametros_r + parametros_f + parametros_m, SEGMENTOS_RFM
+        )
+
+    def _agregar_segmentos(self, consulta, parametros, etiquetas):
+        df = self.consultar(
+            f'SELECT segmento, COUNT(*) AS clientes, SUM(gasto_total) AS gasto_total '
+            f'FROM ({consulta}) WHERE segmento IS NOT NULL GROUP BY segmento ORDER BY segmento',
+            parametros
+        )
+        return pd.DataFrame({
+            'segmento': pd.Categorical.from_codes(df['segmento'].to_numpy(dtype='int64'), categories=etiquetas),
+            'clientes': df['clientes'].to_numpy(dtype='int64'),
+            'gasto_total': df['gasto_total'].to_numpy(dtype='float64'),
+        })
+
+    def heatmap(self, desde=None, hasta=None, metrica='ventas_totales'):
+        """Promedio de 'metrica' por día de la semana × mes del año del rango (como CuboVentas.heatmap)"""
+        metrica = _columna(metrica, 'kpis_diarios')
+        filtro, parametros = self._filtro_fechas(desde, hasta)
+        dia = self._dialecto['dia_semana'].format(col='fecha')
+        mes = self._dialecto['mes'].format(col='fecha')
+        df = self.consultar(
+            f'SELECT {dia} AS dia, {mes} AS mes, AVG({metrica}) AS promedio '
+            f'FROM kpis_diarios{filtro} GROUP BY 1, 2',
+            parametros
+        )
+        pivot = df.pivot(index='dia', columns='mes', values='promedio')
+        pivot = pivot.reindex(index=range(7), columns=sorted(pivot.columns.astype('int64')))
+        pivot.columns = pivot.columns.to_numpy(dtype='int64')
+        pivot.index.name = pivot.columns.name = None
+        return pivot.astype('float64')
+
+    def huella(self):
+        """Versión del archivo (para el cache de figuras)"""
+        return f'{self.ruta}:{self.version}'
+
+
+def exportar_a_sql(ruta, tablas=TABLAS_SQL, datasets=None):
+    """Copia los CSV de data/ (o los frames de 'datasets') a una base SQLite o DuckDB
+
+    El archivo se reemplaza de forma atómica. Las fechas quedan como texto ISO
+    en SQLite y como TIMESTAMP en DuckDB; en SQLite se indexan las columnas de
+    INDICES_SQL.
+    """
+    if datasets is None:
+        datasets = {tabla: cargar_dataset for tabla in tablas if ruta_csv(tabla).exists()}
+    ruta = Path(ruta)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    tmp = ruta.with_name(f'.{ruta.name}.{os.getpid()}.tmp')
+    tmp.unlink(missing_ok=True)
+    motor = motor_sql(ruta)
+    if motor == 'duckdb':
+        import duckdb
+
+        con = duckdb.connect(str(tmp))
+    else:
+        con = sqlite3.connect(tmp)
+    try:
+        for tabla, df in datasets.items():
+            df = df(tabla) if callable(df) else df.copy(deep=False)
+            for col in df.columns:
+                if isinstance(df[col].dtype, pd.CategoricalDtype):
+                    df[col] = df[col].astype(str)
+                elif motor == 'sqlite' and pd.api.types.is_datetime64_any_dtype(df[col]):
+                    df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
+            if motor == 'duckdb':
+                con.register('_df', df)
+                con.execute(f'CREATE TABLE {tabla} AS SELECT * FROM _df')
+                con.unregister('_df')
+                continue
+            df.to_sql(tabla, con, index=False)
+            for col in INDICES_SQL.get(tabla, ()):
+                if col in df.columns:
+                    con.execute(f'CREATE INDEX idx_{tabla}_{col} ON {tabla} ({col})')
+        con.commit()
+    finally:
+        con.close()
+    os.replace(tmp, ruta)
+    return ruta
@@ -0,0 +1,218 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.data_store import DATA_DIR, aplicar_esquema, cargar_dataset, ruta_csv, version_datos
+from utils.sketches import PRECISION_DIA, PRECISION_PRODUCTO, SketchesClientes, hash64, ruta_sketches
+
+# Líneas de pedido crudas: una fila por producto de cada pedido (ver ESQUEMAS['lineas_pedidos'])
+FUENTE_LINEAS = 'lineas_pedidos'
+
+# Resolución de las filas de kpis_diarios: 'D' por día, 'h' por hora
+_NS_POR_FRECUENCIA = {'D': 86_400 * 10**9, 'h': 3_600 * 10**9}
+
+
+def _codificar_ids(valores):
+    """(código de cada fila, ids distintos); los ids nulos van a un código propio, len(ids) ('sin id')"""
+    codigos, ids = pd.factorize(valores)
+    codigos[codigos < 0] = len(ids)
+    return codigos, ids
+
+
+def _contar_distintos(grupo, valor, n_grupos, ignorar=None):
+    """Cantidad exacta de 'valor' distintos por grupo (grupo y valor son códigos enteros >= 0)
+
+    Cada par (grupo, valor) se codifica en un int64, se ordena y se quedan los
+    distintos de su vecino; el conteo por grupo es un bincount de esos pares.
+    (Un sort explícito: el np.unique por hash de numpy 2 es mucho más lento aquí.)
+    Las filas con valor == 'ignorar' (p. ej. el código 'sin id') no cuentan.
+    """
+    if len(grupo) and (grupo.min() < 0 or valor.min() < 0):
+        raise ValueError('_contar_distintos recibe códigos enteros >= 0')
+    if ignorar is not None:
+        validos = valor != ignorar
+        grupo, valor = grupo[validos], valor[validos]
+    if not len(grupo):
+        return np.zeros(n_grupos, dtype='int64')
+    base = int(valor.max()) + 1
+    pares = np.sort(grupo.astype(np.int64) * base + valor)
+    distintos = np.concatenate(([True], pares[1:] != pares[:-1]))
+    return np.bincount(pares[distintos] // base, minlength=n_grupos)
+
+
+def _grupos_ordenados(codigos):
+    """(valores distintos, grupo de cada fila) de un arreglo ya ordenado, en O(n) sin ordenar"""
+    if not len(codigos):
+        return codigos[:0], np.zeros(0, dtype=np.int64)
+    inicio = np.concatenate(([True], codigos[1:] != codigos[:-1]))
+    return codigos[inicio], np.cumsum(inicio) - 1
+
+
+class TablaHechos:
+    """Líneas de pedido en arreglos columnares, ordenadas por fecha y con ids como códigos enteros
+
+    Deriva kpis_diarios, analisis_productos y analisis_clientes con los mismos
+    esquemas que los CSV, para cualquier combinación de rango de fechas,
+    productos y clientes. Todo es numpy vectorizado (bincount y unique sobre
+    códigos): los conteos de pedidos y clientes distintos son exactos. Las
+    líneas sin id de pedido o de cliente (p. ej. compras como invitado) suman
+    ventas y unidades, pero no cuentan como pedido ni cliente distinto y no
+    aparecen en analisis_clientes.
+    """
+
+    def __init__(self, lineas_df):
+        if not lineas_df['fecha'].is_monotonic_increasing:
+            lineas_df = lineas_df.sort_values('fecha', kind='stable', ignore_index=True)
+        self.fechas = pd.DatetimeIndex(lineas_df['fecha'])
+        self._ns = self.fechas.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self.pedido, self.pedidos = _codificar_ids(lineas_df['id_pedido'])
+        self.cliente, self.clientes = _codificar_ids(lineas_df['id_cliente'])
+        self.producto, self.productos = pd.factorize(lineas_df['nombre_producto'].astype(str))
+        self.cantidad = lineas_df['cantidad'].to_numpy(dtype='int64')
+        self.importe = self.cantidad * lineas_df['precio'].to_numpy(dtype='float64')
+
+    @classmethod
+    def desde_archivo(cls, nombre=FUENTE_LINEAS):
+        """Tabla de hechos desde data/<nombre>.csv (vía el Parquet tipado de data_store)"""
+        return cls(cargar_dataset(nombre))
+
+    def __len__(self):
+        return len(self._ns)
+
+    def _seleccion(self, desde=None, hasta=None, productos=None, clientes=None):
+        """Líneas del filtro: el rango de fechas es un slice (búsqueda binaria), los ids un isin"""
+        inicio = 0 if desde is None else self.fechas.searchsorted(pd.Timestamp(desde), side='left')
+        # 'hasta' es inclusivo para todo el día, como en filtrar_rango_fechas
+        fin = len(self) if hasta is None else self.fechas.searchsorted(
+            pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1), side='left'
+        )
+        if productos is None and clientes is None:
+            return slice(inicio, fin)
+        posiciones = np.arange(inicio, fin)
+        if productos is not None:
+            codigos = self.productos.get_indexer(pd.Index(productos).astype(str))
+            posiciones = posiciones[np.isin(self.producto[posiciones], codigos[codigos >= 0])]
+        if clientes is not None:
+            codigos = self.clientes.get_indexer(pd.Index(clientes))
+            posiciones = posiciones[np.isin(self.cliente[posiciones], codigos[codigos >= 0])]
+        return posiciones
+
+    def kpis(self, desde=None, hasta=None, productos=None, clientes=None, frecuencia='D'):
+        """kpis_diarios del filtro (por día o, con frecuencia='h', por hora)"""
+        sel = self._seleccion(desde, hasta, productos, clientes)
+        # Las líneas están ordenadas por fecha: los buckets salen ya ordenados y contiguos
+        buckets, grupo = _grupos_ordenados(self._ns[sel] // _NS_POR_FRECUENCIA[frecuencia])
+        n = len(buckets)
+        ventas = np.bincount(grupo, self.importe[sel], minlength=n).round(2)
+        unidades = np.bincount(grupo, self.cantidad[sel], minlength=n)
+        pedidos = _contar_distintos(grupo, self.pedido[sel], n, ignorar=len(self.pedidos))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            kpis = pd.DataFrame({
+                'fecha': pd.to_datetime(buckets * _NS_POR_FRECUENCIA[frecuencia]),
+                'ventas_totales': ventas,
+                'pedidos_unicos': pedidos,
+                'clientes_unicos': _contar_distintos(grupo, self.cliente[sel], n, ignorar=len(self.clientes)),
+                'unidades_vendidas': unidades,
+                'ticket_promedio': ventas / pedidos,
+                'productos_por_pedido': unidades / pedidos,
+            })
+        return aplicar_esquema(kpis, 'kpis_diarios')
+
+    def analisis_productos(self, desde=None, hasta=None, productos=None, clientes=None):
+        """analisis_productos del filtro (un registro por producto con ventas)"""
+        sel = self._seleccion(desde, hasta, productos, clientes)
+        n = len(self.productos)
+        producto = self.producto[sel]
+        ventas = np.bincount(producto, self.importe[sel], minlength=n).round(2)
+        unidades = np.bincount(producto, self.cantidad[sel], minlength=n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Precio promedio ponderado por unidad (como en el CSV original, igual a ventas_por_unidad)
+            precio = ventas / unidades
+            df = pd.DataFrame({
+                'nombre_producto': self.productos,
+                'ventas_totales': ventas,
+                'unidades_vendidas': unidades,
+                'pedidos_unicos': _contar_distintos(producto, self.pedido[sel], n, ignorar=len(self.pedidos)),
+                'precio_promedio': precio,
+                'ventas_por_unidad': precio,
+            })
+        df = df[unidades > 0].sort_values('nombre_producto', ignore_index=True)
+        return aplicar_esquema(df, 'analisis_productos')
+
+    def analisis_clientes(self, desde=None, hasta=None, productos=None, clientes=None):
+        """analisis_clientes del filtro: gasto, pedidos distintos, primera y última compra"""
+        sel = self._seleccion(desde, hasta, productos, clientes)
+        # Se calcula también para el código 'sin id' (el último) y después se descarta
+        n = len(self.clientes) + 1
+        cliente = self.cliente[sel]
+        cantidad_lineas = np.bincount(cliente, minlength=n)
+        # Mínimo y máximo de la fecha por cliente sin ordenar (ufunc.at es O(n))
+        ns = self._ns[sel]
+        primera = np.full(n, np.iinfo(np.int64).max)
+        ultima = np.full(n, np.iinfo(np.int64).min)
+        np.minimum.at(primera, cliente, ns)
+        np.maximum.at(ultima, cliente, ns)
+        activos = cantidad_lineas > 0
+        activos[-1] = False
+        df = pd.DataFrame({
+            'id_cliente': self.clientes[activos[:-1]],
+            'gasto_total': np.bincount(cliente, self.importe[sel], minlength=n)[activos].round(2),
+            'num_pedidos': _contar_distintos(cliente, self.pedido[sel], n, ignorar=len(self.pedidos))[activos],
+            'primera_compra': pd.to_datetime(primera[activos]).normalize(),
+            'ultima_compra': pd.to_datetime(ultima[activos]).normalize(),
+        }).sort_values('id_cliente', ignore_index=True)
+        return aplicar_esquema(df, 'analisis_clientes')
+
+    def sketches_clientes(self, por='dia', precision=None, fuente=None):
+        """HyperLogLog de clientes por día o por producto (ver SketchesClientes)
+
+        El hash es del id de cliente (no del código interno), así los sketches
+        de distintas cargas se pueden unir entre sí. Las líneas sin id de cliente
+        no entran al sketch (sí cuentan para las claves: el día existe igual).
+        """
+        con_id = self.cliente < len(self.clientes)
+        hash_cliente = hash64(self.clientes.to_numpy())[self.cliente[con_id]]
+        if por == 'dia':
+            dias, grupo = _grupos_ordenados(self._ns // _NS_POR_FRECUENCIA['D'])
+            claves = pd.DatetimeIndex(pd.to_datetime(dias * _NS_POR_FRECUENCIA['D']))
+            precision = precision or PRECISION_DIA
+        else:
+            claves, grupo = pd.Index(self.productos), self.producto
+            precision = precision or PRECISION_PRODUCTO
+        return SketchesClientes.desde_codigos(claves, grupo[con_id], hash_cliente, precision, fuente)
+
+
+def _escribir_csv(df, nombre, formato_fecha='%Y-%m-%d'):
+    """Reemplaza data/<nombre>.csv de forma atómica (los lectores nunca ven uno a medias)"""
+    destino = ruta_csv(nombre)
+    tmp = destino.with_name(f'.{destino.name}.{os.getpid()}.tmp')
+    df.to_csv(tmp, index=False, date_format=formato_fecha)
+    os.replace(tmp, destino)
+    return destino
+
+
+def guardar_sketches(tabla, fuente=None):
+    """Persiste los sketches de clientes por día y por producto de la versión actual de las líneas"""
+    fuente = fuente or version_datos((FUENTE_LINEAS,))
+    for por, nombre in (('dia', 'clientes_por_dia'), ('producto', 'clientes_por_producto')):
+        tabla.sketches_clientes(por, fuente=fuente).guardar(ruta_sketches(nombre))
+
+
+def exportar_agregados(tabla=None, frecuencia='D'):
+    """Regenera kpis_diarios, analisis_productos y analisis_clientes en data/ desde las líneas
+
+    Son los mismos CSV que produce el proceso externo, así que el resto del
+    dashboard (ingesta, caché columnar, precálculo) no cambia. Junto a ellos
+    se persisten los sketches de clientes por día y por producto.
+    """
+    if tabla is None:
+        tabla = TablaHechos.desde_archivo()
+    guardar_sketches(tabla)
+    DATA_DIR.mkdir(parents=True, exist_ok=True)
+    formato_kpis = '%Y-%m-%d %H:%M:%S' if frecuencia == 'h' else '%Y-%m-%d'
+    return [
+        _escribir_csv(tabla.kpis(frecuencia=frecuencia), 'kpis_diarios', formato_kpis),
+        _escribir_csv(tabla.analisis_productos(), 'analisis_productos'),
+        _escribir_csv(tabla.analisis_clientes(), 'analisis_clientes'),
+    ]
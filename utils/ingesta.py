@@ -0,0 +1,196 @@
+import hashlib
+import io
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils.correlaciones import IndiceCorrelaciones
+from utils.cubos import CuboVentas
+from utils.data_store import aplicar_esquema, cargar_dataset, ruta_csv
+from utils.metrics import cola_indice_acumulado, construir_indice_acumulado
+
+# Bytes por lectura al verificar la zona ya ingerida (se verifica completa)
+BLOQUE_VERIFICACION = 1024 * 1024
+
+# Filas reservadas como mínimo en los buffers de la ingesta
+RESERVA_MINIMA = 64
+
+
+def indexar_kpis(kpis):
+    """Índice acumulado, cubo de rollups e índice de correlaciones de un kpis_diarios ordenado"""
+    return construir_indice_acumulado(kpis), CuboVentas.desde_kpis(kpis), IndiceCorrelaciones.desde_kpis(kpis)
+
+
+class BufferCreciente:
+    """Arreglo que crece al final sobre una reserva que se duplica: anexar cuesta lo anexado
+
+    Las vistas ya entregadas ([:n]) no cambian: lo nuevo se escribe después de
+    n y, cuando se acaba la reserva, se copia a un arreglo nuevo (costo
+    amortizado O(1) por fila) mientras las vistas viejas siguen en el anterior.
+    """
+
+    def __init__(self, arreglo):
+        arreglo = np.asarray(arreglo)
+        self.n = len(arreglo)
+        self._datos = np.empty((max(2 * self.n, RESERVA_MINIMA),) + arreglo.shape[1:], dtype=arreglo.dtype)
+        self._datos[:self.n] = arreglo
+
+    def anexar(self, valores):
+        fin = self.n + len(valores)
+        if fin > len(self._datos):
+            datos = np.empty((max(2 * len(self._datos), fin),) + self._datos.shape[1:], dtype=self._datos.dtype)
+            datos[:self.n] = self._datos[:self.n]
+            self._datos = datos
+        self._datos[self.n:fin] = valores
+        self.n = fin
+
+    def vista(self):
+        return self._datos[:self.n]
+
+
+class IngestorKpis:
+    """Ingesta incremental de kpis_diarios.csv: solo se parsean las filas agregadas al final
+
+    Guarda el último offset leído y la huella de toda la zona ya ingerida
+    (además de tamaño y mtime). Si el archivo solo creció, se leen los bytes
+    nuevos y se anexan al frame, al índice acumulado, al cubo de rollups y al
+    índice de correlaciones; si se detecta un cambio en lo ya ingerido o filas
+    fuera de orden, se reconstruye todo. Las columnas del frame y los
+    acumulados viven en BufferCreciente: anexar no copia la historia.
+    """
+
+    def __init__(self, nombre='kpis_diarios'):
+        self.nombre = nombre
+        self.ruta = ruta_csv(nombre)
+        self._lock = threading.Lock()
+        self._columnas = None
+        self._offset = 0
+        self._mtime_ns = None
+        self._huella = None
+        self._buffers = None
+        self._centro_correlaciones = None
+        self.reconstrucciones = 0
+        self.incrementos = 0
+        # Estado publicado: se reemplaza de una vez para que los lectores vean una versión consistente
+        self.estado = None
+
+    def _huella_prefijo(self, f, offset):
+        """blake2b (el objeto, para seguir actualizándolo) de los primeros 'offset' bytes"""
+        h = hashlib.blake2b(digest_size=16)
+        f.seek(0)
+        restante = offset
+        while restante > 0:
+            bloque = f.read(min(BLOQUE_VERIFICACION, restante))
+            if not bloque:
+                break
+            h.update(bloque)
+            restante -= len(bloque)
+        return h
+
+    def _publicar(self, cubo):
+        """Publica las vistas actuales de los buffers (frame, índice y correlaciones) y el cubo"""
+        filas, acumulados, co_momentos = self._buffers
+        columnas = {c: b.vista() for c, b in filas.items()}
+        fechas = pd.DatetimeIndex(columnas['fecha'], copy=False)
+        indice = {'fecha': fechas, **{c: b.vista() for c, b in acumulados.items()}}
+        correlaciones = IndiceCorrelaciones(fechas, *self._centro_correlaciones, *(b.vista() for b in co_momentos))
+        self.estado = {
+            'kpis': pd.DataFrame(columnas, copy=False), 'indice': indice, 'cubo': cubo,
+            'correlaciones': correlaciones, 'version': f'{self._mtime_ns}-{self._offset}'
+        }
+
+    def _reconstruir(self):
+        antes = os.stat(self.ruta)
+        kpis = cargar_dataset(self.nombre)
+        despues = os.stat(self.ruta)
+        if (antes.st_size, antes.st_mtime_ns) != (despues.st_size, despues.st_mtime_ns):
+            # El archivo cambió durante la carga: se parsea una foto fija de sus bytes
+            with open(self.ruta, 'rb') as f:
+                contenido = f.read()
+            contenido = contenido[:contenido.rfind(b'\n') + 1]
+            kpis = aplicar_esquema(pd.read_csv(io.BytesIO(contenido)), self.nombre)
+            tamano, mtime_ns = len(contenido), despues.st_mtime_ns
+        else:
+            tamano, mtime_ns = antes.st_size, antes.st_mtime_ns
+
+        if not kpis['fecha'].is_monotonic_increasing:
+            kpis = kpis.sort_values('fecha', ignore_index=True)
+
+        with open(self.ruta, 'rb') as f:
+            self._huella = self._huella_prefijo(f, tamano)
+        self._columnas = list(kpis.columns)
+        self._offset = tamano
+        self._mtime_ns = mtime_ns
+        self.reconstrucciones += 1
+
+        indice, cubo, correlaciones = indexar_kpis(kpis)
+        self._buffers = (
+            {c: BufferCreciente(kpis[c].to_numpy()) for c in kpis.columns},
+            {c: BufferCreciente(v) for c, v in indice.items() if c != 'fecha'},
+            [BufferCreciente(a) for a in (correlaciones._valores, correlaciones._acum_n,
+                                          correlaciones._acum_x, correlaciones._acum_xy)],
+        )
+        self._centro_correlaciones = (correlaciones.columnas, correlaciones.centro)
+        self._publicar(cubo)
+
+    def _anexar(self, f, tamano):
+        """Parsea solo las líneas completas agregadas desde el último offset"""
+        f.seek(self._offset)
+        nuevos = f.read(tamano - self._offset)
+        fin = nuevos.rfind(b'\n') + 1
+        if fin == 0:
+            return True  # Todavía no hay una línea completa nueva
+        nuevos = nuevos[:fin]
+
+        filas = pd.read_csv(io.BytesIO(nuevos), header=None, names=self._columnas)
+        filas = aplicar_esquema(filas, self.nombre)
+        kpis, indice, cubo = self.estado['kpis'], self.estado['indice'], self.estado['cubo']
+        if filas.empty:
+            return True
+        if not filas['fecha'].is_monotonic_increasing or (
+            not kpis.empty and filas['fecha'].iloc[0] <= kpis['fecha'].iloc[-1]
+        ):
+            return False  # Filas fuera de orden: el índice ordenado ya no sirve
+
+        cola_indice = cola_indice_acumulado(indice, filas)
+        cola_correlaciones = self.estado['correlaciones'].cola(filas)
+        cubo = cubo.combinar(CuboVentas.desde_kpis(filas))
+        filas_buffer, acumulados, co_momentos = self._buffers
+        for c, b in filas_buffer.items():
+            b.anexar(filas[c].to_numpy())
+        for c, b in acumulados.items():
+            b.anexar(cola_indice[c])
+        for b, valores in zip(co_momentos, cola_correlaciones):
+            b.anexar(valores)
+
+        self._offset += fin
+        self._huella.update(nuevos)
+        self.incrementos += 1
+        self._publicar(cubo)
+        return True
+
+    def actualizar(self):
+        """Sincroniza con el archivo; el costo es proporcional a las filas nuevas"""
+        with self._lock:
+            st = os.stat(self.ruta)
+            if self.estado is None or st.st_size < self._offset:
+                self._reconstruir()
+                return self.estado
+            if st.st_size == self._offset and st.st_mtime_ns == self._mtime_ns:
+                return self.estado
+
+            with open(self.ruta, 'rb') as f:
+                # Lo ya ingerido debe seguir intacto y terminar en un salto de línea
+                intacto = self._huella_prefijo(f, self._offset).digest() == self._huella.digest()
+                f.seek(self._offset - 1)
+                intacto = intacto and f.read(1) == b'\n'
+                if intacto:
+                    # Si solo cambió el mtime (mismo tamaño y contenido verificado) no hay nada que anexar
+                    self._mtime_ns = st.st_mtime_ns
+                    if st.st_size == self._offset or self._anexar(f, st.st_size):
+                        return self.estado
+
+            self._reconstruir()
+            return self.estado
@@ -0,0 +1,194 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+import numpy as np
+
+# Opt-in: sin la variable, medir() devuelve una sonda nula e instrumentar() no envuelve nada
+HABILITADA = os.environ.get('SANO_FRESCO_INSTRUMENTACION', '0') == '1'
+# Si se define, al final de cada run se escribe ahí el texto Prometheus (textfile collector)
+ARCHIVO_METRICAS = os.environ.get('SANO_FRESCO_METRICAS_ARCHIVO')
+
+# Muestras que se conservan por sonda (ventana deslizante para los percentiles)
+MAX_MUESTRAS = 1000
+PERCENTILES = (50, 90, 99)
+
+_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+
+def _rss_bytes():
+    """RSS actual del proceso (None si no hay /proc); lectura de un archivo chico, sin psutil"""
+    try:
+        with open('/proc/self/statm', 'rb') as f:
+            return int(f.read().split()[1]) * _PAGINA
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+class RegistroMetricas:
+    """Muestras de duración, delta de memoria y tamaño de figura por sonda
+
+    Es un objeto de módulo, así que acumula entre reruns y entre sesiones del
+    mismo proceso. El delta de memoria es el del RSS de todo el proceso: con
+    sesiones concurrentes es una cota, no una medición exacta.
+    """
+
+    def __init__(self, max_muestras=MAX_MUESTRAS):
+        self.max_muestras = max_muestras
+        self._sondas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, nombre, ms, memoria_kb=None, figura_bytes=None, error=False):
+        with self._lock:
+            sonda = self._sondas.get(nombre)
+            if sonda is None:
+                sonda = self._sondas[nombre] = {
+                    'ms': deque(maxlen=self.max_muestras),
+                    'memoria_kb': deque(maxlen=self.max_muestras),
+                    'figura_bytes': deque(maxlen=self.max_muestras),
+                    'llamadas': 0,
+                    'errores': 0,
+                    'total_ms': 0.0
+                }
+            sonda['ms'].append(ms)
+            sonda['llamadas'] += 1
+            sonda['total_ms'] += ms
+            sonda['errores'] += int(error)
+            if memoria_kb is not None:
+                sonda['memoria_kb'].append(memoria_kb)
+            if figura_bytes is not None:
+                sonda['figura_bytes'].append(figura_bytes)
+
+    def reiniciar(self):
+        with self._lock:
+            self._sondas.clear()
+
+    def resumen(self):
+        """{sonda: llamadas, errores, total y percentiles de ms, memoria y figura}"""
+        with self._lock:
+            copias = {nombre: {k: (list(v) if isinstance(v, deque) else v) for k, v in s.items()}
+                      for nombre, s in self._sondas.items()}
+
+        resumen = {}
+        for nombre, s in sorted(copias.items()):
+            fila = {'llamadas': s['llamadas'], 'errores': s['errores'], 'total_ms': s['total_ms']}
+            for serie in ('ms', 'memoria_kb', 'figura_bytes'):
+                if not s[serie]:
+                    continue
+                valores = np.percentile(s[serie], PERCENTILES)
+                for p, valor in zip(PERCENTILES, valores):
+                    fila[f'{serie}_p{p}'] = float(valor)
+                fila[f'{serie}_max'] = float(max(s[serie]))
+            resumen[nombre] = fila
+        return resumen
+
+    def a_json(self):
+        return json.dumps({'generado': time.time(), 'sondas': self.resumen()}, indent=2, ensure_ascii=False)
+
+    def a_prometheus(self, prefijo='sano_fresco'):
+        """Texto en formato de exposición Prometheus (un summary por serie)"""
+        resumen = self.resumen()
+        series = [
+            ('ms', 'duracion_ms', 'Duración de secciones y gráficos (ms)'),
+            ('memoria_kb', 'memoria_delta_kb', 'Delta de RSS del proceso durante la sonda (KB)'),
+            ('figura_bytes', 'figura_bytes', 'Tamaño del JSON de la figura (bytes)'),
+        ]
+        lineas = []
+        for serie, metrica, ayuda in series:
+            nombre_metrica = f'{prefijo}_{metrica}'
+            lineas += [f'# HELP {nombre_metrica} {ayuda}', f'# TYPE {nombre_metrica} summary']
+            for nombre, fila in resumen.items():
+                if f'{serie}_p50' not in fila:
+                    continue
+                etiqueta = nombre.replace('\\', '\\\\').replace('"', '\\"')
+                for p in PERCENTILES:
+                    lineas.append(f'{nombre_metrica}{{sonda="{etiqueta}",quantile="{p / 100:g}"}} '
+                                  f'{fila[f"{serie}_p{p}"]:.6g}')
+                if serie == 'ms':
+                    lineas.append(f'{nombre_metrica}_sum{{sonda="{etiqueta}"}} {fila["total_ms"]:.6g}')
+                    lineas.append(f'{nombre_metrica}_count{{sonda="{etiqueta}"}} {fila["llamadas"]}')
+        lineas.append(f'# TYPE {prefijo}_errores_total counter')
+        for nombre, fila in resumen.items():
+            etiqueta = nombre.replace('\\', '\\\\').replace('"', '\\"')
+            lineas.append(f'{prefijo}_errores_total{{sonda="{etiqueta}"}} {fila["errores"]}')
+        return '\n'.join(lineas) + '\n'
+
+    def escribir_prometheus(self, ruta):
+        """Escribe el texto Prometheus de forma atómica (para el textfile collector)
+
+        El temporal es único por proceso e hilo: dos sesiones que terminan un
+        run a la vez no se pisan el archivo a medio escribir.
+        """
+        tmp = f'{ruta}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.a_prometheus())
+        os.replace(tmp, ruta)
+
+
+registro = RegistroMetricas()
+
+
+class _SondaNula:
+    """Lo que devuelve medir() con la instrumentación apagada: no hace nada"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar_figura(self, n_bytes):
+        pass
+
+
+_SONDA_NULA = _SondaNula()
+
+
+class _Sonda:
+    __slots__ = ('nombre', 'inicio', 'rss', 'figura_bytes')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.figura_bytes = None
+
+    def __enter__(self):
+        self.rss = _rss_bytes()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        ms = (time.perf_counter() - self.inicio) * 1000
+        rss = _rss_bytes()
+        memoria_kb = (rss - self.rss) / 1024 if rss is not None and self.rss is not None else None
+        # Las excepciones de control de Streamlit (rerun, stop) no son errores de la sección
+        error = tipo is not None and not tipo.__module__.startswith('streamlit')
+        registro.registrar(self.nombre, ms, memoria_kb, self.figura_bytes, error)
+        return False
+
+    def anotar_figura(self, n_bytes):
+        self.figura_bytes = n_bytes
+
+
+def medir(nombre):
+    """Context manager que registra duración y delta de memoria de un bloque"""
+    if not HABILITADA:
+        return _SONDA_NULA
+    return _Sonda(nombre)
+
+
+def instrumentar(func=None, *, nombre=None):
+    """Decorador equivalente a medir(); con la instrumentación apagada devuelve func tal cual"""
+    if func is None:
+        return lambda f: instrumentar(f, nombre=nombre)
+    if not HABILITADA:
+        return func
+
+    @wraps(func)
+    def envoltura(*args, **kwargs):
+        with _Sonda(nombre or func.__name__):
+            return func(*args, **kwargs)
+
+    return envoltura
@@ -1,14 +1,143 @@
 import pandas as pd
 import numpy as np
 
-def calcular_metricas_globales(kpis_df):
-    """Calcula métricas agregadas del negocio"""
-    # Usar nombres exactos del CSV
-    ventas_totales = kpis_df.get('ventas_totales', pd.Series([0])).sum()
-    pedidos_totales = kpis_df.get('pedidos_unicos', pd.Series([0])).sum()
-    ticket_promedio = kpis_df.get('ticket_promedio', pd.Series([0])).mean()
-    items_promedio = kpis_df.get('productos_por_pedido', pd.Series([0])).mean()
-    clientes_unicos = kpis_df.get('clientes_unicos', pd.Series([0])).sum()
+from utils.segmentacion import ETIQUETAS_VALOR, asignar_segmentos, calcular_cortes
+
+# Columnas con suma prefija en el índice acumulado
+COLUMNAS_ACUMULADAS = [
+    'ventas_totales', 'pedidos_unicos', 'clientes_unicos', 'unidades_vendidas',
+    'ticket_promedio', 'productos_por_pedido'
+]
+
+# Columnas con sumas Σx, Σx², Σxy para la regresión lineal contra el tiempo
+COLUMNAS_TENDENCIA = ['ventas_totales']
+
+# x de la regresión: días (fraccionarios) desde la primera fecha de la serie
+_NS_POR_DIA = 86_400 * 10**9
+
+def _posiciones_rango(fechas, desde=None, hasta=None):
+    """Posiciones [inicio, fin) de un rango dentro de una secuencia de fechas ordenada"""
+    inicio = 0 if desde is None else fechas.searchsorted(pd.Timestamp(desde), side='left')
+    # 'hasta' es inclusivo para todo el día (sirve también con datos por hora)
+    fin = len(fechas) if hasta is None else fechas.searchsorted(
+        pd.Timestamp(hasta).normalize() + pd.Timedelta(days=1), side='left'
+    )
+    return int(inicio), int(fin)
+
+def construir_indice_acumulado(kpis_df, origen=None):
+    """Sumas prefijas de los KPIs diarios: cualquier rango se agrega con dos lecturas
+
+    Las x de la regresión se cuentan desde 'origen' (por defecto la primera
+    fecha): con x chicas Σx² no pierde precisión al restar sumas de un rango.
+    """
+    indice = {'fecha': pd.DatetimeIndex(kpis_df['fecha'])}
+    fechas_ns = indice['fecha'].to_numpy(dtype='datetime64[ns]')
+    if origen is None and len(fechas_ns):
+        origen = fechas_ns[0]
+    for col in COLUMNAS_ACUMULADAS:
+        if col not in kpis_df.columns:
+            continue
+        valores = kpis_df[col].to_numpy(dtype='float64')
+        validos = ~np.isnan(valores)
+        # Se antepone un 0 para que suma[i:j] = acumulado[j] - acumulado[i]
+        indice[col] = np.concatenate(([0.0], np.cumsum(np.where(validos, valores, 0.0))))
+        indice[f'n_{col}'] = np.concatenate(([0], np.cumsum(validos)))
+        if col in COLUMNAS_TENDENCIA:
+            # Σy y n ya están arriba; con Σx, Σx² y Σxy la pendiente de cualquier rango es O(1)
+            dias = (fechas_ns - np.datetime64(origen, 'ns')).astype(np.int64) / _NS_POR_DIA
+            x = np.where(validos, dias, 0.0)
+            y = np.where(validos, valores, 0.0)
+            indice[f'sx_{col}'] = np.concatenate(([0.0], np.cumsum(x)))
+            indice[f'sxx_{col}'] = np.concatenate(([0.0], np.cumsum(x * x)))
+            indice[f'sxy_{col}'] = np.concatenate(([0.0], np.cumsum(x * y)))
+    return indice
+
+def cola_indice_acumulado(indice, nuevas_filas):
+    """Valores que agregan al índice las filas nuevas (posteriores a las indexadas), sin la historia"""
+    # Mismo origen de las x que el índice existente
+    nuevo = construir_indice_acumulado(nuevas_filas, origen=indice['fecha'][0] if len(indice['fecha']) else None)
+    cola = {'fecha': nuevo['fecha']}
+    for clave, valores in indice.items():
+        if clave == 'fecha':
+            continue
+        # El acumulado nuevo parte de 0: se desplaza por el último valor ya indexado
+        cola[clave] = valores[-1] + nuevo[clave][1:]
+    return cola
+
+def _suma_rango(indice, col, inicio, fin):
+    """(suma, cantidad de valores no nulos) de una columna en [inicio, fin)"""
+    if col not in indice:
+        return 0.0, 0
+    return indice[col][fin] - indice[col][inicio], int(indice[f'n_{col}'][fin] - indice[f'n_{col}'][inicio])
+
+def calcular_tendencia(indice, desde=None, hasta=None, col='ventas_totales'):
+    """Pendiente de mínimos cuadrados (por día) y crecimiento del rango, desde las sumas prefijas
+
+    Equivale a scipy.stats.linregress(días, valores) sobre las filas no nulas
+    del rango; devuelve None si hay menos de dos días distintos.
+    """
+    if f'sxy_{col}' not in indice:
+        return None
+    inicio, fin = _posiciones_rango(indice['fecha'], desde, hasta)
+    suma_y, n = _suma_rango(indice, col, inicio, fin)
+    suma_x = indice[f'sx_{col}'][fin] - indice[f'sx_{col}'][inicio]
+    suma_xx = indice[f'sxx_{col}'][fin] - indice[f'sxx_{col}'][inicio]
+    suma_xy = indice[f'sxy_{col}'][fin] - indice[f'sxy_{col}'][inicio]
+    if n < 2:
+        return None
+    sxx = suma_xx - suma_x * suma_x / n
+    if sxx <= 1e-9:
+        return None
+
+    pendiente = (suma_xy - suma_x * suma_y / n) / sxx
+    promedio = suma_y / n
+    crecimiento_diario = pendiente / promedio * 100 if promedio else 0.0
+    return {
+        'pendiente': pendiente,
+        'promedio': promedio,
+        'crecimiento_diario': crecimiento_diario,
+        'crecimiento_anual': crecimiento_diario * 365,
+        'dias': n
+    }
+
+def calcular_metricas_globales(kpis_df, desde=None, hasta=None, indice=None, sketches=None):
+    """Calcula métricas agregadas del negocio
+
+    Con 'indice' (ver construir_indice_acumulado) o un rango [desde, hasta]
+    se agregan las sumas prefijas en O(1) en vez de recorrer kpis_df.
+    Sumar clientes_unicos diarios cuenta dos veces al cliente que vuelve: con
+    'sketches' (HyperLogLog por día, ver utils/sketches.py) clientes_unicos es
+    la estimación de clientes distintos del rango, siempre que los sketches
+    cubran todos los días del período; si no, queda la suma diaria.
+    """
+    if indice is None and desde is None and hasta is None:
+        # Usar nombres exactos del CSV
+        ventas_totales = kpis_df.get('ventas_totales', pd.Series([0])).sum()
+        pedidos_totales = kpis_df.get('pedidos_unicos', pd.Series([0])).sum()
+        ticket_promedio = kpis_df.get('ticket_promedio', pd.Series([0])).mean()
+        items_promedio = kpis_df.get('productos_por_pedido', pd.Series([0])).mean()
+        clientes_unicos = kpis_df.get('clientes_unicos', pd.Series([0])).sum()
+        unidades = kpis_df.get('unidades_vendidas', pd.Series([0])).sum()
+        dias = len(kpis_df)
+        fechas = kpis_df['fecha'] if 'fecha' in kpis_df.columns else None
+    else:
+        if indice is None:
+            indice = construir_indice_acumulado(kpis_df)
+        inicio, fin = _posiciones_rango(indice['fecha'], desde, hasta)
+        ventas_totales = _suma_rango(indice, 'ventas_totales', inicio, fin)[0]
+        pedidos_totales = int(_suma_rango(indice, 'pedidos_unicos', inicio, fin)[0])
+        clientes_unicos = int(_suma_rango(indice, 'clientes_unicos', inicio, fin)[0])
+        unidades = _suma_rango(indice, 'unidades_vendidas', inicio, fin)[0]
+        suma_ticket, n_ticket = _suma_rango(indice, 'ticket_promedio', inicio, fin)
+        suma_items, n_items = _suma_rango(indice, 'productos_por_pedido', inicio, fin)
+        ticket_promedio = suma_ticket / n_ticket if n_ticket else np.nan
+        items_promedio = suma_items / n_items if n_items else np.nan
+        dias = fin - inicio
+        fechas = indice['fecha'][inicio:fin]
+
+    # Días que los sketches no cubren quedarían sin contar: ahí vale más la suma diaria
+    if sketches is not None and fechas is not None and len(fechas) and sketches.cubre(fechas.min(), fechas.max()):
+        clientes_unicos = int(round(sketches.contar_rango(desde, hasta)))
 
     return {
         'ventas_totales': ventas_totales,
@@ -16,31 +145,55 @@ def calcular_metricas_globales(kpis_df):
         'ticket_promedio': ticket_promedio,
         'items_promedio': items_promedio,
         'clientes_unicos': clientes_unicos,
-        'dias_operacion': len(kpis_df)
+        'dias_operacion': dias,
+        # Promedios ponderados por pedido (no por día)
+        'ticket_ponderado': ventas_totales / pedidos_totales if pedidos_totales else 0.0,
+        'items_ponderado': unidades / pedidos_totales if pedidos_totales else 0.0
     }
 
-def calcular_crecimiento(kpis_df, metrica='ventas_totales'):
-    """Calcula crecimiento mes a mes"""
-    kpis_df['mes'] = kpis_df['fecha'].dt.to_period('M')
-    mensual = kpis_df.groupby('mes')[metrica].sum()
+def filtrar_rango_fechas(kpis_df, desde=None, hasta=None):
+    """Recorta kpis_df (ordenado por 'fecha') a [desde, hasta] con búsqueda binaria"""
+    inicio, fin = _posiciones_rango(kpis_df['fecha'], desde, hasta)
+    # Slice posicional: no recorre la tabla ni copia los datos
+    return kpis_df.iloc[inicio:fin]
+
+def calcular_crecimiento(kpis_df, metrica='ventas_totales', cubo=None):
+    """Calcula crecimiento mes a mes con los totales mensuales del CuboVentas"""
+    from utils.cubos import CuboVentas
+
+    if cubo is None:
+        cubo = CuboVentas.desde_kpis(kpis_df, [metrica])
+    mensual = cubo.mensual(metrica)
     crecimiento = mensual.pct_change() * 100
     return mensual, crecimiento
 
-def segmentar_clientes_valor(clientes_df):
-    """Segmenta clientes por valor (percentiles) usando 'gasto_total'"""
-    clientes_df['segmento'] = pd.qcut(
-        clientes_df['gasto_total'], 
-        q=4, 
-        labels=['Bajo', 'Medio', 'Alto', 'Premium'],
-        duplicates='drop'  # Maneja duplicados si hay
-    )
+def segmentar_clientes_valor(clientes_df, cortes=None, aproximado=False):
+    """Segmenta clientes por valor (cuartiles) usando 'gasto_total'
+
+    Los cortes se pueden precalcular una vez por versión de datos con
+    calcular_cortes(); la asignación es un searchsorted vectorizado.
+    """
+    gasto = clientes_df['gasto_total'].to_numpy(dtype='float64')
+    if cortes is None:
+        cortes = calcular_cortes(gasto, q=4, aproximado=aproximado)
+    # Copia superficial: el frame cacheado (posiblemente mapeado en memoria) no se modifica
+    clientes_df = clientes_df.copy(deep=False)
+    clientes_df['segmento'] = asignar_segmentos(gasto, cortes, ETIQUETAS_VALOR)
     return clientes_df
 
-def identificar_productos_estrella(productos_df, top_n=10):
-    """Identifica productos top por múltiples métricas usando nombres del CSV"""
-    top_ventas = productos_df.nlargest(top_n, 'ventas_totales')
-    top_frecuencia = productos_df.nlargest(top_n, 'pedidos_unicos')  # Proxy de frecuencia
-    top_ticket = productos_df.nlargest(top_n, 'precio_promedio')  # Proxy de ticket
+def identificar_productos_estrella(productos_df, top_n=10, ranking=None):
+    """Identifica productos top por múltiples métricas usando nombres del CSV
+
+    Con un RankingProductos (el de la versión de datos) cada top es un corte
+    de su permutación en vez de un nlargest sobre todo el catálogo.
+    """
+    if ranking is None:
+        from utils.ranking import RankingProductos
+        ranking = RankingProductos(productos_df)
+
+    top_ventas = ranking.top('ventas_totales', top_n)
+    top_frecuencia = ranking.top('pedidos_unicos', top_n)  # Proxy de frecuencia
+    top_ticket = ranking.top('precio_promedio', top_n)  # Proxy de ticket
     
     return {
         'top_ventas': top_ventas,
@@ -0,0 +1,66 @@
+import numpy as np
+
+# Puntos por traza que se envían al navegador (~ ancho en píxeles del gráfico)
+PUNTOS_MAX = 1200
+# Desde esta cantidad de puntos por traza se dibuja con WebGL (Scattergl)
+UMBRAL_WEBGL = 1000
+
+
+def _bordes_buckets(n, n_buckets, inicio=0):
+    """Límites de n_buckets tramos contiguos y no vacíos sobre [inicio, n)"""
+    return np.linspace(inicio, n, n_buckets + 1).astype(np.int64)
+
+
+def lttb(x, y, n_salida):
+    """Índices elegidos por Largest-Triangle-Three-Buckets
+
+    Conserva el primer y el último punto y, en cada bucket, el que forma el
+    triángulo de mayor área con el punto ya elegido y el promedio del bucket
+    siguiente; así se mantienen los picos y la forma de la serie.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n_salida >= n or n_salida < 3:
+        return np.arange(n)
+
+    # Los extremos van fijos; el resto se reparte en n_salida - 2 buckets
+    bordes = _bordes_buckets(n - 1, n_salida - 2, inicio=1)
+    indices = np.empty(n_salida, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    elegido = 0
+    for i in range(n_salida - 2):
+        ini, fin = bordes[i], bordes[i + 1]
+        sig_fin = bordes[i + 2] if i + 2 < len(bordes) else n
+        cx, cy = x[fin:sig_fin].mean(), y[fin:sig_fin].mean()
+        xs, ys = x[ini:fin], y[ini:fin]
+        area = np.abs((x[elegido] - cx) * (ys - y[elegido]) - (x[elegido] - xs) * (cy - y[elegido]))
+        elegido = ini + int(np.argmax(area))
+        indices[i + 1] = elegido
+    return indices
+
+
+def min_max(y, n_salida):
+    """Índices del mínimo y el máximo de cada bucket (a lo más n_salida puntos)"""
+    y = np.asarray(y, dtype='float64')
+    n = len(y)
+    if n_salida >= n or n_salida < 2:
+        return np.arange(n)
+
+    bordes = _bordes_buckets(n, n_salida // 2)
+    indices = []
+    for ini, fin in zip(bordes[:-1], bordes[1:]):
+        tramo = y[ini:fin]
+        indices += [ini + int(np.argmin(tramo)), ini + int(np.argmax(tramo))]
+    return np.unique(indices)
+
+
+def indices_muestreo(x, y, max_puntos=PUNTOS_MAX, metodo='lttb'):
+    """Índices a graficar según el método ('lttb', 'minmax' o None para todos)"""
+    if metodo is None or max_puntos is None:
+        return np.arange(len(y))
+    if metodo == 'minmax':
+        return min_max(y, max_puntos)
+    if metodo == 'lttb':
+        return lttb(x, y, max_puntos)
+    raise ValueError(f"Método de muestreo no soportado: {metodo}")
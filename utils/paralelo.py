@@ -0,0 +1,70 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.figure_cache import clave_figura
+from utils.precalculo import construir
+
+logger = logging.getLogger(__name__)
+
+# '0' = secuencial (por defecto) o 'hilos'
+MODO = os.environ.get('SANO_FRESCO_FIGURAS_PARALELAS', '0')
+if MODO == 'procesos':
+    logger.warning("SANO_FRESCO_FIGURAS_PARALELAS='procesos' ya no existe; se usan hilos")
+    MODO = 'hilos'
+MAX_TRABAJADORES = int(os.environ.get('SANO_FRESCO_TRABAJADORES', '0')) or min(8, os.cpu_count() or 1)
+
+# Un pool compartido por todas las sesiones y reruns
+_ejecutor = None
+_ejecutor_lock = threading.Lock()
+
+
+def ejecutor():
+    """Pool de hilos acotado a MAX_TRABAJADORES; se crea la primera vez que se pide"""
+    global _ejecutor
+    with _ejecutor_lock:
+        if _ejecutor is None:
+            _ejecutor = ThreadPoolExecutor(MAX_TRABAJADORES, thread_name_prefix='figuras')
+        return _ejecutor
+
+
+class FigurasEnCurso:
+    """Figuras de una vista encargadas a un pool al inicio del run y retiradas en orden de layout
+
+    Cada tarea pasa por memoizar_figura como siempre. Lo que no se encargó, o
+    ya se retiró, se construye en el momento. No hay modo con procesos: el
+    servidor de Streamlit tiene varios hilos (un fork hereda sus locks tomados)
+    y con spawn/forkserver cada hijo volvería a ejecutar app.py, que Streamlit
+    instala como __main__.
+    """
+
+    def __init__(self, plan, nombres, modo=MODO):
+        self.plan = plan
+        self._pendientes = {}
+        self._claves = {}
+        if modo != 'hilos':
+            return
+
+        pool = ejecutor()
+        for nombre in nombres:
+            self._pendientes[nombre] = pool.submit(construir, self.plan[nombre])
+
+    def _clave_plan(self, nombre):
+        # Una vez por nombre: los reruns de un fragment reutilizan este objeto
+        if nombre not in self._claves:
+            self._claves[nombre] = clave_figura(*self.plan[nombre])
+        return self._claves[nombre]
+
+    def obtener(self, nombre, llamada=None):
+        """La figura 'nombre': espera su tarea si está en curso o la construye ahora
+
+        Una sección con opciones propias (p. ej. dentro de un fragment) puede
+        pasar su 'llamada': si no es la encargada, se construye esa.
+        """
+        if llamada is not None and clave_figura(*llamada) != self._clave_plan(nombre):
+            return construir(llamada)
+        futuro = self._pendientes.pop(nombre, None)
+        if futuro is None:
+            return construir(self.plan[nombre])
+        return futuro.result()
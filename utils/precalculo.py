@@ -0,0 +1,313 @@
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils import data_store
+from utils.correlaciones import OPCIONES_CORRELACION, IndiceCorrelaciones
+from utils.data_store import cargar_dataset, cargar_dataset_mmap, version_datos
+from utils.figure_cache import cache_figuras, clave_figura
+from utils.ingesta import IngestorKpis
+from utils.instrumentacion import medir
+from utils.metrics import (
+    calcular_crecimiento,
+    calcular_metricas_globales,
+    calcular_tendencia,
+    filtrar_rango_fechas,
+    identificar_productos_estrella,
+    segmentar_clientes_valor
+)
+from utils.ranking import RankingProductos
+from utils.rfm import aplicar_segmentos_rfm, cargar_o_calcular_rfm
+from utils.segmentacion import calcular_cortes
+from utils.sketches import cargar_sketches
+from utils.visualizations import (
+    crear_grafico_correlacion_rodante,
+    crear_grafico_distribucion_clientes,
+    crear_grafico_pareto,
+    crear_grafico_progreso_objetivos,
+    crear_grafico_ranking_productos,
+    crear_grafico_tendencia_ventas,
+    crear_heatmap_ventas_mensual,
+    crear_mapa_correlaciones,
+    crear_sankey_segmentos,
+    crear_treemap_productos,
+    crear_waterfall_contribucion
+)
+
+# Modo memory-map: una sola copia de clientes compartida por todas las sesiones
+CARGA_MMAP = os.environ.get('SANO_FRESCO_CLIENTES_MMAP', '1') == '1'
+
+# Objetivos más realistas basados en tus datos
+OBJETIVOS = {
+    'ventas': 5000000,      # 5 millones
+    'pedidos': 250000,      # 250 mil pedidos (ajustado)
+    'clientes': 15000       # 15 mil clientes (ajustado)
+}
+
+# Versiones de artefactos que se conservan en disco (la actual y las anteriores)
+VERSIONES_CONSERVADAS = 2
+
+
+def version_clientes():
+    """Versión de los datos de clientes y productos (la que usa el RFM persistido)"""
+    return version_datos(('analisis_clientes', 'analisis_productos'))
+
+
+def ruta_artefactos(version):
+    """Directorio de los artefactos precalculados de una versión de datos"""
+    return data_store.CACHE_DIR / 'artefactos' / version
+
+
+def cargar_clientes():
+    """analisis_clientes como lo carga el dashboard (memory-map o copia)"""
+    return cargar_dataset_mmap('analisis_clientes') if CARGA_MMAP else cargar_dataset('analisis_clientes')
+
+
+def cargar_categorias():
+    """Jerarquía categoría > subcategoría de los productos (None si no hay archivo)"""
+    try:
+        return cargar_dataset('categorias_productos')
+    except FileNotFoundError:
+        return None
+
+
+def segmentar_clientes(clientes_df, version, cortes=None):
+    """Segmentación por valor y RFM de clientes (sin tocar el frame original)"""
+    clientes = segmentar_clientes_valor(clientes_df, cortes=cortes)
+    if {'ultima_compra', 'gasto_total'} <= set(clientes_df.columns):
+        # El donut y el Sankey leen las etiquetas RFM persistidas junto a los datos
+        clientes = aplicar_segmentos_rfm(clientes, cargar_o_calcular_rfm(clientes_df, version))
+    return clientes
+
+
+def preparar_periodo(kpis_df, indice, cubo, desde, hasta, correlaciones=None, sketches=None):
+    """KPIs recortados, métricas, tendencia y cubo de un período (todo en O(1) u O(bordes))
+
+    'correlaciones' es el IndiceCorrelaciones de kpis_df (el del ingestor); el
+    período lo guarda junto a su rango para que plan_correlaciones lo consulte.
+    Con 'sketches' (clientes por día, ver cargar_sketches) los clientes únicos
+    del período son distintos de verdad y no la suma de los diarios.
+    """
+    kpis_periodo = filtrar_rango_fechas(kpis_df, desde, hasta)
+    with medir('calcular_metricas_globales'):
+        metricas = calcular_metricas_globales(kpis_df, desde, hasta, indice=indice, sketches=sketches)
+    with medir('seccion.agregados_periodo'):
+        # Pendiente de ventas del período en O(1) con las sumas Σx, Σy, Σxy, Σx² del índice
+        tendencia = calcular_tendencia(indice, desde, hasta)
+        # Rollups del período: meses y semanas completos salen del cubo, solo los bordes se agregan
+        cubo_periodo = cubo.consultar(kpis_df, desde, hasta)
+    if correlaciones is None:
+        correlaciones = IndiceCorrelaciones.desde_kpis(kpis_df)
+    return {
+        'kpis': kpis_periodo, 'metricas': metricas, 'tendencia': tendencia, 'cubo': cubo_periodo,
+        'correlaciones': correlaciones, 'desde': desde, 'hasta': hasta
+    }
+
+
+def plan_correlaciones(periodo, opciones=None):
+    """Entradas de plan_vista de la sección de correlaciones según método, par y ventana
+
+    La matriz y la serie rodante salen del índice de correlaciones (cacheadas
+    por rango); al constructor solo le llegan esos resultados, que son chicos.
+    """
+    opciones = {**OPCIONES_CORRELACION, **(opciones or {})}
+    indice = periodo['correlaciones']
+    desde, hasta = periodo['desde'], periodo['hasta']
+    matriz, n = indice.matriz(desde, hasta, opciones['metodo'])
+    col_a, col_b = opciones['par']
+    if col_a in indice.columnas and col_b in indice.columnas:
+        rodante = indice.rodante(col_a, col_b, opciones['ventana'], desde, hasta)
+    else:
+        rodante = pd.Series(dtype='float64', index=pd.DatetimeIndex([]))
+    return {
+        'correlaciones': (crear_mapa_correlaciones, (periodo['kpis'],), {
+            'matriz': matriz, 'n': n, 'metodo': opciones['metodo']
+        }),
+        'correlacion_rodante': (crear_grafico_correlacion_rodante, (rodante, col_a, col_b, opciones['ventana']), {}),
+    }
+
+
+def resumen_segmentos(clientes_df):
+    """Clientes y gasto por segmento del detalle de clientes (mismas columnas que FuenteSQL.resumen_segmentos)"""
+    if clientes_df is None or not {'segmento', 'gasto_total'} <= set(clientes_df.columns):
+        return None
+    resumen = clientes_df.groupby('segmento', observed=True)['gasto_total'].agg(['count', 'sum'])
+    return pd.DataFrame({
+        'segmento': resumen.index.to_numpy(),
+        'clientes': resumen['count'].to_numpy(dtype='int64'),
+        'gasto_total': resumen['sum'].to_numpy(dtype='float64'),
+    })
+
+
+def plan_vista(periodo, clientes_df, productos_df, objetivos=OBJETIVOS, ranking=None, categorias_df=None,
+               opciones_correlacion=None, fuente=None, resumen=None):
+    """Llamadas crear_* del dashboard: nombre -> (constructor, args, kwargs)
+
+    Es la única definición de los argumentos de cada gráfico, así el
+    precálculo y el dashboard producen la misma clave de cache. 'ranking' es
+    el RankingProductos de la versión de datos (si no, se arma uno aquí).
+    Con una FuenteSQL el heatmap llega ya agregado desde la base y
+    clientes_df puede ser None. El donut y el Sankey reciben solo 'resumen'
+    (ver resumen_segmentos, calculado una vez por versión de datos): su clave
+    de cache no recorre los clientes. Sin 'resumen' se calcula aquí.
+    """
+    kpis_periodo = periodo['kpis']
+    if ranking is None:
+        ranking = RankingProductos(productos_df)
+    if resumen is None:
+        resumen = fuente.resumen_segmentos() if fuente is not None else resumen_segmentos(clientes_df)
+    # Sin columnas de segmento el constructor recibe el detalle (y muestra el aviso)
+    segmentos = ((clientes_df,), {}) if resumen is None else ((None,), {'resumen': resumen})
+    heatmap = {'cubo': periodo['cubo']}
+    if fuente is not None:
+        heatmap = {'pivot': fuente.heatmap(periodo['desde'], periodo['hasta'])}
+    return {
+        'tendencia': (crear_grafico_tendencia_ventas, (kpis_periodo,), {'tendencia': periodo['tendencia']}),
+        'distribucion_clientes': (crear_grafico_distribucion_clientes, *segmentos),
+        'top_ventas': (crear_grafico_ranking_productos, (
+            productos_df, 'ventas_totales', 'Ventas Totales ($)', '#0891b2', '<b>$%{text:,.0f}</b>', 15
+        ), {'bargap': 0.3, 'ranking': ranking}),
+        'mas_frecuentes': (crear_grafico_ranking_productos, (
+            productos_df, 'pedidos_unicos', 'Pedidos Únicos', '#06D6A0', '<b>%{text:,.0f}</b>', 15
+        ), {'ranking': ranking}),
+        'mayor_precio': (crear_grafico_ranking_productos, (
+            productos_df, 'precio_promedio', 'Precio Promedio ($)', '#059669', '<b>$%{text:.2f}</b>', 15
+        ), {'ranking': ranking}),
+        'cascada': (crear_waterfall_contribucion, (productos_df, 10), {'ranking': ranking}),
+        'pareto': (crear_grafico_pareto, (productos_df,), {'ranking': ranking}),
+        'sankey': (crear_sankey_segmentos, *segmentos),
+        'treemap': (crear_treemap_productos, (productos_df,), {'categorias_df': categorias_df, 'ranking': ranking}),
+        'heatmap': (crear_heatmap_ventas_mensual, (kpis_periodo,), heatmap),
+        'objetivos': (crear_grafico_progreso_objetivos, (periodo['metricas'], objetivos), {}),
+        **plan_correlaciones(periodo, opciones_correlacion),
+    }
+
+
+def construir(llamada):
+    """Ejecuta una entrada de plan_vista (pasa por el cache de figuras)"""
+    constructor, args, kwargs = llamada
+    return constructor(*args, **kwargs)
+
+
+def _a_json(valor):
+    if isinstance(valor, np.generic):
+        return valor.item()
+    return str(valor)
+
+
+def _escribir_json(ruta, datos):
+    ruta.write_text(json.dumps(datos, indent=2, ensure_ascii=False, default=_a_json), encoding='utf-8')
+
+
+def _escribir_tabla(ruta, df):
+    """Parquet si pyarrow está disponible; si no, CSV con el mismo nombre base"""
+    df.columns = [str(c) for c in df.columns]
+    if data_store.PARQUET_DISPONIBLE:
+        df.to_parquet(ruta.with_suffix('.parquet'))
+        return ruta.with_suffix('.parquet').name
+    df.to_csv(ruta.with_suffix('.csv'))
+    return ruta.with_suffix('.csv').name
+
+
+def precalcular(con_figuras=True, conservar=VERSIONES_CONSERVADAS):
+    """Calcula todos los artefactos de la vista inicial y los publica en ruta_artefactos(version)
+
+    Se escribe en un directorio temporal y se renombra al final, así el
+    dashboard nunca ve una versión a medio escribir. Devuelve (version, ruta).
+    """
+    version = version_datos()
+    destino = ruta_artefactos(version)
+
+    estado = IngestorKpis('kpis_diarios').actualizar()
+    kpis, indice, cubo = estado['kpis'], estado['indice'], estado['cubo']
+    correlaciones = estado['correlaciones']
+    clientes = cargar_clientes()
+    productos = cargar_dataset('analisis_productos')
+    ranking = RankingProductos(productos)
+    categorias = cargar_categorias()
+    sketches = cargar_sketches('clientes_por_dia')
+
+    cortes = calcular_cortes(clientes['gasto_total'].to_numpy(dtype='float64'), q=4)
+    clientes_segmentados = segmentar_clientes(clientes, version_clientes(), cortes)
+    # La vista inicial del dashboard es el rango completo de fechas
+    periodo = preparar_periodo(
+        kpis, indice, cubo, kpis['fecha'].min().date(), kpis['fecha'].max().date(), correlaciones, sketches
+    )
+
+    tmp = destino.with_name(f'.{version}.{os.getpid()}.tmp')
+    shutil.rmtree(tmp, ignore_errors=True)
+    (tmp / 'figuras').mkdir(parents=True)
+
+    archivos = ['metricas_globales.json', 'cortes_valor.json', 'productos_estrella.json']
+    _escribir_json(tmp / 'metricas_globales.json', calcular_metricas_globales(kpis, sketches=sketches))
+    _escribir_json(tmp / 'cortes_valor.json', cortes.tolist())
+    estrellas = identificar_productos_estrella(productos, ranking=ranking)
+    _escribir_json(tmp / 'productos_estrella.json',
+                   {clave: df.to_dict(orient='records') for clave, df in estrellas.items()})
+
+    pareto = ranking.ordenados('ventas_totales')[['nombre_producto', 'ventas_totales']]
+    pareto['porcentaje_acumulado'] = ranking.porcentaje_acumulado('ventas_totales')
+    archivos.append(_escribir_tabla(tmp / 'pareto', pareto.reset_index(drop=True)))
+    archivos.append(_escribir_tabla(tmp / 'correlaciones', correlaciones.matriz()[0].copy()))
+    archivos.append(_escribir_tabla(tmp / 'correlaciones_spearman', correlaciones.matriz(metodo='spearman')[0].copy()))
+    archivos.append(_escribir_tabla(tmp / 'heatmap_ventas', cubo.heatmap('ventas_totales')))
+    mensual, crecimiento = calcular_crecimiento(kpis, cubo=cubo)
+    archivos.append(_escribir_tabla(tmp / 'crecimiento_mensual', mensual.to_frame().assign(
+        crecimiento_pct=crecimiento.to_numpy()).set_axis(mensual.index.astype(str))))
+
+    figuras = {}
+    if con_figuras:
+        vista = plan_vista(periodo, clientes_segmentados, productos, ranking=ranking, categorias_df=categorias)
+        for nombre, (constructor, args, kwargs) in vista.items():
+            fig = getattr(constructor, 'sin_cache', constructor)(*args, **kwargs)
+            (tmp / 'figuras' / f'{nombre}.json').write_text(fig.to_json(), encoding='utf-8')
+            figuras[nombre] = clave_figura(constructor, args, kwargs)
+
+    # El manifest se escribe al final: su presencia marca la versión como completa
+    _escribir_json(tmp / 'manifest.json', {
+        'version': version,
+        'version_kpis': estado['version'],
+        'generado': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'archivos': archivos,
+        'figuras': figuras
+    })
+    shutil.rmtree(destino, ignore_errors=True)
+    os.replace(tmp, destino)
+
+    # Las versiones viejas ya no las pide nadie
+    anteriores = sorted((d for d in destino.parent.iterdir() if d.is_dir() and not d.name.startswith('.')),
+                        key=lambda d: d.stat().st_mtime, reverse=True)
+    for viejo in anteriores[conservar:]:
+        shutil.rmtree(viejo, ignore_errors=True)
+    return version, destino
+
+
+def cargar_artefactos(version=None, precargar_figuras=True):
+    """Artefactos precalculados de la versión actual (None si no hay) y figuras al cache
+
+    Las figuras se cargan en cache_figuras con la misma clave que usaría
+    memoizar_figura: la vista inicial se renderiza sin construir nada.
+    """
+    version = version or version_datos()
+    ruta = ruta_artefactos(version)
+    try:
+        manifest = json.loads((ruta / 'manifest.json').read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return None
+
+    if precargar_figuras:
+        for nombre, clave in manifest['figuras'].items():
+            try:
+                cache_figuras.guardar(clave, (ruta / 'figuras' / f'{nombre}.json').read_text(encoding='utf-8'))
+            except OSError:
+                continue
+    return {
+        'version': version,
+        'manifest': manifest,
+        'metricas_globales': json.loads((ruta / 'metricas_globales.json').read_text(encoding='utf-8')),
+        'cortes_valor': np.asarray(json.loads((ruta / 'cortes_valor.json').read_text(encoding='utf-8')))
+    }
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+from utils.figure_cache import huella_df
+
+# Métricas por las que se rankea el catálogo (pestañas, productos estrella, cascada y Pareto)
+METRICAS_RANKING = ['ventas_totales', 'pedidos_unicos', 'precio_promedio']
+
+# Catálogos grandes: el Pareto detalla la cabeza y agrupa la cola en tramos
+# ("Siguientes 100", "Siguientes 1.000", "Resto"); hasta MAX_BARRAS_PARETO
+# productos se dibuja una barra por producto como siempre
+MAX_BARRAS_PARETO = 60
+PRODUCTOS_DETALLE = 50
+TRAMOS_COLA = (100, 1000)
+# Treemap: productos con cuadro propio por subcategoría (el resto va a 'Otros (n)')
+HOJAS_POR_GRUPO = 25
+
+
+class RankingProductos:
+    """Catálogo ordenado una sola vez por métrica: permutación descendente y suma acumulada
+
+    Cualquier top N, el total del resto y el porcentaje acumulado del Pareto
+    son cortes de estos arreglos, sin volver a recorrer ni ordenar el
+    catálogo. El orden es el de nlargest(keep='first'): los empates quedan en
+    el orden original y los NaN no entran al ranking. Se construye una vez por
+    versión de datos y no se modifica (se comparte entre sesiones e hilos).
+    """
+
+    def __init__(self, productos_df, metricas=METRICAS_RANKING):
+        self.productos = productos_df
+        self._huella = huella_df(productos_df)
+        self._ordenes = {}
+        for metrica in metricas:
+            if metrica not in productos_df.columns:
+                continue
+            valores = productos_df[metrica].to_numpy(dtype='float64', na_value=np.nan)
+            # Orden estable sobre el negativo: descendente y con los empates en orden original
+            orden = np.argsort(-valores, kind='stable')
+            validos = int(np.count_nonzero(~np.isnan(valores)))
+            orden = orden[:validos]
+            self._ordenes[metrica] = (orden, np.cumsum(valores[orden]))
+
+    def __contains__(self, metrica):
+        return metrica in self._ordenes
+
+    def orden(self, metrica):
+        """Posiciones de los productos de mayor a menor 'metrica'"""
+        return self._ordenes[metrica][0]
+
+    def acumulado(self, metrica):
+        """Suma acumulada de 'metrica' en el orden del ranking"""
+        return self._ordenes[metrica][1]
+
+    def total(self, metrica):
+        acumulado = self.acumulado(metrica)
+        return float(acumulado[-1]) if len(acumulado) else 0.0
+
+    def top(self, metrica, n):
+        """Equivalente a productos_df.nlargest(n, metrica)"""
+        return self.productos.iloc[self.orden(metrica)[:n]]
+
+    def ordenados(self, metrica):
+        """Todo el catálogo de mayor a menor 'metrica' (sort_values(ascending=False) sin ordenar)"""
+        return self.productos.iloc[self.orden(metrica)]
+
+    def resto(self, metrica, n):
+        """Suma de 'metrica' de todos los productos fuera del top n"""
+        acumulado = self.acumulado(metrica)
+        if n >= len(acumulado):
+            return 0.0
+        return float(acumulado[-1] - (acumulado[n - 1] if n > 0 else 0.0))
+
+    def porcentaje_acumulado(self, metrica):
+        """Participación acumulada (%) de 'metrica' en el orden del ranking"""
+        total = self.total(metrica)
+        acumulado = self.acumulado(metrica)
+        return acumulado / total * 100 if total else np.zeros(len(acumulado))
+
+    def corte(self, metrica, porcentaje=80):
+        """Cuántos productos (los primeros del ranking) acumulan 'porcentaje' % del total
+
+        Búsqueda binaria sobre la suma acumulada: O(log n) en vez de recorrerla.
+        """
+        acumulado = self.acumulado(metrica)
+        if not len(acumulado):
+            return 0
+        objetivo = acumulado[-1] * porcentaje / 100
+        return min(int(np.searchsorted(acumulado, objetivo, side='left')) + 1, len(acumulado))
+
+    def cabeza_y_cola(self, metrica, detalle=PRODUCTOS_DETALLE, tramos=TRAMOS_COLA):
+        """Top 'detalle' productos uno por fila y la cola agrupada en tramos del ranking
+
+        Columnas: nombre_producto, 'metrica' (suma del tramo), productos,
+        porcentaje_acumulado y es_tramo. Cada suma sale de dos lecturas del
+        acumulado, así que el costo no depende del largo de la cola.
+        """
+        acumulado = self.acumulado(metrica)
+        n = len(acumulado)
+        detalle = min(detalle, n)
+        cabeza = self.top(metrica, detalle)
+
+        bordes = [detalle]
+        for tramo in tramos:
+            if bordes[-1] + tramo >= n:
+                break
+            bordes.append(bordes[-1] + tramo)
+        if bordes[-1] < n:
+            bordes.append(n)
+        bordes = np.asarray(bordes)
+
+        previo = np.concatenate(([0.0], acumulado))
+        nombres = [f'Siguientes {fin - inicio:,}'.replace(',', '.') for inicio, fin in zip(bordes[:-1], bordes[1:])]
+        if len(nombres):
+            nombres[-1] = f'Resto ({bordes[-1] - bordes[-2]:,} productos)'.replace(',', '.')
+
+        total = previo[-1] or 1.0
+        return pd.DataFrame({
+            'nombre_producto': list(cabeza['nombre_producto'].astype(str)) + nombres,
+            metrica: np.concatenate((cabeza[metrica].to_numpy(dtype='float64'),
+                                     previo[bordes[1:]] - previo[bordes[:-1]])),
+            'productos': np.concatenate((np.ones(detalle, dtype='int64'), np.diff(bordes))),
+            'porcentaje_acumulado': np.concatenate((acumulado[:detalle], previo[bordes[1:]])) / total * 100,
+            'es_tramo': np.arange(detalle + len(nombres)) >= detalle
+        })
+
+    def huella(self):
+        """La huella del catálogo del que sale (para la clave del cache de figuras)"""
+        return self._huella
@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+import time
+
+from utils.data_store import cargar_dataset, version_datos
+from utils.fuente_sql import RUTA_SQL, FuenteSQL, version_sql
+from utils.ingesta import IngestorKpis, indexar_kpis
+from utils.precalculo import (
+    cargar_artefactos,
+    cargar_categorias,
+    cargar_clientes,
+    ruta_artefactos,
+    resumen_segmentos,
+    segmentar_clientes,
+    version_clientes
+)
+from utils.ranking import RankingProductos
+from utils.sketches import cargar_sketches
+
+logger = logging.getLogger(__name__)
+
+# Segundos entre revisiones de los archivos de datos en segundo plano.
+# '0' = sin hilo: se revisa (y se recarga si cambió algo) dentro de cada run, como antes.
+INTERVALO_REFRESCO = float(os.environ.get('SANO_FRESCO_REFRESCO', '15'))
+
+# Partes de la instantánea: cada una se recarga solo si cambió su versión
+PARTES = ('base', 'kpis', 'artefactos', 'categorias', 'sketches')
+
+
+class Refrescador:
+    """Instantánea de los datos del dashboard, recargada en segundo plano cuando cambian los archivos
+
+    Un hilo revisa cada 'intervalo' segundos las versiones de los datos
+    (mtime y tamaño de los CSV o de la base SQL) y, si algo cambió, arma una
+    instantánea nueva reutilizando las partes que no cambiaron. Mientras tanto
+    las sesiones siguen leyendo la anterior; la nueva se publica de una vez
+    (un solo reemplazo de referencia), así que ningún run queda a medio camino
+    entre dos versiones ni espera una recarga. Solo la primera carga es
+    sincrónica. Un cambio se carga cuando las versiones repiten en dos
+    revisiones seguidas (no se lee un archivo que se está escribiendo). Si una
+    recarga falla se conserva la versión vigente y se reintenta en la próxima
+    revisión.
+    """
+
+    def __init__(self, intervalo=INTERVALO_REFRESCO):
+        self.intervalo = intervalo
+        self._ingestor = IngestorKpis('kpis_diarios')
+        self._lock = threading.Lock()
+        self._lock_hilo = threading.Lock()
+        self._detener = threading.Event()
+        self._hilo = None
+        self._vistas = None
+        self._datos = None
+        self.error = None
+        self.recargas = 0
+        self.ultima_revision = None
+
+    def _versiones(self):
+        version = None if RUTA_SQL else version_datos()
+        return {
+            'base': f'sql:{version_sql(RUTA_SQL)}' if RUTA_SQL else version_clientes(),
+            # precalcular.py puede publicar los artefactos después de que cambien los CSV
+            'artefactos': version and (version, (ruta_artefactos(version) / 'manifest.json').exists()),
+            'categorias': version_datos(('categorias_productos',)),
+            'sketches': version_datos(('lineas_pedidos',)),
+        }
+
+    def _cargar_base(self, artefactos):
+        """Clientes segmentados, catálogo, su ranking y el resumen por segmento (o la base SQL, sin clientes)"""
+        if RUTA_SQL:
+            fuente = FuenteSQL(RUTA_SQL)
+            productos = fuente.productos()
+            return {'fuente': fuente, 'clientes': None, 'productos': productos,
+                    'ranking': RankingProductos(productos), 'resumen': fuente.resumen_segmentos(),
+                    'version': fuente.version}
+        version = version_clientes()
+        productos = cargar_dataset('analisis_productos')
+        # Con artefactos precalculados los cuartiles de gasto ya vienen resueltos
+        clientes = segmentar_clientes(
+            cargar_clientes(), version, cortes=artefactos['cortes_valor'] if artefactos else None
+        )
+        return {'fuente': None, 'clientes': clientes, 'productos': productos,
+                'ranking': RankingProductos(productos), 'resumen': resumen_segmentos(clientes), 'version': version}
+
+    def _construir(self, anterior, versiones):
+        def vigente(parte):
+            return anterior is not None and anterior['versiones'].get(parte) == versiones[parte]
+
+        datos = {'versiones': versiones}
+        if vigente('artefactos'):
+            datos['artefactos'] = anterior['artefactos']
+        else:
+            datos['artefactos'] = cargar_artefactos(versiones['artefactos'][0]) if versiones['artefactos'] else None
+        datos['base'] = anterior['base'] if vigente('base') else self._cargar_base(datos['artefactos'])
+        fuente = datos['base']['fuente']
+        try:
+            if fuente is None:
+                # IngestorKpis devuelve el mismo estado si el archivo no cambió (y solo anexa si creció)
+                datos['kpis'] = self._ingestor.actualizar()
+            elif vigente('base'):
+                datos['kpis'] = anterior['kpis']
+            else:
+                kpis = fuente.kpis()
+                indice, cubo, correlaciones = indexar_kpis(kpis)
+                datos['kpis'] = {'kpis': kpis, 'indice': indice, 'cubo': cubo,
+                                 'correlaciones': correlaciones, 'version': fuente.version}
+
+            datos['categorias'] = anterior['categorias'] if vigente('categorias') else cargar_categorias()
+            datos['sketches'] = (anterior['sketches'] if vigente('sketches')
+                                 else cargar_sketches('clientes_por_dia', fuente=versiones['sketches']))
+        except Exception:
+            # La base recién abierta no se va a publicar
+            if not vigente('base') and fuente is not None:
+                fuente.cerrar()
+            raise
+        return datos
+
+    def revisar(self, estable=False):
+        """Recarga lo que haya cambiado y publica la instantánea nueva; True si hubo cambios
+
+        Con 'estable' un cambio de versión solo se carga si ya se vio igual en
+        la revisión anterior.
+        """
+        with self._lock:
+            anterior = self._datos
+            versiones = self._versiones()
+            vistas, self._vistas = self._vistas, versiones
+            if estable and anterior is not None and versiones != anterior['versiones'] and versiones != vistas:
+                return False
+            nuevo = self._construir(anterior, versiones)
+            self.ultima_revision = time.time()
+            self.error = None
+            if anterior is not None and all(nuevo[parte] is anterior[parte] for parte in PARTES):
+                return False
+            self._datos = nuevo
+            self.recargas += 1
+            if anterior is not None and nuevo['base'] is not anterior['base'] and anterior['base']['fuente'] is not None:
+                # Los runs que aún usan la instantánea anterior terminan sus consultas antes del cierre
+                anterior['base']['fuente'].cerrar()
+            return True
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            try:
+                if self.revisar(estable=True):
+                    logger.info('Datos recargados en segundo plano (recarga %d)', self.recargas)
+            except Exception as e:  # la versión vigente sigue sirviendo; se reintenta en la próxima vuelta
+                self.error = e
+                logger.warning('No se pudieron recargar los datos: %s', e)
+
+    def iniciar(self):
+        """Arranca el hilo de revisión (una sola vez)"""
+        if self._hilo is not None:
+            return
+        with self._lock_hilo:
+            if self._hilo is None and self.intervalo > 0:
+                self._hilo = threading.Thread(target=self._bucle, name='refresco-datos', daemon=True)
+                self._hilo.start()
+
+    def detener(self):
+        self._detener.set()
+
+    def datos(self):
+        """La instantánea vigente; la primera vez (o sin hilo) se carga en el momento"""
+        if self._datos is None:
+            self.revisar()
+        elif self.intervalo <= 0:
+            try:
+                self.revisar()
+            except Exception as e:  # se sigue mostrando la versión vigente
+                self.error = e
+        self.iniciar()
+        return self._datos
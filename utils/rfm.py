@@ -0,0 +1,114 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from utils import data_store
+from utils.segmentacion import calcular_cortes
+
+# Segmentos RFM (los mismos que ya colorea crear_grafico_distribucion_clientes).
+# 'Sin Fecha': clientes sin última compra registrada, sin recencia que puntuar.
+SEGMENTOS_RFM = ['VIP', 'Recurrentes', 'En Riesgo', 'Perdido', 'Unica Compra', 'Sin Fecha']
+
+# Nombres aceptados para la cantidad de pedidos por cliente
+COLUMNAS_FRECUENCIA = ('num_pedidos', 'total_pedidos', 'pedidos', 'frecuencia')
+
+
+def _puntaje_cuartil(valores, invertir=False):
+    """Puntaje 1-4 por cuartil (4 = mejor) asignado con searchsorted"""
+    cortes = calcular_cortes(valores, q=4)
+    puntaje = np.searchsorted(cortes[1:-1], valores, side='left').astype(np.int8) + 1
+    return (5 - puntaje).astype(np.int8) if invertir else puntaje
+
+
+def calcular_rfm(clientes_df, fecha_referencia=None):
+    """Puntajes R, F, M y segmento RFM de cada cliente en una pasada vectorizada
+
+    La recencia se mide contra 'fecha_referencia' (por defecto, la última compra
+    registrada). Si no hay columna de frecuencia se usa como aproximación si el
+    cliente volvió a comprar después de su primera compra. Un cliente sin
+    'ultima_compra' queda con r = 0 y en el segmento 'Sin Fecha'.
+    """
+    ultima = clientes_df['ultima_compra'].to_numpy(dtype='datetime64[ns]')
+    if fecha_referencia is None:
+        fecha_referencia = clientes_df['ultima_compra'].max()
+    referencia = np.datetime64(pd.Timestamp(fecha_referencia), 'ns')
+    with np.errstate(invalid='ignore'):  # NaT -> NaN
+        recencia = ((referencia - ultima) // np.timedelta64(1, 'D')).astype('float64')
+    recencia[np.isnat(ultima)] = np.nan
+    monto = clientes_df['gasto_total'].to_numpy(dtype='float64')
+
+    col_frecuencia = next((c for c in COLUMNAS_FRECUENCIA if c in clientes_df.columns), None)
+    if col_frecuencia is not None:
+        frecuencia = clientes_df[col_frecuencia].to_numpy(dtype='float64')
+        f = _puntaje_cuartil(frecuencia)
+    elif 'primera_compra' in clientes_df.columns:
+        # Sin conteo de pedidos solo se distingue compra única (F=1) de recompra (F=4)
+        primera = clientes_df['primera_compra'].to_numpy(dtype='datetime64[ns]')
+        frecuencia = np.where(ultima > primera, 2.0, 1.0)
+        f = np.where(frecuencia > 1, 4, 1).astype(np.int8)
+    else:
+        frecuencia = np.full(len(clientes_df), np.nan)
+        f = _puntaje_cuartil(frecuencia)
+
+    sin_fecha = np.isnan(recencia)
+    r = _puntaje_cuartil(recencia, invertir=True)  # Menos días desde la última compra = mejor
+    r[sin_fecha] = 0
+    m = _puntaje_cuartil(monto)
+
+    # El orden de las condiciones define la prioridad de cada segmento
+    condiciones = [
+        sin_fecha,
+        r == 1,
+        frecuencia <= 1,
+        r == 2,
+        (r >= 3) & (f + m >= 7),
+    ]
+    codigos = np.select(condiciones, [5, 3, 4, 2, 0], default=1).astype(np.int8)
+
+    return pd.DataFrame({
+        'recencia_dias': recencia.astype('float32'),
+        'r': r,
+        'f': f,
+        'm': m,
+        'puntaje_rfm': (r.astype(np.int16) * 100 + f * 10 + m).astype(np.int16),
+        'segmento_rfm': pd.Categorical.from_codes(codigos, categories=SEGMENTOS_RFM)
+    })
+
+
+def ruta_rfm(version):
+    """Archivo donde se persiste el RFM de una versión de datos"""
+    return data_store.CACHE_DIR / f'rfm_{version}.parquet'
+
+
+def cargar_o_calcular_rfm(clientes_df, version):
+    """Lee el RFM persistido para esta versión o lo calcula y lo guarda junto a los datos"""
+    ruta = ruta_rfm(version)
+    if data_store.PARQUET_DISPONIBLE and ruta.exists():
+        rfm = pd.read_parquet(ruta)
+        # Un RFM guardado con otra lista de segmentos se recalcula
+        if len(rfm) == len(clientes_df) and list(rfm['segmento_rfm'].cat.categories) == SEGMENTOS_RFM:
+            return rfm
+
+    rfm = calcular_rfm(clientes_df)
+    if data_store.PARQUET_DISPONIBLE:
+        data_store.CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        # Las versiones anteriores ya no sirven
+        for anterior in data_store.CACHE_DIR.glob('rfm_*.parquet'):
+            anterior.unlink(missing_ok=True)
+        tmp = ruta.with_name(f'.{ruta.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        rfm.to_parquet(tmp, index=False)
+        os.replace(tmp, ruta)
+    return rfm
+
+
+def aplicar_segmentos_rfm(clientes_df, rfm):
+    """Copia superficial de clientes con 'segmento' = segmento RFM y los puntajes"""
+    clientes_df = clientes_df.copy(deep=False)
+    if 'segmento' in clientes_df.columns:
+        clientes_df['segmento_valor'] = clientes_df['segmento']
+    for col in ('recencia_dias', 'r', 'f', 'm', 'puntaje_rfm'):
+        clientes_df[col] = rfm[col].to_numpy()
+    clientes_df['segmento'] = rfm['segmento_rfm'].array
+    return clientes_df
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+
+ETIQUETAS_VALOR = ['Bajo', 'Medio', 'Alto', 'Premium']
+
+# Tamaño de lote con que calcular_cortes(aproximado=True) alimenta el sketch
+FILAS_POR_BLOQUE = 1_000_000
+
+
+class SketchCuantiles:
+    """Sketch de cuantiles mergeable estilo KLL (memoria O(k log n), error de rango ~1/k)
+
+    Cada nivel guarda muestras de peso 2**nivel. Cuando un nivel supera su
+    capacidad se ordena y se promueve la mitad de sus elementos (pares o impares
+    al azar) al nivel siguiente.
+    """
+
+    def __init__(self, k=200, semilla=0):
+        self.k = k
+        self.n = 0
+        self.niveles = [np.empty(0)]
+        self._rng = np.random.default_rng(semilla)
+
+    def _capacidad(self, nivel):
+        # Los niveles bajos tienen menos capacidad (decaimiento geométrico 2/3)
+        profundidad = len(self.niveles) - nivel - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** profundidad)))
+
+    def _compactar(self):
+        nivel = 0
+        while nivel < len(self.niveles):
+            buffer = self.niveles[nivel]
+            if len(buffer) > self._capacidad(nivel):
+                if nivel + 1 == len(self.niveles):
+                    self.niveles.append(np.empty(0))
+                buffer = np.sort(buffer)
+                # Si la cantidad es impar, el mayor se queda en el nivel actual
+                resto = buffer[len(buffer) - len(buffer) % 2:]
+                promovidos = buffer[self._rng.integers(2):len(buffer) - len(resto):2]
+                self.niveles[nivel + 1] = np.concatenate((self.niveles[nivel + 1], promovidos))
+                self.niveles[nivel] = resto
+            nivel += 1
+
+    def agregar(self, valores):
+        """Agrega un lote de valores (los NaN se ignoran)"""
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        self.n += len(valores)
+        self.niveles[0] = np.concatenate((self.niveles[0], valores))
+        self._compactar()
+        return self
+
+    def combinar(self, otro):
+        """Une otro sketch (por ejemplo, de otra partición de clientes)"""
+        while len(self.niveles) < len(otro.niveles):
+            self.niveles.append(np.empty(0))
+        for nivel, buffer in enumerate(otro.niveles):
+            self.niveles[nivel] = np.concatenate((self.niveles[nivel], buffer))
+        self.n += otro.n
+        self._compactar()
+        return self
+
+    def cuantiles(self, qs):
+        """Cuantiles aproximados para las probabilidades qs"""
+        if self.n == 0:
+            return np.full(len(qs), np.nan)
+        valores = np.concatenate(self.niveles)
+        pesos = np.concatenate([np.full(len(b), 2.0 ** i) for i, b in enumerate(self.niveles)])
+        orden = np.argsort(valores, kind='stable')
+        valores, acumulado = valores[orden], np.cumsum(pesos[orden])
+        posiciones = np.searchsorted(acumulado, np.asarray(qs) * acumulado[-1], side='left')
+        return valores[np.minimum(posiciones, len(valores) - 1)]
+
+
+def calcular_cortes(valores, q=4, aproximado=False, k=200):
+    """Puntos de corte [mín, q1, ..., máx] de q grupos de igual frecuencia
+
+    Exacto usa np.nanquantile (selección parcial, sin ordenar todo) y es lo que
+    usa el dashboard. aproximado pasa los valores por un SketchCuantiles: con el
+    arreglo ya en memoria no es más rápido; sirve para comparar contra sketches
+    armados por partes (SketchCuantiles.agregar/combinar).
+    """
+    valores = np.asarray(valores, dtype='float64')
+    qs = np.linspace(0, 1, q + 1)
+    if np.isnan(valores).all():
+        return np.full(q + 1, np.nan)
+    if not aproximado:
+        return np.nanquantile(valores, qs)
+
+    sketch = SketchCuantiles(k=k)
+    for inicio in range(0, len(valores), FILAS_POR_BLOQUE):
+        sketch.agregar(valores[inicio:inicio + FILAS_POR_BLOQUE])
+    cortes = sketch.cuantiles(qs)
+    # Los extremos se toman exactos para que ningún valor quede fuera de rango
+    cortes[0], cortes[-1] = np.nanmin(valores), np.nanmax(valores)
+    return cortes
+
+
+def asignar_segmentos(valores, cortes, etiquetas=ETIQUETAS_VALOR):
+    """Asigna cada valor a su segmento con searchsorted; devuelve un Categorical compacto
+
+    Los intervalos son cerrados a la derecha como en pd.qcut. Con cortes
+    repetidos el segmento intermedio queda vacío en vez de fallar.
+    """
+    valores = np.asarray(valores, dtype='float64')
+    codigos = np.searchsorted(np.asarray(cortes)[1:-1], valores, side='left').astype(np.int8)
+    codigos[np.isnan(valores)] = -1
+    return pd.Categorical.from_codes(codigos, categories=etiquetas, ordered=True)
@@ -0,0 +1,151 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_store import CACHE_DIR, version_datos
+from utils.metrics import _posiciones_rango
+
+# 2^p registros por sketch: error estándar ~1.04 / sqrt(2^p)
+PRECISION_DIA = 12        # 4 KB por día, ~1.6 %
+PRECISION_PRODUCTO = 10   # 1 KB por producto, ~3.3 %
+
+# Sketches de días consecutivos ya unidos por bloque: un rango une bloques completos + bordes
+BLOQUE_DIAS = 32
+
+DIRECTORIO_SKETCHES = CACHE_DIR / 'sketches'
+
+_MASCARA_64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+def hash64(valores):
+    """Hash de 64 bits de enteros (mezcla de splitmix64), vectorizado y estable entre procesos"""
+    x = np.asarray(valores).astype(np.uint64) + np.uint64(0x9E3779B97F4A7C15)
+    with np.errstate(over='ignore'):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return (x ^ (x >> np.uint64(31))) & _MASCARA_64
+
+
+def registro_y_rango(hashes, precision):
+    """(registro, rango) de cada hash: los p bits altos eligen el registro y los 32
+    siguientes dan la posición del primer 1 (ceros a la izquierda + 1)"""
+    registro = (hashes >> np.uint64(64 - precision)).astype(np.int64)
+    resto = ((hashes >> np.uint64(32 - precision)) & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    # Enteros < 2^32 son exactos en float64: floor(log2) es exacto
+    with np.errstate(divide='ignore'):
+        rango = np.where(resto > 0, 32 - np.floor(np.log2(resto)), 33)
+    return registro, rango.astype(np.uint8)
+
+
+def estimar(registros):
+    """Cardinalidad estimada de uno o varios sketches (última dimensión = registros)"""
+    registros = np.asarray(registros)
+    m = registros.shape[-1]
+    alfa = 0.7213 / (1 + 1.079 / m)
+    estimado = alfa * m * m / np.sum(np.exp2(-registros.astype(np.float64)), axis=-1)
+    ceros = np.count_nonzero(registros == 0, axis=-1)
+    # Rango chico: conteo lineal sobre los registros vacíos (más preciso ahí)
+    with np.errstate(divide='ignore'):
+        lineal = m * np.log(m / np.maximum(ceros, 1))
+    return np.where((estimado <= 2.5 * m) & (ceros > 0), lineal, estimado)
+
+
+class SketchesClientes:
+    """Un HyperLogLog de clientes por clave (día o producto), todos con la misma precisión
+
+    Los sketches se unen con un máximo por registro, así que los clientes
+    distintos de cualquier conjunto de días o productos salen de unir sketches
+    chicos, sin volver a las líneas de pedido y sin contar dos veces al que
+    vuelve. Para días se guardan además bloques de BLOQUE_DIAS ya unidos.
+    """
+
+    def __init__(self, claves, registros, fuente=None):
+        self.claves = claves
+        self.registros = registros        # (n_claves, 2^p) uint8
+        self.fuente = fuente              # versión de las líneas de pedido de la que salen
+        self._bloques = None
+        if isinstance(claves, pd.DatetimeIndex) and len(claves):
+            n_bloques = len(claves) // BLOQUE_DIAS
+            self._bloques = registros[:n_bloques * BLOQUE_DIAS].reshape(
+                n_bloques, BLOQUE_DIAS, registros.shape[1]).max(axis=1)
+
+    @classmethod
+    def desde_codigos(cls, claves, grupo, hashes, precision, fuente=None):
+        """Sketches de 'grupo' (código de clave por fila) con los hashes de cliente de cada fila"""
+        registro, rango = registro_y_rango(hashes, precision)
+        m = 1 << precision
+        registros = np.zeros(len(claves) * m, dtype=np.uint8)
+        np.maximum.at(registros, grupo.astype(np.int64) * m + registro, rango)
+        return cls(claves, registros.reshape(len(claves), m), fuente)
+
+    def __len__(self):
+        return len(self.claves)
+
+    def unir(self, posiciones=None):
+        """Sketch unión de las claves en 'posiciones' (todas si es None)"""
+        seleccion = self.registros if posiciones is None else self.registros[posiciones]
+        if not len(seleccion):
+            return np.zeros(self.registros.shape[1], dtype=np.uint8)
+        return seleccion.max(axis=0)
+
+    def contar(self, posiciones=None):
+        """Clientes distintos (estimados) de las claves en 'posiciones'"""
+        return float(estimar(self.unir(posiciones)))
+
+    def cubre(self, desde, hasta):
+        """True si los días [desde, hasta] caen dentro de los días de las líneas de las que salen
+
+        Fuera de ese tramo (p. ej. kpis_diarios extendido después de exportar
+        los sketches) contar_rango no vería esos días.
+        """
+        if not isinstance(self.claves, pd.DatetimeIndex) or not len(self.claves):
+            return False
+        return self.claves[0] <= pd.Timestamp(desde).normalize() and pd.Timestamp(hasta).normalize() <= self.claves[-1]
+
+    def contar_rango(self, desde=None, hasta=None):
+        """Clientes distintos del rango de días [desde, hasta]: bloques completos + días de los bordes"""
+        inicio, fin = _posiciones_rango(self.claves, desde, hasta)
+        if fin <= inicio:
+            return 0.0
+        b_ini = -(-inicio // BLOQUE_DIAS)
+        b_fin = fin // BLOQUE_DIAS
+        if b_fin <= b_ini:
+            # Sin bloques completos dentro del rango: se unen los días directamente
+            return self.contar(slice(inicio, fin))
+        partes = (self.registros[inicio:b_ini * BLOQUE_DIAS], self._bloques[b_ini:b_fin],
+                  self.registros[b_fin * BLOQUE_DIAS:fin])
+        return float(estimar(np.concatenate(partes).max(axis=0)))
+
+    def contar_claves(self, claves):
+        """Clientes distintos de un conjunto de claves (p. ej. nombres de producto)"""
+        posiciones = pd.Index(self.claves).get_indexer(claves)
+        return self.contar(posiciones[posiciones >= 0])
+
+    def guardar(self, ruta):
+        ruta.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ruta.with_name(ruta.name + '.tmp.npz')
+        claves = (self.claves.to_numpy(dtype='datetime64[ns]') if isinstance(self.claves, pd.DatetimeIndex)
+                  else np.asarray(self.claves, dtype=str))
+        np.savez_compressed(tmp, claves=claves, registros=self.registros, fuente=np.asarray(self.fuente or ''))
+        tmp.replace(ruta)
+
+    @classmethod
+    def cargar(cls, ruta):
+        with np.load(ruta, allow_pickle=False) as datos:
+            claves = datos['claves']
+            claves = pd.DatetimeIndex(claves) if claves.dtype.kind == 'M' else pd.Index(claves)
+            return cls(claves, datos['registros'], str(datos['fuente']) or None)
+
+
+def ruta_sketches(nombre):
+    """Archivo de sketches persistidos junto al cache columnar de los datos"""
+    return DIRECTORIO_SKETCHES / f'{nombre}.npz'
+
+
+def cargar_sketches(nombre, fuente=None):
+    """Sketches persistidos si existen y corresponden a la versión actual de las líneas (si no, None)"""
+    try:
+        sketches = SketchesClientes.cargar(ruta_sketches(nombre))
+    except (OSError, KeyError, ValueError):
+        return None
+    fuente = fuente or version_datos(('lineas_pedidos',))
+    return sketches if sketches.fuente == fuente else None
@@ -1,17 +1,42 @@
-import plotly.express as px
+# Sin plotly.express: cargarlo al inicio agrega cientos de ms a cada arranque en frío
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-import plotly.figure_factory as ff
 import pandas as pd
 import numpy as np
-from scipy import stats
 
-def crear_grafico_tendencia_ventas(kpis_df):
-    """Gráfico de Tendencias SIMPLIFICADO - Claro y Legible"""
-    from plotly.subplots import make_subplots
-    import numpy as np
-    from scipy import stats
-    
+from utils.correlaciones import NOMBRES_LEGIBLES, IndiceCorrelaciones, p_valores
+from utils.cubos import CuboVentas
+from utils.figure_cache import memoizar_figura
+from utils.metrics import calcular_tendencia, construir_indice_acumulado
+from utils.muestreo import PUNTOS_MAX, UMBRAL_WEBGL, indices_muestreo
+from utils.ranking import HOJAS_POR_GRUPO, MAX_BARRAS_PARETO, PRODUCTOS_DETALLE, RankingProductos
+
+# Color de cada nodo del Sankey por segmento (RFM y de valor); el total tiene el suyo
+COLORES_SANKEY = {
+    'VIP': '#059669', 'Recurrentes': '#2563eb', 'En Riesgo': '#d97706', 'Perdido': '#dc2626',
+    'Unica Compra': '#7c3aed', 'Sin Fecha': '#6C757D',
+    'Premium': '#059669', 'Alto': '#2563eb', 'Medio': '#7c3aed', 'Bajo': '#d97706',
+}
+COLOR_SANKEY_TOTAL = '#0891b2'
+COLOR_SANKEY_OTRO = '#94A3B8'
+
+
+def _ranking(productos_df, ranking, metrica):
+    """El ranking recibido (el de la versión de datos) o uno armado ahora para 'metrica'"""
+    if ranking is not None and metrica in ranking:
+        return ranking
+    return RankingProductos(productos_df, [metrica])
+
+@memoizar_figura
+def crear_grafico_tendencia_ventas(kpis_df, max_puntos=PUNTOS_MAX, muestreo='lttb', tendencia=None):
+    """Gráfico de Tendencias SIMPLIFICADO - Claro y Legible
+
+    Las series largas se reducen a 'max_puntos' por traza (LTTB o mín/máx por
+    bucket, conservando los picos) y sobre UMBRAL_WEBGL puntos se dibujan con
+    Scattergl. Al acotar el período la resolución sube sola. 'tendencia' es el
+    resultado de calcular_tendencia() para el período (O(1) con el índice
+    acumulado); si no se entrega se calcula desde kpis_df.
+    """
     fig = make_subplots(
         rows=1, cols=1,
         subplot_titles=['📈 Evolución de Ventas con Tendencia'],
@@ -26,16 +51,25 @@ def crear_grafico_tendencia_ventas(kpis_df):
     df_clean = kpis_df.dropna(subset=['fecha', 'ventas_totales'])
     df_clean = df_clean.sort_values('fecha')
     
-    # Convertir fechas a números para regresión
-    df_clean['fecha_num'] = (df_clean['fecha'] - df_clean['fecha'].min()).dt.days
-    
+    # La media móvil se calcula sobre la serie completa, antes de reducir puntos
+    df_clean['ma7_ventas'] = df_clean['ventas_totales'].rolling(window=7, min_periods=1).mean()
+
+    # Ambas trazas usan los mismos índices para que el hover unificado coincida
+    indices = indices_muestreo(
+        df_clean['fecha'].to_numpy(dtype='datetime64[ns]').astype('int64'),
+        df_clean['ventas_totales'].to_numpy(),
+        max_puntos, muestreo
+    )
+    df_grafico = df_clean.iloc[indices]
+    Traza = go.Scattergl if len(df_grafico) > UMBRAL_WEBGL else go.Scatter
+
     # === SOLO VENTAS PRINCIPALES ===
     
     # Ventas con área (más suave)
     fig.add_trace(
-        go.Scatter(
-            x=df_clean['fecha'],
-            y=df_clean['ventas_totales'],
+        Traza(
+            x=df_grafico['fecha'],
+            y=df_grafico['ventas_totales'],
             mode='lines',
             name='💰 Ventas Diarias',
             line=dict(color='#059669', width=3),
@@ -47,11 +81,10 @@ def crear_grafico_tendencia_ventas(kpis_df):
     )
     
     # Media móvil 7 días (más suave)
-    df_clean['ma7_ventas'] = df_clean['ventas_totales'].rolling(window=7, min_periods=1).mean()
     fig.add_trace(
-        go.Scatter(
-            x=df_clean['fecha'],
-            y=df_clean['ma7_ventas'],
+        Traza(
+            x=df_grafico['fecha'],
+            y=df_grafico['ma7_ventas'],
             mode='lines',
             name='📈 Tendencia (7 días)',
             line=dict(color='#dc2626', width=3, dash='solid'),
@@ -62,15 +95,12 @@ def crear_grafico_tendencia_ventas(kpis_df):
     
     # === ANÁLISIS ESTADÍSTICO SIMPLE ===
     
-    # Calcular estadísticas básicas
-    if len(df_clean) > 1:
-        slope_ventas, intercept_ventas, r_value_ventas, p_value_ventas, std_err_ventas = stats.linregress(
-            df_clean['fecha_num'], df_clean['ventas_totales']
-        )
-        
-        # Calcular crecimiento porcentual
-        crecimiento_diario = slope_ventas / df_clean['ventas_totales'].mean() * 100
-        crecimiento_anual = crecimiento_diario * 365
+    # Pendiente y crecimiento porcentual con las sumas Σx, Σy, Σxy, Σx² (sin scipy)
+    if tendencia is None:
+        tendencia = calcular_tendencia(construir_indice_acumulado(df_clean[['fecha', 'ventas_totales']]))
+    if tendencia is not None:
+        crecimiento_diario = tendencia['crecimiento_diario']
+        crecimiento_anual = tendencia['crecimiento_anual']
         
         # Agregar estadísticas en una caja limpia
         fig.add_annotation(
@@ -124,14 +154,22 @@ def crear_grafico_tendencia_ventas(kpis_df):
     
     return fig
 
-def crear_grafico_distribucion_clientes(clientes_df):
-    """Gráfico de DONUT (circular) de distribución de clientes por segmento"""
-    if 'segmento' not in clientes_df.columns:
+@memoizar_figura
+def crear_grafico_distribucion_clientes(clientes_df, resumen=None):
+    """Gráfico de DONUT (circular) de distribución de clientes por segmento
+
+    'resumen' (segmento, clientes, gasto_total; ver FuenteSQL.resumen_segmentos)
+    reemplaza al detalle de clientes cuando el conteo ya viene agregado.
+    """
+    if resumen is not None:
+        segmentos = pd.Series(resumen['clientes'].to_numpy(), index=pd.Index(resumen['segmento'], name='segmento'),
+                              name='count').sort_values(ascending=False, kind='stable')
+    elif 'segmento' not in clientes_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Columna 'segmento' no encontrada", showarrow=False)
         return fig
-
-    segmentos = clientes_df['segmento'].value_counts()
+    else:
+        segmentos = clientes_df['segmento'].value_counts()
     
     # Colores exactos como en la imagen de muestra
     colores_mapa = {
@@ -140,6 +178,7 @@ def crear_grafico_distribucion_clientes(clientes_df):
         'VIP': '#FFD166',          # Amarillo dorado
         'Recurrentes': '#EF476F',  # Rojo/rosa
         'Unica Compra': '#6C757D', # Gris
+        'Sin Fecha': '#ADB5BD',    # Gris claro (sin última compra)
         'Bajo': '#545B62',        # Gris oscuro como en la imagen
         'Medio': '#FFD166',        # Amarillo como en la imagen
         'Alto': '#118AB2',         # Azul turquesa como en la imagen
@@ -198,24 +237,25 @@ def crear_grafico_distribucion_clientes(clientes_df):
     
     return fig
 
-def crear_grafico_top_productos(productos_df, metrica='ventas_totales', top_n=15):
+@memoizar_figura
+def crear_grafico_top_productos(productos_df, metrica='ventas_totales', top_n=15, ranking=None):
     """Gráfico horizontal de top productos"""
     if metrica not in productos_df.columns:
         fig = go.Figure()
         fig.add_annotation(text=f"Columna '{metrica}' no encontrada", showarrow=False)
         return fig
 
-    # Los datos ya vienen ordenados desde app.py
+    top = _ranking(productos_df, ranking, metrica).top(metrica, top_n)
     fig = go.Figure(data=[
         go.Bar(
-            y=productos_df['nombre_producto'],
-            x=productos_df[metrica],
+            y=top['nombre_producto'],
+            x=top[metrica],
             orientation='h',
-            text=productos_df[metrica],
+            text=top[metrica],
             texttemplate='%{text:,.0f}',
             textposition='outside',
             marker=dict(
-                color=productos_df[metrica],
+                color=top[metrica],
                 colorscale='Viridis',
                 showscale=True,
                 colorbar=dict(title=metrica.replace("_", " ").title())
@@ -235,29 +275,74 @@ def crear_grafico_top_productos(productos_df, metrica='ventas_totales', top_n=15
     
     return fig
 
-def crear_heatmap_ventas_mensual(kpis_df):
-    """Heatmap MEJORADO - Colores del tema y mejor legibilidad"""
+@memoizar_figura
+def crear_grafico_ranking_productos(productos_df, metrica, titulo_eje, color, texttemplate, top_n=15, bargap=None,
+                                    ranking=None):
+    """Barras horizontales de los top N productos por una métrica (pestañas de productos)"""
+    if metrica not in productos_df.columns:
+        fig = go.Figure()
+        fig.add_annotation(text=f"Columna '{metrica}' no encontrada", showarrow=False)
+        return fig
+
+    # Ordenamiento garantizado por la métrica (corte de la permutación del ranking)
+    top = _ranking(productos_df, ranking, metrica).top(metrica, top_n)
+    fig = go.Figure(data=[
+        go.Bar(
+            y=top['nombre_producto'],
+            x=top[metrica],
+            orientation='h',
+            text=top[metrica],
+            texttemplate=texttemplate,
+            textposition='outside',
+            marker=dict(
+                color=color,
+                line=dict(color='#047857', width=3),  # Borde grueso para efecto
+                # Efecto Power BI con esquinas redondeadas
+                cornerradius=8  # Esquinas redondeadas para efecto moderno
+            )
+        )
+    ])
+    fig.update_layout(
+        xaxis_title=titulo_eje,
+        yaxis_title='',
+        height=500,
+        font=dict(size=12, family='Arial, sans-serif'),
+        margin=dict(l=60, r=60, t=40, b=60),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        yaxis={'categoryorder':'total ascending'},
+        xaxis=dict(
+            gridcolor='rgba(0,0,0,0.1)',
+            showgrid=True
+        )
+    )
+    if bargap is not None:
+        fig.update_layout(barmode='group', bargap=bargap)
+
+    return fig
+
+@memoizar_figura
+def crear_heatmap_ventas_mensual(kpis_df, cubo=None, pivot=None):
+    """Heatmap MEJORADO - Colores del tema y mejor legibilidad
+
+    Lee los promedios de un CuboVentas (mes × día de la semana con códigos
+    enteros); si no se entrega uno se construye desde kpis_df. Con 'pivot'
+    (p. ej. FuenteSQL.heatmap) se dibuja ese directamente.
+    """
     if 'fecha' not in kpis_df.columns or 'ventas_totales' not in kpis_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes para heatmap", showarrow=False)
         return fig
 
-    kpis_df = kpis_df.copy()
-    kpis_df['mes'] = kpis_df['fecha'].dt.month
-    kpis_df['dia_semana'] = kpis_df['fecha'].dt.day_name()
-    
-    dias_orden = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+    if pivot is None:
+        if cubo is None:
+            cubo = CuboVentas.desde_kpis(kpis_df, ['ventas_totales'])
+        pivot = cubo.heatmap('ventas_totales')
+
     dias_espanol = ['Lunes', 'Martes', 'Miércoles', 'Jueves', 'Viernes', 'Sábado', 'Domingo']
     
-    pivot = kpis_df.pivot_table(
-        values='ventas_totales',
-        index='dia_semana',
-        columns='mes',
-        aggfunc='mean'
-    )
-    
-    pivot = pivot.reindex(dias_orden)
-    pivot.index = dias_espanol
+    pivot = pivot.set_axis(dias_espanol, axis=0)
     
     # Crear heatmap con colores del tema y mejor contraste
     fig = go.Figure(data=go.Heatmap(
@@ -334,6 +419,7 @@ def crear_heatmap_ventas_mensual(kpis_df):
     
     return fig
 
+@memoizar_figura
 def crear_gauge_chart(valor, valor_objetivo, titulo):
     """Gráfico de gauge para mostrar progreso vs objetivo"""
     porcentaje = (valor / valor_objetivo) * 100 if valor_objetivo != 0 else 0
@@ -369,17 +455,18 @@ def crear_gauge_chart(valor, valor_objetivo, titulo):
 
 # ========== NUEVAS VISUALIZACIONES IMPACTANTES ==========
 
-def crear_mapa_correlaciones(kpis_df):
-    """Mapa de calor de correlaciones MEJORADO - Elegante y Profesional"""
-    cols_numericas = [
-        'ventas_totales', 'pedidos_totales', 'ticket_promedio',
-        'productos_por_pedido', 'clientes_unicos'
-    ]
-    
-    # Filtrar solo columnas existentes
-    cols_disponibles = [col for col in cols_numericas if col in kpis_df.columns]
-    
-    if len(cols_disponibles) < 2:
+@memoizar_figura
+def crear_mapa_correlaciones(kpis_df, matriz=None, n=None, metodo='pearson'):
+    """Mapa de calor de correlaciones MEJORADO - Elegante y Profesional
+
+    'matriz' y 'n' son el resultado de IndiceCorrelaciones.matriz() para el
+    período (cacheado por versión de datos); si no se entregan se calculan
+    desde kpis_df. El hover muestra el p-valor de cada par.
+    """
+    if matriz is None:
+        matriz, n = IndiceCorrelaciones.desde_kpis(kpis_df).matriz(metodo=metodo)
+    
+    if len(matriz.columns) < 2:
         fig = go.Figure()
         fig.add_annotation(
             text="No hay suficientes métricas para correlación", 
@@ -388,28 +475,15 @@ def crear_mapa_correlaciones(kpis_df):
         )
         return fig
     
-    # Calcular matriz de correlación
-    corr_matrix = kpis_df[cols_disponibles].corr()
-    
-    # Crear nombres más legibles
-    nombres_legibles = {
-        'ventas_totales': '💰 Ventas',
-        'pedidos_totales': '🛒 Pedidos', 
-        'ticket_promedio': '🎫 Ticket Promedio',
-        'productos_por_pedido': '📦 Productos/Pedido',
-        'clientes_unicos': '👥 Clientes'
-    }
-    
-    # Renombrar columnas para mostrar
-    corr_display = corr_matrix.copy()
-    corr_display.columns = [nombres_legibles.get(col, col) for col in corr_display.columns]
-    corr_display.index = [nombres_legibles.get(col, col) for col in corr_display.index]
+    # Nombres legibles solo para los ejes (la matriz cacheada no se copia)
+    etiquetas = [NOMBRES_LEGIBLES.get(col, col) for col in matriz.columns]
+    valores = matriz.to_numpy()
     
     # Crear heatmap con go.Heatmap para mejor control
     fig = go.Figure(data=go.Heatmap(
-        z=corr_display.values,
-        x=corr_display.columns,
-        y=corr_display.index,
+        z=valores,
+        x=etiquetas,
+        y=etiquetas,
         colorscale=[
             [0.0, '#dc2626'],    # Rojo para correlación negativa fuerte
             [0.25, '#f87171'],   # Rojo claro
@@ -419,12 +493,14 @@ def crear_mapa_correlaciones(kpis_df):
         ],
         zmin=-1,
         zmax=1,
-        text=corr_display.round(2).values,
+        text=np.round(valores, 2),
         texttemplate='%{text}',
         textfont={'size': 14, 'color': 'white'},
+        customdata=p_valores(valores, n),
         hoverongaps=False,
         hovertemplate='<b>%{y}</b> vs <b>%{x}</b><br>' +
-                     'Correlación: <b>%{z:.3f}</b><br>' +
+                     f'Correlación ({metodo.title()}): <b>%{{z:.3f}}</b><br>' +
+                     'p-valor: <b>%{customdata:.3g}</b><br>' +
                      '<extra></extra>'
     ))
     
@@ -464,15 +540,76 @@ def crear_mapa_correlaciones(kpis_df):
     
     return fig
 
-def crear_waterfall_contribucion(productos_df, top_n=10):
+@memoizar_figura
+def crear_grafico_correlacion_rodante(serie, col_a, col_b, ventana, max_puntos=PUNTOS_MAX):
+    """Correlación en el tiempo: r de col_a vs. col_b en ventanas móviles de 'ventana' días
+
+    'serie' es IndiceCorrelaciones.rodante() del período. Como la tendencia,
+    se reduce a 'max_puntos' con LTTB y usa Scattergl sobre UMBRAL_WEBGL.
+    """
+    serie = serie.dropna()
+    if serie.empty:
+        fig = go.Figure()
+        fig.add_annotation(
+            text=f"El período no alcanza para ventanas de {ventana} días",
+            showarrow=False,
+            font=dict(size=16, color='#6c757d')
+        )
+        return fig
+
+    x = serie.index.to_numpy(dtype='datetime64[ns]').astype(np.int64)
+    indices = indices_muestreo(x, serie.to_numpy(), max_puntos, 'lttb')
+    serie = serie.iloc[indices]
+    Scatter = go.Scattergl if len(serie) > UMBRAL_WEBGL else go.Scatter
+    nombre_a, nombre_b = NOMBRES_LEGIBLES.get(col_a, col_a), NOMBRES_LEGIBLES.get(col_b, col_b)
+
+    fig = go.Figure(Scatter(
+        x=serie.index,
+        y=serie.to_numpy(),
+        mode='lines',
+        name=f'{nombre_a} vs {nombre_b}',
+        line=dict(color='#0891b2', width=2),
+        fill='tozeroy',
+        fillcolor='rgba(8, 145, 178, 0.12)',
+        hovertemplate='%{x|%d-%m-%Y}<br>r: <b>%{y:.3f}</b><extra></extra>'
+    ))
+    fig.add_hline(y=0, line_dash="dash", line_color="#6c757d", line_width=1)
+
+    fig.update_layout(
+        title=dict(
+            text=f'{nombre_a} vs {nombre_b} · ventana de {ventana} días',
+            font=dict(size=16, color='#0891b2'),
+            x=0.5
+        ),
+        height=400,
+        font=dict(size=12, family='Arial, sans-serif'),
+        margin=dict(l=60, r=40, t=60, b=40),
+        plot_bgcolor='rgba(0,0,0,0)',
+        paper_bgcolor='rgba(0,0,0,0)',
+        showlegend=False,
+        xaxis=dict(gridcolor='rgba(0,0,0,0.1)', showgrid=True),
+        yaxis=dict(
+            title='Correlación (r)',
+            range=[-1.05, 1.05],
+            gridcolor='rgba(0,0,0,0.1)',
+            showgrid=True
+        )
+    )
+
+    return fig
+
+@memoizar_figura
+def crear_waterfall_contribucion(productos_df, top_n=10, ranking=None):
     """Gráfico de cascada MEJORADO - Colores del tema y sin título redundante"""
     if 'ventas_totales' not in productos_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes", showarrow=False)
         return fig
     
-    top = productos_df.nlargest(top_n, 'ventas_totales')
-    otros_ventas = productos_df.nsmallest(len(productos_df) - top_n, 'ventas_totales')['ventas_totales'].sum()
+    ranking = _ranking(productos_df, ranking, 'ventas_totales')
+    top = ranking.top('ventas_totales', top_n)
+    # El resto es el total menos el acumulado del top: sin un nsmallest sobre el catálogo
+    otros_ventas = ranking.resto('ventas_totales', top_n)
     
     productos_list = list(top['nombre_producto']) + ['Otros']
     valores = list(top['ventas_totales']) + [otros_ventas]
@@ -518,17 +655,20 @@ def crear_waterfall_contribucion(productos_df, top_n=10):
     
     return fig
 
-def crear_sankey_segmentos(clientes_df):
-    """Diagrama Sankey del flujo de valor por segmento"""
-    if 'segmento' not in clientes_df.columns or 'gasto_total' not in clientes_df.columns:
+@memoizar_figura
+def crear_sankey_segmentos(clientes_df, resumen=None):
+    """Diagrama Sankey del flujo de valor por segmento (o desde un 'resumen' ya agregado)"""
+    if resumen is not None:
+        segmentos = resumen[['segmento', 'gasto_total']]
+    elif 'segmento' not in clientes_df.columns or 'gasto_total' not in clientes_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes para Sankey", showarrow=False)
         return fig
-    
-    segmentos = clientes_df.groupby('segmento', observed=True).agg({
-        'gasto_total': 'sum',
-        'id_cliente': 'count'
-    }).reset_index()
+    else:
+        segmentos = clientes_df.groupby('segmento', observed=True).agg({
+            'gasto_total': 'sum',
+            'id_cliente': 'count'
+        }).reset_index()
     
     segmentos = segmentos.sort_values('gasto_total', ascending=False)
     
@@ -537,8 +677,7 @@ def crear_sankey_segmentos(clientes_df):
     target = [len(segmentos)] * len(segmentos)
     value = list(segmentos['gasto_total'])
     labels = list(segmentos['segmento']) + ['Total Ingresos']
-    
-    colors = ['#059669', '#2563eb', '#7c3aed', '#d97706', '#dc2626', '#0891b2']
+    colors = [COLORES_SANKEY.get(seg, COLOR_SANKEY_OTRO) for seg in segmentos['segmento']] + [COLOR_SANKEY_TOTAL]
     
     fig = go.Figure(data=[go.Sankey(
         node=dict(
@@ -546,7 +685,7 @@ def crear_sankey_segmentos(clientes_df):
             thickness=20,
             line=dict(color="black", width=0.5),
             label=labels,
-            color=colors[:len(labels)]
+            color=colors
         ),
         link=dict(
             source=source,
@@ -566,49 +705,78 @@ def crear_sankey_segmentos(clientes_df):
     
     return fig
 
-def crear_treemap_productos(productos_df):
-    """Treemap jerárquico MEJORADO - Colores del tema y sin título redundante"""
+@memoizar_figura
+def crear_treemap_productos(productos_df, categorias_df=None, ranking=None, hojas_por_grupo=HOJAS_POR_GRUPO):
+    """Treemap jerárquico MEJORADO - Categoría > subcategoría > producto
+
+    Se dibuja con go.Treemap y maxdepth=2: se ven categorías y subcategorías
+    y los productos aparecen al hacer clic. En cada subcategoría solo los
+    'hojas_por_grupo' productos más vendidos tienen cuadro propio; el resto
+    se agrupa en 'Otros (n)'. Sin categorias_df todo cuelga de 'Sin categoría'.
+    """
     if 'ventas_totales' not in productos_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes", showarrow=False)
         return fig
     
-    # Agregar categoría artificial para jerarquía
-    productos_df = productos_df.copy()
-    productos_df['categoria'] = 'Productos'
-    
-    # Crear treemap con colores del tema
-    fig = px.treemap(
-        productos_df,
-        path=['categoria', 'nombre_producto'],
-        values='ventas_totales',
-        color='ventas_totales',
-        color_continuous_scale=[
-            [0.0, '#dc2626'],      # Rojo para valores bajos
-            [0.2, '#d97706'],      # Naranja
-            [0.4, '#059669'],       # Verde
-            [0.6, '#0891b2'],       # Turquesa
-            [0.8, '#2563eb'],       # Azul
-            [1.0, '#7c3aed']        # Morado para valores altos
-        ],
-        hover_data={'ventas_totales': ':$,.0f'},
-        hover_name='nombre_producto'
-    )
-    
-    # Mejorar el texto y la interactividad
-    fig.update_traces(
-        textposition="middle center", 
-        textfont_size=12,
-        textfont_color='white',
+    # Productos de mayor a menor venta: el orden del ranking deja la cabeza de cada grupo primero
+    ranking = _ranking(productos_df, ranking, 'ventas_totales')
+    productos = ranking.ordenados('ventas_totales')[['nombre_producto', 'ventas_totales']]
+    productos = productos.astype({'nombre_producto': str})
+    if categorias_df is not None:
+        categorias = categorias_df.reindex(columns=['nombre_producto', 'categoria', 'subcategoria'])
+        categorias = categorias.astype(object).drop_duplicates('nombre_producto')
+        categorias['nombre_producto'] = categorias['nombre_producto'].astype(str)
+        productos = productos.merge(categorias, on='nombre_producto', how='left', sort=False)
+    for col in ('categoria', 'subcategoria'):
+        productos[col] = productos[col].fillna('Sin categoría') if col in productos else 'Sin categoría'
+    productos[['categoria', 'subcategoria']] = productos[['categoria', 'subcategoria']].astype(str)
+
+    grupo = ['categoria', 'subcategoria']
+    posicion = productos.groupby(grupo, sort=False).cumcount()
+    hojas = productos[posicion < hojas_por_grupo]
+    cola = productos[posicion >= hojas_por_grupo].groupby(grupo, sort=False)['ventas_totales'].agg(['sum', 'size'])
+    subcategorias = productos.groupby(grupo, sort=False)['ventas_totales'].sum()
+    categorias_tot = subcategorias.groupby(level=0, sort=False).sum()
+
+    id_sub = hojas['categoria'] + '/' + hojas['subcategoria']
+    ids = (list(categorias_tot.index)
+           + [f'{c}/{s}' for c, s in subcategorias.index]
+           + list(id_sub + '/' + hojas['nombre_producto'])
+           + [f'{c}/{s}/Otros' for c, s in cola.index])
+    etiquetas = (list(categorias_tot.index)
+                 + [s for _, s in subcategorias.index]
+                 + list(hojas['nombre_producto'])
+                 + [f'Otros ({n:,})'.replace(',', '.') for n in cola['size']])
+    padres = ([''] * len(categorias_tot)
+              + [c for c, _ in subcategorias.index]
+              + list(id_sub)
+              + [f'{c}/{s}' for c, s in cola.index])
+    hoja_valores = np.concatenate((hojas['ventas_totales'].to_numpy(), cola['sum'].to_numpy()))
+    totales = np.concatenate((categorias_tot.to_numpy(), subcategorias.to_numpy(), hoja_valores))
+    # 'remainder': los padres no llevan valor propio y su tamaño es la suma exacta de sus hijos
+    valores = np.concatenate((np.zeros(len(categorias_tot) + len(subcategorias)), hoja_valores))
+
+    fig = go.Figure(go.Treemap(
+        ids=ids,
+        labels=etiquetas,
+        parents=padres,
+        values=valores,
+        branchvalues='remainder',
+        maxdepth=2,
+        customdata=totales,
+        marker=dict(colors=totales, coloraxis='coloraxis'),
+        textposition="middle center",
+        textfont=dict(size=12, color='white'),
         hovertemplate='<b>%{label}</b><br>' +
-                     'Ventas: <b>$%{value:,.0f}</b><br>' +
+                     'Ventas: <b>$%{customdata:,.0f}</b><br>' +
                      'Porcentaje: <b>%{percentParent:.1%}</b><extra></extra>'
-    )
+    ))
     
     # Actualizar layout con título claro
     fig.update_layout(
         title=dict(
-            text='🗺️ Mapa de Ventas por Producto',
+            text='🗺️ Mapa de Ventas por Categoría y Producto',
             font=dict(size=18, color='#0891b2'),
             x=0.5
         ),
@@ -619,9 +787,17 @@ def crear_treemap_productos(productos_df):
         paper_bgcolor='rgba(0,0,0,0)'
     )
     
-    # Mejorar la barra de colores
+    # Escala de colores del tema y su barra
     fig.update_layout(
         coloraxis=dict(
+            colorscale=[
+                [0.0, '#dc2626'],      # Rojo para valores bajos
+                [0.2, '#d97706'],      # Naranja
+                [0.4, '#059669'],       # Verde
+                [0.6, '#0891b2'],       # Turquesa
+                [0.8, '#2563eb'],       # Azul
+                [1.0, '#7c3aed']        # Morado para valores altos
+            ],
             colorbar=dict(
                 title=dict(
                     text='Ventas ($)',
@@ -637,17 +813,27 @@ def crear_treemap_productos(productos_df):
     
     return fig
 
-def crear_grafico_pareto(productos_df):
-    """Gráfico de Pareto MEJORADO - Colores del tema y sin título redundante"""
+@memoizar_figura
+def crear_grafico_pareto(productos_df, ranking=None, detalle=PRODUCTOS_DETALLE):
+    """Gráfico de Pareto MEJORADO - Colores del tema y sin título redundante
+
+    Con más de MAX_BARRAS_PARETO productos solo los 'detalle' primeros
+    tienen barra propia y la cola se agrupa en tramos del ranking (en gris),
+    así la figura pesa lo mismo con 40 o con 100.000 SKUs.
+    """
     if 'ventas_totales' not in productos_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes", showarrow=False)
         return fig
     
-    # Ordenar y calcular acumulado
-    df_sorted = productos_df.sort_values('ventas_totales', ascending=False).reset_index(drop=True)
-    df_sorted['ventas_acumuladas'] = df_sorted['ventas_totales'].cumsum()
-    df_sorted['porcentaje_acumulado'] = (df_sorted['ventas_acumuladas'] / df_sorted['ventas_totales'].sum()) * 100
+    # Orden y acumulado ya calculados en el ranking
+    ranking = _ranking(productos_df, ranking, 'ventas_totales')
+    n_productos = len(ranking.orden('ventas_totales'))
+    if n_productos <= MAX_BARRAS_PARETO:
+        detalle = n_productos
+    df_sorted = ranking.cabeza_y_cola('ventas_totales', detalle=detalle)
+    # Productos que hacen el 80% (búsqueda binaria sobre el acumulado)
+    corte_80 = ranking.corte('ventas_totales', 80)
     
     # Crear figura con doble eje
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -658,12 +844,15 @@ def crear_grafico_pareto(productos_df):
             x=df_sorted['nombre_producto'],
             y=df_sorted['ventas_totales'],
             name="Ventas",
-            marker_color='#0891b2',  # Turquesa del tema
+            # Turquesa del tema; los tramos de la cola en gris
+            marker_color=np.where(df_sorted['es_tramo'], '#94a3b8', '#0891b2'),
             marker_line=dict(color='#047857', width=1),
             text=df_sorted['ventas_totales'],
             texttemplate='<b>$%{text:,.0f}</b>',
             textposition='outside',
-            textfont=dict(size=10, color='#0891b2')
+            textfont=dict(size=10, color='#0891b2'),
+            customdata=df_sorted['productos'],
+            hovertemplate='%{x}<br>Ventas: $%{y:,.0f}<br>Productos: %{customdata:,}<extra></extra>'
         ),
         secondary_y=False
     )
@@ -687,7 +876,7 @@ def crear_grafico_pareto(productos_df):
         line_dash="dash",
         line_color="#059669",  # Verde del tema
         line_width=2,
-        annotation_text="Regla 80/20",
+        annotation_text=f"Regla 80/20: {corte_80:,} de {n_productos:,} productos".replace(',', '.'),
         annotation_font=dict(size=12, color='#059669'),
         secondary_y=True
     )
@@ -739,11 +928,9 @@ def crear_grafico_pareto(productos_df):
     
     return fig
 
+@memoizar_figura
 def crear_grafico_progreso_objetivos(metricas, objetivos):
     """Gráfico de Gauges Circulares - ELEGANTE Y NÍTIDO"""
-    import plotly.graph_objects as go
-    from plotly.subplots import make_subplots
-    
     # Calcular porcentajes
     porcentajes = {
         'Ventas': (metricas['ventas_totales'] / objetivos['ventas']) * 100,
@@ -878,21 +1065,20 @@ def crear_grafico_progreso_objetivos(metricas, objetivos):
     
     return fig
 
-def crear_analisis_estacionalidad(kpis_df):
-    """Análisis de patrones estacionales"""
+@memoizar_figura
+def crear_analisis_estacionalidad(kpis_df, cubo=None):
+    """Análisis de patrones estacionales (promedios leídos del CuboVentas)"""
     if 'fecha' not in kpis_df.columns or 'ventas_totales' not in kpis_df.columns:
         fig = go.Figure()
         fig.add_annotation(text="Datos insuficientes para análisis de estacionalidad", showarrow=False)
         return fig
         
-    kpis_df = kpis_df.copy()
-    kpis_df['mes'] = kpis_df['fecha'].dt.month
-    kpis_df['dia_semana'] = kpis_df['fecha'].dt.dayofweek
-    kpis_df['semana_año'] = kpis_df['fecha'].dt.isocalendar().week
-    
-    # Agrupar por diferentes periodos
-    mensual = kpis_df.groupby('mes', observed=True)['ventas_totales'].mean()
-    semanal = kpis_df.groupby('dia_semana', observed=True)['ventas_totales'].mean()
+    if cubo is None:
+        cubo = CuboVentas.desde_kpis(kpis_df, ['ventas_totales'])
+
+    # Promedios por mes del año y por día de la semana (lunes=0)
+    mensual = cubo.promedio_por_mes('ventas_totales')
+    semanal = cubo.promedio_por_dia_semana('ventas_totales')
     
     # Nombres de meses y días
     nombres_meses = ['Ene', 'Feb', 'Mar', 'Abr', 'May', 'Jun', 